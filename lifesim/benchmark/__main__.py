@@ -0,0 +1,46 @@
+import argparse
+import json
+import sys
+
+from lifesim.benchmark.benchmark import (BENCHMARK_DIRECTORY, ENGINES, PRESETS,
+                                         compare_to_baseline,
+                                         plot_scaling_curves, run_benchmark,
+                                         save_report)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m lifesim.benchmark", description="LifeSim benchmark suite")
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="quick")
+    parser.add_argument("--engines", nargs="+", choices=ENGINES, default=["object", "compiled", "batched"])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--generations", type=int, default=3)
+    parser.add_argument("--max-seconds", type=float, default=None, help="wall clock budget per case")
+    parser.add_argument("--output", default=f"{BENCHMARK_DIRECTORY}/benchmark.json")
+    parser.add_argument("--baseline", default=None, help="earlier benchmark JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1, help="relative slowdown counted as a regression")
+    parser.add_argument("--plot", default=None, help="write the scaling curves to this image file")
+    args = parser.parse_args()
+
+    report = run_benchmark(PRESETS[args.preset], args.engines, args.seed, args.generations, args.max_seconds)
+    save_report(report, args.output)
+    print(f"[LOG] Benchmark results written to {args.output}", flush=True)
+
+    if args.plot:
+        plot_scaling_curves(report, args.plot)
+
+    if args.baseline is None:
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = compare_to_baseline(report, baseline, args.threshold)
+    for r in regressions:
+        print(f"[LOG] Regression {r['case']} {r['metric']}: {r['baseline']:.4g} -> {r['current']:.4g} "
+              f"({r['change']:+.1%})", flush=True)
+    if not regressions:
+        print(f"[LOG] No regressions beyond {args.threshold:.0%} against {args.baseline}", flush=True)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,264 @@
+from __future__ import annotations
+
+import contextlib
+import itertools
+import json
+import math
+import multiprocessing as mp
+import os
+import platform
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from lifesim.utils.memory_monitor import get_resident_memory
+from lifesim.utils.rng import rng
+from lifesim.utils.utils import get_time_now
+
+ENGINES: tuple[str, ...] = ("object", "compiled", "tiled", "batched")
+
+BENCHMARK_DIRECTORY: str = "./simulations/benchmarks"
+
+# settings shared by every case; selection and reproduction are part of what is measured
+BASE_CONFIG: dict = {
+    "steps_per_generation": 100,
+    "selection_condition": "bottom_right_square",
+    "fresh_minds": 10,
+    "gene_mutation_probability": 1 / 10_000,
+    "plateau_window": 0,
+    "phase_timing": True,
+    "mask_cache_directory": None,
+}
+
+# fixed matrices over the shape parameters; every combination is one case per engine
+PRESETS: dict[str, dict[str, list]] = {
+    "quick": {
+        "grid_size": [64],
+        "max_entity_count": [250, 1000],
+        "brain_size": [4, 10],
+        "max_internal_neurons": [0, 8],
+    },
+    "full": {
+        "grid_size": [64, 128, 256],
+        "max_entity_count": [250, 1000, 4000],
+        "brain_size": [4, 10, 24],
+        "max_internal_neurons": [0, 8],
+    },
+    # entity counts on a grid sized for a constant density, see get_scaling_grid_size
+    "scaling": {
+        "max_entity_count": [250, 1_000, 4_000, 16_000, 64_000, 250_000, 1_000_000],
+        "brain_size": [10],
+        "max_internal_neurons": [8],
+    },
+}
+
+SCALING_DENSITY: float = 0.05
+
+# metric -> True when larger is better
+COMPARED_METRICS: dict[str, bool] = {
+    "steps_per_second": True,
+    "entity_steps_per_second": True,
+    "brain_init_seconds": False,
+    "reproduction_seconds": False,
+    "peak_memory_bytes": False,
+}
+
+
+def get_scaling_grid_size(entity_count: int) -> int:
+    return max(16, math.ceil(math.sqrt(entity_count / SCALING_DENSITY)))
+
+
+def get_case_name(engine: str, parameters: dict) -> str:
+    return engine + "".join(f"-{k}={v}" for k, v in sorted(parameters.items()))
+
+
+def get_cases(matrix: dict[str, list], engines: list[str]) -> list[tuple[str, dict]]:
+    keys = list(matrix)
+    return [
+        (engine, dict(zip(keys, values)))
+        for values in itertools.product(*(matrix[k] for k in keys))
+        for engine in engines
+    ]
+
+
+def get_case_config(engine: str, parameters: dict, generations: int, directory: str) -> dict:
+    parameters = dict(parameters)
+    grid_size = parameters.pop("grid_size", None) or get_scaling_grid_size(parameters["max_entity_count"])
+    parameters.pop("batch_size", None)
+    parameters.pop("tile_count", None)
+    config = {
+        **BASE_CONFIG,
+        **parameters,
+        "grid_width": grid_size,
+        "grid_height": grid_size,
+        "max_generations": generations,
+        "name": get_case_name(engine, parameters),
+        "simulation_directory": directory,
+    }
+    if engine == "compiled":
+        config["brain_precision"] = "float32"
+    return config
+
+
+def run_case(engine: str, parameters: dict, seed: int, generations: int, max_seconds: float | None,
+             directory: str) -> dict:
+    # runs in a fresh worker process, so peak RSS belongs to this case alone
+    from lifesim.core.batched_simulation import BatchedSimulation
+    from lifesim.core.simulation import Simulation
+    from lifesim.core.tiled_simulation import TiledSimulation
+
+    rng.reseed(seed)
+    config = get_case_config(engine, parameters, generations, directory)
+    if max_seconds is not None:
+        config["max_wall_clock_seconds"] = max_seconds
+
+    simulation: Simulation | BatchedSimulation
+    if engine == "batched":
+        batch_size = parameters.get("batch_size", 8)
+        configs = [{**config, "simulation_directory": os.path.join(directory, str(i))} for i in range(batch_size)]
+        simulation = BatchedSimulation(configs)
+        simulations = batch_size
+    elif engine == "tiled":
+        simulation = TiledSimulation({**config, "tile_count": parameters.get("tile_count", 4)})
+        simulations = 1
+    elif engine in ("object", "compiled"):
+        simulation = Simulation(config)
+        simulations = 1
+    else:
+        raise ValueError(f"Unknown engine '{engine}', expected one of {', '.join(ENGINES)}")
+
+    start_time = time.perf_counter()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        simulation.start()
+    seconds = time.perf_counter() - start_time
+
+    if isinstance(simulation, BatchedSimulation):
+        steps = simulation.members[0].steps_total
+        generations_run = simulation.current_generation - 1
+    else:
+        steps = simulation.steps_total
+        generations_run = simulation.current_generation - 1
+    timings = simulation.phase_timer.summary()
+    # peak RSS of this process; for tiled runs that is the coordinator, tile workers are not included
+    _, peak_memory = get_resident_memory()
+
+    return {
+        "engine": engine,
+        "parameters": parameters,
+        "seed": seed,
+        "generations": generations_run,
+        "seconds": seconds,
+        "steps_per_second": steps / seconds if seconds else 0.0,
+        "entity_steps_per_second": steps * config["max_entity_count"] * simulations / seconds if seconds else 0.0,
+        "brain_init_seconds": timings["brain_init"]["mean_seconds_per_generation"],
+        "reproduction_seconds": timings["reproduction"]["mean_seconds_per_generation"],
+        "peak_memory_bytes": peak_memory,
+        "phase_seconds": {phase: t["total_seconds"] for phase, t in timings.items()},
+    }
+
+
+def get_scaling_curves(results: list[dict]) -> dict[str, list[list[float]]]:
+    # engine -> [[entity count, entity steps per second], ...] averaged over the other parameters
+    points: dict[str, dict[int, list[float]]] = {}
+    for result in results:
+        count = result["parameters"]["max_entity_count"]
+        points.setdefault(result["engine"], {}).setdefault(count, []).append(result["entity_steps_per_second"])
+    return {
+        engine: [[count, float(np.mean(values))] for count, values in sorted(by_count.items())]
+        for engine, by_count in points.items()
+    }
+
+
+def get_environment() -> dict:
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "time": get_time_now(),
+    }
+
+
+def run_benchmark(matrix: dict[str, list], engines: list[str], seed: int = 0, generations: int = 3,
+                  max_seconds: float | None = None, directory: str = BENCHMARK_DIRECTORY) -> dict:
+    # cases run one after another, each in its own spawned process; parallel cases would compete
+    # for cores and memory bandwidth and skew each other's numbers
+    cases = get_cases(matrix, engines)
+    results: list[dict] = []
+    context = mp.get_context("spawn")
+
+    for i, (engine, parameters) in enumerate(cases):
+        case_directory = os.path.join(directory, get_case_name(engine, parameters))
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            future = pool.submit(run_case, engine, parameters, seed, generations, max_seconds, case_directory)
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"[LOG] Benchmark case {get_case_name(engine, parameters)} failed: {e}", flush=True)
+                continue
+        shutil.rmtree(case_directory, ignore_errors=True)
+
+        results.append(result)
+        print(f"[LOG] Benchmark {i + 1}/{len(cases)} {get_case_name(engine, parameters)}: "
+              f"{result['steps_per_second']:.1f} steps/s, {result['entity_steps_per_second']:.0f} entity steps/s, "
+              f"peak {result['peak_memory_bytes'] / 2**20:.0f} MiB", flush=True)
+
+    return {
+        "environment": get_environment(),
+        "seed": seed,
+        "generations": generations,
+        "matrix": matrix,
+        "results": results,
+        "scaling_curves": get_scaling_curves(results),
+    }
+
+
+def compare_to_baseline(current: dict, baseline: dict, threshold: float = 0.1) -> list[dict]:
+    # every metric of a case present in both runs that got worse by more than `threshold` (relative)
+    baseline_results = {get_case_name(r["engine"], r["parameters"]): r for r in baseline["results"]}
+    regressions: list[dict] = []
+
+    for result in current["results"]:
+        name = get_case_name(result["engine"], result["parameters"])
+        reference = baseline_results.get(name)
+        if reference is None:
+            continue
+        for metric, larger_is_better in COMPARED_METRICS.items():
+            old, new = reference.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if (-change if larger_is_better else change) > threshold:
+                regressions.append({"case": name, "metric": metric, "baseline": old, "current": new, "change": change})
+
+    return regressions
+
+
+def plot_scaling_curves(report: dict, path: str) -> None:
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(8, 5))
+    for engine, points in report["scaling_curves"].items():
+        counts, rates = zip(*points)
+        ax.plot(counts, rates, marker="o", label=engine)
+    ax.set_xscale("log")
+    ax.set_yscale("log")
+    ax.set_xlabel("Entities")
+    ax.set_ylabel("Entity steps per second")
+    ax.grid(True, which="both", alpha=0.3)
+    ax.legend()
+    fig.savefig(path, bbox_inches="tight")
+    plt.close(fig)
+
+
+def save_report(report: dict, path: str) -> None:
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=4)
+    os.replace(temp_path, path)
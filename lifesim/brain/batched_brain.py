@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+import itertools
+
+import numpy as np
+
+
+class GenomeEdges:
+    # Connections that survive Brain.connect_neurons for one genome. Sources are node ids (inputs
+    # [0, I), internals [I, I + K)), targets are slot ids (internals [0, K), outputs [K, K + O)).
+    # levels[e] is the depth of the source node, so edges of level L only read finished values.
+    def __init__(self, sources: list[int], targets: list[int], weights: list[float], levels: list[int],
+                 description: str) -> None:
+        self.sources: list[int] = sources
+        self.targets: list[int] = targets
+        self.weights: list[float] = weights
+        self.levels: list[int] = levels
+        self.description: str = description
+
+
+def compile_genome(genes: list[int], input_names: list[str], output_names: list[str], internal_count: int) -> GenomeEdges:
+    # Same wiring rules as Brain.connect_neurons (no duplicates, no reverse edges, no cycles),
+    # on plain ints instead of Neuron objects
+    input_count = len(input_names)
+    output_count = len(output_names)
+
+    edges: dict[tuple[int, int], float] = {}
+    internal_outputs: list[set[int]] = [set() for _ in range(internal_count)]
+    description = ''
+
+    def reaches(start: int, goal: int) -> bool:
+        stack, seen = [start], {start}
+        while stack:
+            node = stack.pop()
+            if node == goal:
+                return True
+            for n in internal_outputs[node] - seen:
+                seen.add(n)
+                stack.append(n)
+        return False
+
+    for gene in genes:
+        tip_is_input = bool((gene >> 31) & 1) or internal_count == 0
+        end_is_output = bool((gene >> 23) & 1) or internal_count == 0
+        tip_id = (gene >> 24) & 0b111_1111
+        end_id = (gene >> 16) & 0b111_1111
+        weight = (gene & 0xFFFF) / 0xFFFF * 8 - 4
+
+        if tip_is_input:
+            tip = tip_id % input_count
+            tip_name = input_names[tip]
+        else:
+            tip = input_count + tip_id % internal_count
+            tip_name = f'internal_{tip - input_count + 1}'
+
+        if end_is_output:
+            end = internal_count + end_id % output_count
+            end_name = output_names[end - internal_count]
+        else:
+            end = end_id % internal_count
+            end_name = f'internal_{end + 1}'
+
+        description += f'{tip_name} {end_name} {weight:.2f}\n'
+
+        if (tip, end) in edges:
+            continue
+        if not tip_is_input and not end_is_output:
+            tip_internal = tip - input_count
+            if tip_internal == end or tip_internal in internal_outputs[end] or reaches(end, tip_internal):
+                continue
+            internal_outputs[tip_internal].add(end)
+        edges[(tip, end)] = weight
+
+    internal_sources: list[list[int]] = [[] for _ in range(internal_count)]
+    for tip, end in edges:
+        if end < internal_count:
+            internal_sources[end].append(tip)
+
+    internal_levels: dict[int, int] = {}
+
+    def level_of(node: int) -> int:
+        if node < input_count:
+            return 0
+        internal = node - input_count
+        if internal not in internal_levels:
+            sources = internal_sources[internal]
+            internal_levels[internal] = 1 + max(level_of(s) for s in sources) if sources else 0
+        return internal_levels[internal]
+
+    pairs = list(edges)
+    return GenomeEdges(
+        [s for s, _ in pairs],
+        [t for _, t in pairs],
+        list(edges.values()),
+        [level_of(s) for s, _ in pairs],
+        description
+    )
+
+
+class BatchedBrains:
+    # Every brain of a batch as one flat edge list, evaluated with one scatter-add per depth level.
+    # Genomes are compiled once per distinct gene sequence and reused across entities and generations.
+    def __init__(self, input_names: list[str], output_names: list[str], internal_count: int) -> None:
+        self.input_names: list[str] = input_names
+        self.output_names: list[str] = output_names
+        self.input_count: int = len(input_names)
+        self.output_count: int = len(output_names)
+        self.internal_count: int = internal_count
+
+        self.cache: dict[bytes, GenomeEdges] = {}
+        self.cache_hits: int = 0
+        self.cache_misses: int = 0
+        self.descriptions: list[str] = []
+        self.brain_count: int = 0
+        self.sources: np.ndarray = np.empty(0, dtype=np.int64)
+        self.targets: np.ndarray = np.empty(0, dtype=np.int64)
+        self.weights: np.ndarray = np.empty(0, dtype=np.float64)
+        self.level_bounds: np.ndarray = np.zeros(1, dtype=np.int64)
+        self.finished_nodes: list[np.ndarray] = []
+        self.finished_slots: list[np.ndarray] = []
+
+    @property
+    def node_count(self) -> int:
+        return self.input_count + self.internal_count
+
+    @property
+    def slot_count(self) -> int:
+        return self.internal_count + self.output_count
+
+    def compile(self, genomes: np.ndarray, lengths: np.ndarray) -> None:
+        # genomes: (B, G) uint32, padded past lengths[b]
+        brain_count = len(genomes)
+        cache: dict[bytes, GenomeEdges] = {}
+        unique: list[GenomeEdges] = []
+        unique_ids: dict[bytes, int] = {}
+        brain_unique = np.empty(brain_count, dtype=np.int64)
+
+        for b in range(brain_count):
+            key = genomes[b, :lengths[b]].tobytes()
+            uid = unique_ids.get(key)
+            if uid is None:
+                edges = self.cache.get(key)
+                if edges is None:
+                    genes = [int(g) for g in genomes[b, :lengths[b]]]
+                    edges = compile_genome(genes, self.input_names, self.output_names, self.internal_count)
+                    self.cache_misses += 1
+                else:
+                    self.cache_hits += 1
+                cache[key] = edges
+                uid = unique_ids[key] = len(unique)
+                unique.append(edges)
+            else:
+                self.cache_hits += 1
+            brain_unique[b] = uid
+
+        # only the genomes still alive stay cached
+        self.cache = cache
+        self.descriptions = [unique[uid].description for uid in brain_unique]
+        self.brain_count = brain_count
+
+        counts = np.array([len(e.sources) for e in unique], dtype=np.int64)
+        offsets = np.concatenate(([0], np.cumsum(counts)))
+        unique_sources = np.fromiter(itertools.chain.from_iterable(e.sources for e in unique), dtype=np.int64)
+        unique_targets = np.fromiter(itertools.chain.from_iterable(e.targets for e in unique), dtype=np.int64)
+        unique_weights = np.fromiter(itertools.chain.from_iterable(e.weights for e in unique), dtype=np.float64)
+        unique_levels = np.fromiter(itertools.chain.from_iterable(e.levels for e in unique), dtype=np.int64)
+
+        brain_counts = counts[brain_unique]
+        total = int(brain_counts.sum())
+        owner = np.repeat(np.arange(brain_count), brain_counts)
+        within = np.arange(total) - np.repeat(np.cumsum(brain_counts) - brain_counts, brain_counts)
+        e = np.repeat(offsets[brain_unique], brain_counts) + within
+
+        levels = unique_levels[e]
+        order = np.argsort(levels, kind="stable")
+        levels = levels[order]
+        owner = owner[order]
+        self.sources = owner * self.node_count + unique_sources[e][order]
+        self.targets = owner * self.slot_count + unique_targets[e][order]
+        self.weights = unique_weights[e][order]
+        level_count = int(levels[-1]) + 1 if total else 0
+        self.level_bounds = np.searchsorted(levels, np.arange(level_count + 1))
+
+        # internal nodes read by level L edges are finished right before level L is summed
+        self.finished_nodes = []
+        self.finished_slots = []
+        for level in range(1, level_count):
+            a, b = self.level_bounds[level], self.level_bounds[level + 1]
+            nodes = np.unique(self.sources[a:b])
+            self.finished_nodes.append(nodes)
+            self.finished_slots.append(nodes // self.node_count * self.slot_count + nodes % self.node_count - self.input_count)
+
+    def process(self, inputs: np.ndarray) -> np.ndarray:
+        # inputs: (B, I) -> output activations (B, O); outputs without connections stay at 0
+        values = np.zeros((self.brain_count, self.node_count))
+        values[:, :self.input_count] = inputs
+        flat_values = values.ravel()
+
+        sums = np.zeros(self.brain_count * self.slot_count)
+        for level in range(len(self.level_bounds) - 1):
+            if level > 0:
+                flat_values[self.finished_nodes[level - 1]] = np.tanh(sums[self.finished_slots[level - 1]])
+            a, b = self.level_bounds[level], self.level_bounds[level + 1]
+            np.add.at(sums, self.targets[a:b], flat_values[self.sources[a:b]] * self.weights[a:b])
+
+        return np.tanh(sums.reshape(-1, self.slot_count)[:, self.internal_count:])
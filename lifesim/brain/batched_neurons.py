@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+from collections.abc import Callable
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from lifesim.evolution.safe_zone_field import DIRECTION_DX, DIRECTION_DY
+from lifesim.utils.direction import Direction
+from lifesim.utils.direction_map import ABSOLUTE_DIRECTION_MAPPING
+from lifesim.utils.rng import rng
+
+if TYPE_CHECKING:
+    from lifesim.core.batched_simulation import BatchedSimulation
+
+# Array versions of the neurons in neurons.py. Input functions return one value per entity,
+# shaped (S, N) or broadcastable to it; output neurons map to a movement action.
+
+DIRECTIONS: list[Direction] = list(Direction)
+DX: np.ndarray = np.array([d.value[0] for d in DIRECTIONS], dtype=np.int64)
+DY: np.ndarray = np.array([d.value[1] for d in DIRECTIONS], dtype=np.int64)
+
+# RELATIVE_DIRECTIONS[facing, relative] -> absolute direction index
+RELATIVE_DIRECTIONS: np.ndarray = np.array([
+    [DIRECTIONS.index(ABSOLUTE_DIRECTION_MAPPING[(facing, relative)]) for relative in DIRECTIONS]
+    for facing in DIRECTIONS
+], dtype=np.int64)
+
+ACTION_STAY: int = 0
+ACTION_ABSOLUTE: int = 1
+ACTION_RELATIVE: int = 2
+ACTION_RANDOM: int = 3
+
+
+# ======= INPUT NEURON FUNCTIONS =======
+
+def get_location_vertically(batch: BatchedSimulation) -> np.ndarray:
+    return 1 - batch.ys / batch.settings.grid_height
+
+
+def get_location_horizontally(batch: BatchedSimulation) -> np.ndarray:
+    return 1 - batch.xs / batch.settings.grid_width
+
+
+def get_distance_east(batch: BatchedSimulation) -> np.ndarray:
+    return batch.xs / batch.settings.grid_width
+
+
+def get_distance_south(batch: BatchedSimulation) -> np.ndarray:
+    return batch.ys / batch.settings.grid_height
+
+
+def get_age(batch: BatchedSimulation) -> np.ndarray:
+    return np.full(batch.xs.shape, batch.cached_inputs['age'])
+
+
+def random_float(batch: BatchedSimulation) -> np.ndarray:
+    return rng.np.random(batch.xs.shape)
+
+
+def oscilator_input(batch: BatchedSimulation) -> np.ndarray:
+    return np.full(batch.xs.shape, batch.cached_inputs['oscillator'])
+
+
+def get_entities_alive(batch: BatchedSimulation) -> np.ndarray:
+    # the population is refilled to max_entity_count every generation and nothing dies mid-generation
+    return np.ones(batch.xs.shape)
+
+
+def blockage(batch: BatchedSimulation, direction: np.ndarray | int) -> np.ndarray:
+    x = batch.xs + DX[direction]
+    y = batch.ys + DY[direction]
+    inside = (x >= 0) & (x < batch.settings.grid_width) & (y >= 0) & (y < batch.settings.grid_height)
+    occupied = batch.occupancy[batch.sim_index, np.where(inside, y, 0), np.where(inside, x, 0)]
+    return (~inside | occupied).astype(np.float64)
+
+
+def get_blockage_forward(batch: BatchedSimulation) -> np.ndarray:
+    return blockage(batch, batch.facing)
+
+
+def get_blockage_north(batch: BatchedSimulation) -> np.ndarray:
+    return blockage(batch, DIRECTIONS.index(Direction.UP))
+
+
+def get_blockage_east(batch: BatchedSimulation) -> np.ndarray:
+    return blockage(batch, DIRECTIONS.index(Direction.RIGHT))
+
+
+def get_blockage_south(batch: BatchedSimulation) -> np.ndarray:
+    return blockage(batch, DIRECTIONS.index(Direction.DOWN))
+
+
+def get_blockage_west(batch: BatchedSimulation) -> np.ndarray:
+    return blockage(batch, DIRECTIONS.index(Direction.LEFT))
+
+
+def get_population_density(batch: BatchedSimulation) -> np.ndarray:
+    return batch.neighbor_sensing().density.reshape(batch.xs.shape)
+
+
+def get_nearest_neighbor_distance(batch: BatchedSimulation) -> np.ndarray:
+    return batch.neighbor_sensing().nearest_distance.reshape(batch.xs.shape)
+
+
+def get_neighbor_forward(batch: BatchedSimulation) -> np.ndarray:
+    return batch.neighbor_sensing().forward_neighbor.reshape(batch.xs.shape).astype(np.float64)
+
+
+def meets_condition_input(batch: BatchedSimulation) -> np.ndarray:
+    return batch.selection_masks[batch.sim_index, batch.ys, batch.xs].astype(np.float64)
+
+
+def get_safe_zone_distance(batch: BatchedSimulation) -> np.ndarray:
+    distance = batch.safe_zone_distances[batch.sim_index, batch.ys, batch.xs]
+    return np.minimum(1.0, distance / max(batch.settings.grid_width, batch.settings.grid_height))
+
+
+def get_safe_zone_direction_x(batch: BatchedSimulation) -> np.ndarray:
+    return DIRECTION_DX[batch.safe_zone_directions[batch.sim_index, batch.ys, batch.xs]]
+
+
+def get_safe_zone_direction_y(batch: BatchedSimulation) -> np.ndarray:
+    return DIRECTION_DY[batch.safe_zone_directions[batch.sim_index, batch.ys, batch.xs]]
+
+
+def get_safe_zone_forward(batch: BatchedSimulation) -> np.ndarray:
+    index = batch.safe_zone_directions[batch.sim_index, batch.ys, batch.xs]
+    dx, dy = DIRECTION_DX[index], DIRECTION_DY[index]
+    facing_x, facing_y = DX[batch.facing], DY[batch.facing]
+    norm = np.sqrt((facing_x ** 2 + facing_y ** 2) * (dx ** 2 + dy ** 2))
+    return np.divide(facing_x * dx + facing_y * dy, norm, out=np.zeros(norm.shape), where=norm > 0)
+
+
+batched_input_functions: dict[str, Callable[[BatchedSimulation], np.ndarray]] = {
+    'I_location_vertically': get_location_vertically,
+    'I_location_horizontally': get_location_horizontally,
+    'I_distance_to_north_border': get_location_vertically,
+    'I_distance_to_east_border': get_distance_east,
+    'I_distance_to_south_border': get_distance_south,
+    'I_distance_to_west_border': get_location_horizontally,
+    'I_age': get_age,
+    'I_random_float': random_float,
+    'I_blockage_forward': get_blockage_forward,
+    'I_oscilator_input': oscilator_input,
+    'I_blockage_north': get_blockage_north,
+    'I_blockage_east': get_blockage_east,
+    'I_blockage_south': get_blockage_south,
+    'I_blockage_west': get_blockage_west,
+    'entities_alive': get_entities_alive,
+    'I_population_density': get_population_density,
+    'I_nearest_neighbor_distance': get_nearest_neighbor_distance,
+    'I_neighbor_forward': get_neighbor_forward,
+    'I_meets_condition': meets_condition_input,
+    'I_safe_zone_distance': get_safe_zone_distance,
+    'I_safe_zone_direction_x': get_safe_zone_direction_x,
+    'I_safe_zone_direction_y': get_safe_zone_direction_y,
+    'I_safe_zone_forward': get_safe_zone_forward,
+}
+
+
+# ======= OUTPUT NEURON ACTIONS =======
+# (action kind, direction index); relative directions are turned by the entity's facing
+
+batched_output_actions: dict[str, tuple[int, int]] = {
+    'O_move_forward': (ACTION_RELATIVE, DIRECTIONS.index(Direction.UP)),
+    'O_reverse': (ACTION_RELATIVE, DIRECTIONS.index(Direction.DOWN)),
+    'O_move_random': (ACTION_RANDOM, 0),
+    'O_stay_still': (ACTION_STAY, 0),
+    'O_move_north': (ACTION_ABSOLUTE, DIRECTIONS.index(Direction.UP)),
+    'O_move_east': (ACTION_ABSOLUTE, DIRECTIONS.index(Direction.RIGHT)),
+    'O_move_south': (ACTION_ABSOLUTE, DIRECTIONS.index(Direction.DOWN)),
+    'O_move_west': (ACTION_ABSOLUTE, DIRECTIONS.index(Direction.LEFT)),
+}
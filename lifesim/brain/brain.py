@@ -1,27 +1,85 @@
 from __future__ import annotations
 
-from collections.abc import Callable
+import time
+from collections.abc import Callable, Iterator
 from typing import TYPE_CHECKING
 
+from lifesim.brain.compiled_brain import CompiledBrain
 from lifesim.brain.connection import ConnectionEndType, ConnectionTipType
+from lifesim.brain.gene import Gene
 from lifesim.brain.genome import Genome
 from lifesim.brain.neuron import Neuron
 from lifesim.brain.neuron_type import NeuronType
 from lifesim.brain.neurons import get_fresh_neurons
+from lifesim.brain.precision import BrainPrecision
 
 if TYPE_CHECKING:
-    from lifesim.common.typing import Entity
+    from lifesim.common.typing import Entity, SimulationSettings
+    from lifesim.utils.phase_timer import PhaseTimer
+
+
+def iter_connections(genome: Genome, neurons: list[Neuron]) -> Iterator[tuple[Neuron, Neuron, Gene]]:
+    # the (input, output) neuron pair every gene asks for, picked from a fresh neuron list;
+    # the yielded Gene is one decoding view re-pointed at each code, read it before advancing
+    genes = genome.genes
+    assert genes is not None  # for mypy
+
+    input_neurons = [n for n in neurons if n.type == NeuronType.INPUT]
+    output_neurons = [n for n in neurons if n.type == NeuronType.OUTPUT]
+    internal_neurons = [n for n in neurons if n.type == NeuronType.INTERNAL]
+
+    gene = Gene(0)
+    for code in genes:
+        gene.gene = code
+
+        if gene.conn_tip_neuron_type == ConnectionTipType.INPUT or not internal_neurons:
+            input_neuron_list = input_neurons
+        else:
+            input_neuron_list = internal_neurons
+
+        if gene.conn_end_neuron_type == ConnectionEndType.OUTPUT or not internal_neurons:
+            output_neuron_list = output_neurons
+        else:
+            output_neuron_list = internal_neurons
+
+        input_neuron: Neuron = input_neuron_list[gene.conn_tip_neuron_id % len(input_neuron_list)]
+        output_neuron: Neuron = output_neuron_list[gene.conn_end_neuron_id % len(output_neuron_list)]
+        yield input_neuron, output_neuron, gene
+
+
+def build_neurons(genome: Genome, settings: SimulationSettings) -> list[Neuron]:
+    # the executable graph of a genome: fresh neurons wired by every gene, topologically sorted,
+    # pruned and frozen; draws nothing from rng, so it can run in any process
+    neurons = get_fresh_neurons(settings)
+    for input_neuron, output_neuron, gene in iter_connections(genome, neurons):
+        try:
+            Neuron.connect_neurons(input_neuron, output_neuron, gene.conn_weight)
+        except ValueError:
+            pass
+    Neuron.sort(neurons)
+    Neuron.filter_and_prune(neurons)
+    Neuron.freeze(neurons)
+    return neurons
+
 
 class Brain:
+    __slots__ = ("genome", "entity", "neurons", "compiled")
+
     def __init__(self, genome: Genome, entity: Entity) -> None:
         self.genome: Genome = genome
         self.entity: Entity = entity
         
         self.neurons: list[Neuron] = []
-        self.brain_str: str = ''
+        self.compiled: CompiledBrain | None = None
 
     def __str__(self) -> str:
-        return self.brain_str
+        # rebuilt from the genome on demand instead of kept per entity, only a few brains per
+        # generation are ever printed
+        neurons = get_fresh_neurons(self.entity.simulation.settings)
+        return ''.join(
+            f'{input_neuron.name} {output_neuron.name} {gene.conn_weight:.2f}\n'
+            for input_neuron, output_neuron, gene in iter_connections(self.genome, neurons)
+        )
     
     def __repr__(self):
         return self.__str__()
@@ -38,53 +96,28 @@ class Brain:
     def internal_neurons(self) -> list[Neuron]:
         return [n for n in self.neurons if n.type == NeuronType.INTERNAL]
     
-    def connect_neurons(self) -> None:
-        self.brain_str = ''
-        genes = self.genome.genes
-        assert genes is not None  # for mypy
-        # print(genes)
-
-        for gene in genes:
-            input_neuron_list: list[Neuron] = list()
-            output_neuron_list: list[Neuron] = list()
-
-            if gene.conn_tip_neuron_type == ConnectionTipType.INPUT or not self.internal_neurons:
-                input_neuron_list = self.input_neurons
-            elif gene.conn_tip_neuron_type == ConnectionTipType.INTERNAL:
-                input_neuron_list = self.internal_neurons
-
-            if gene.conn_end_neuron_type == ConnectionEndType.OUTPUT or not self.internal_neurons:
-                output_neuron_list = self.output_neurons
-            elif gene.conn_end_neuron_type == ConnectionEndType.INTERNAL:
-                output_neuron_list = self.internal_neurons
-            
-            input_neuron: Neuron = input_neuron_list[gene.conn_tip_neuron_id % len(input_neuron_list)]
-            output_neuron: Neuron = output_neuron_list[gene.conn_end_neuron_id % len(output_neuron_list)]
-            
-            try:
-                # print("Trying to connect neurons:")
-                # print(f'INPUT NEURON: ({input_neuron.type.name}) "{input_neuron.name}"')
-                # print('AND')
-                # print(f'OUTPUT NEURON: ({output_neuron.type.name}) "{output_neuron.name}"')
-                # print(f'Potential connection weight: <{gene.conn_weight}>')
-                
-                Neuron.connect_neurons(input_neuron, output_neuron, gene.conn_weight) 
-                # print(f"STATUS: <SUCCESS>")
-            except ValueError:
-                pass
-                # print("STATUS <FAILED>")
-                # print(f'Reason: {e}')
-            self.brain_str += f'{input_neuron.name} {output_neuron.name} {gene.conn_weight:.2f}\n'
-
-
-
     def init(self) -> None:
-        self.neurons = get_fresh_neurons(self.entity.simulation.settings)
-        self.connect_neurons()
-        Neuron.sort(self.neurons)
-        Neuron.filter_and_prune(self.neurons)
+        self.load(build_neurons(self.genome, self.entity.simulation.settings))
+
+    def load(self, neurons: list[Neuron]) -> None:
+        # attach a built neuron graph, from build_neurons here or decoded from a BrainCompiler
+        self.neurons = neurons
+        precision: BrainPrecision = self.entity.simulation.settings.brain_precision
+        if precision != BrainPrecision.FLOAT64:
+            self.compiled = CompiledBrain(self.neurons, precision)
 
     def process(self) -> None:
+        timer: PhaseTimer = self.entity.simulation.phase_timer
+        if self.compiled is not None:
+            if timer.neuron_timing:
+                self.compiled.process_timed(self.entity, timer)
+            else:
+                self.compiled.process(self.entity)
+            return
+        if timer.neuron_timing:
+            self.process_timed(timer)
+            return
+
         def _noop(): 
             return None
         
@@ -105,4 +138,29 @@ class Brain:
         try:
             final_action(self.entity)
         except Exception:
-            pass
\ No newline at end of file
+            pass
+
+    def process_timed(self, timer: PhaseTimer) -> None:
+        # same neuron order as process, so rng draws and results do not change with timing on;
+        # input neurons are charged to sensing, internal ones to brain_eval and output neurons,
+        # including the action they fire, to actions
+        clock = time.perf_counter_ns
+        sensing = brain_eval = actions = 0
+        last = clock()
+
+        for n in self.neurons:
+            if n.type == NeuronType.INPUT:
+                n.execute_as_input_neuron(self.entity)
+                now = clock()
+                sensing += now - last
+            elif n.type == NeuronType.INTERNAL:
+                n.execute_as_internal_neuron()
+                now = clock()
+                brain_eval += now - last
+            else:
+                n.execute_as_output_neuron(self.entity)
+                now = clock()
+                actions += now - last
+            last = now
+
+        timer.add_step(sensing, brain_eval, actions)
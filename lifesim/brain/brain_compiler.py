@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import math
+import multiprocessing as mp
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from lifesim.brain.brain import build_neurons
+from lifesim.brain.genome import Genome, get_max_genome_length
+from lifesim.brain.neuron import Neuron
+from lifesim.brain.neurons import get_neuron_templates
+
+if TYPE_CHECKING:
+    from lifesim.core.entity import Entity
+    from lifesim.core.simulation_settings import SimulationSettings
+
+# upper bound of genomes per task, smaller populations are split evenly over the workers
+CHUNK_SIZE: int = 512
+
+# The brains of one task as compact arrays:
+#   neuron_counts (B,)  neurons kept by every brain
+#   neurons       (K,)  template index of every kept neuron, in execution order
+#   input_counts  (K,)  incoming connections of every kept neuron
+#   inputs        (E,)  position of every source neuron within its brain
+#   weights       (E,)  weight of every connection, float64 like Gene.conn_weight
+Topologies = tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+
+# settings of the pool worker this module runs in, set once by the pool initializer
+_worker_settings: SimulationSettings | None = None
+
+
+def init_worker(settings: SimulationSettings) -> None:
+    global _worker_settings
+    _worker_settings = settings
+
+
+def encode_topologies(brains: list[list[Neuron]], template_index: dict[str, int]) -> Topologies:
+    neurons: list[int] = []
+    input_counts: list[int] = []
+    inputs: list[int] = []
+    weights: list[float] = []
+
+    for brain in brains:
+        position = {n: i for i, n in enumerate(brain)}
+        for n in brain:
+            neurons.append(template_index[n.name])
+            input_counts.append(len(n.input_neurons))
+            inputs.extend(position[src] for src in n.input_neurons)
+            weights.extend(n.input_weights)
+
+    return (
+        np.array([len(brain) for brain in brains], dtype=np.int16),
+        np.array(neurons, dtype=np.int16),
+        np.array(input_counts, dtype=np.int16),
+        np.array(inputs, dtype=np.int16),
+        np.array(weights, dtype=np.float64),
+    )
+
+
+def decode_topologies(topologies: Topologies, templates: list[Neuron]) -> list[list[Neuron]]:
+    # Neuron graphs that execute like those build_neurons returns: same neurons, inputs and weights
+    # in the same order; output links, only used while sorting, come in execution order. Sources
+    # always come before their targets, so every input already exists when its target is created.
+    neuron_counts, neurons, input_counts, inputs, weights = (a.tolist() for a in topologies)
+    brains: list[list[Neuron]] = []
+    k = e = 0
+
+    for count in neuron_counts:
+        brain: list[Neuron] = []
+        outputs: list[list[Neuron]] = []
+        for _ in range(count):
+            template = templates[neurons[k]]
+            neuron = Neuron(template.name, template.type, input_func=template.input_func,
+                            output_func=template.output_func)
+            sources = [brain[i] for i in inputs[e:e + input_counts[k]]]
+            neuron.input_neurons = tuple(sources)
+            neuron.input_weights = tuple(weights[e:e + input_counts[k]])
+            for i in inputs[e:e + input_counts[k]]:
+                outputs[i].append(neuron)
+            e += input_counts[k]
+            k += 1
+            brain.append(neuron)
+            outputs.append([])
+
+        for neuron, targets in zip(brain, outputs):
+            neuron.output_neurons = tuple(targets)
+        brains.append(brain)
+    return brains
+
+
+def compile_topologies(genomes: np.ndarray, lengths: np.ndarray) -> Topologies:
+    # runs in a pool worker
+    settings = _worker_settings
+    assert settings is not None  # for mypy
+    template_index = {n.name: i for i, n in enumerate(get_neuron_templates(settings))}
+    brains = [build_neurons(Genome(genes=genomes[i, :lengths[i]]), settings) for i in range(len(genomes))]
+    return encode_topologies(brains, template_index)
+
+
+class BrainCompiler:
+    # Persistent process pool that builds the brains of a generation as soon as its genomes exist.
+    # submit() packs the genomes into chunks and returns at once, so the coordinator carries on
+    # with the end of the previous generation (video hand-off, placement, memory sampling) while
+    # the workers wire, sort and prune. load() waits for what is still running and attaches the
+    # decoded graphs; the gap between generations is then bounded by the slower of the two sides
+    # instead of their sum. Building draws nothing from rng, so seeded runs do not change.
+    def __init__(self, settings: SimulationSettings, workers: int) -> None:
+        if workers < 1:
+            raise ValueError("Brain compiler needs at least one worker")
+        self.settings: SimulationSettings = settings
+        self.workers: int = workers
+        self.templates: list[Neuron] = get_neuron_templates(settings)
+        self.width: int = get_max_genome_length(settings.brain_size)
+        self.executor: ProcessPoolExecutor | None = None
+        self.pending: list[tuple[list[Genome], Future]] = []
+
+    def start(self) -> None:
+        if self.executor is None:
+            # spawn, not fork: the coordinator usually runs on a thread next to the render UI
+            self.executor = ProcessPoolExecutor(
+                self.workers, mp_context=mp.get_context("spawn"), initializer=init_worker, initargs=(self.settings,)
+            )
+
+    def submit(self, entities: list[Entity]) -> None:
+        self.start()
+        assert self.executor is not None  # for mypy
+        self.cancel()
+
+        genomes = [e.brain.genome for e in entities]
+        chunk = max(1, min(CHUNK_SIZE, math.ceil(len(genomes) / self.workers)))
+        for start in range(0, len(genomes), chunk):
+            part = genomes[start:start + chunk]
+            matrix = np.zeros((len(part), self.width), dtype=np.uint32)
+            lengths = np.zeros(len(part), dtype=np.int64)
+            for i, genome in enumerate(part):
+                genes = genome.genes
+                assert genes is not None  # for mypy
+                matrix[i, :len(genes)] = genes
+                lengths[i] = len(genes)
+            self.pending.append((part, self.executor.submit(compile_topologies, matrix, lengths)))
+
+    def load(self, entities: list[Entity]) -> None:
+        # an entity whose genome was not submitted, e.g. replaced since, is built here
+        built: dict[int, list[Neuron]] = {}
+        pending, self.pending = self.pending, []
+        for genomes, future in pending:
+            for genome, graph in zip(genomes, decode_topologies(future.result(), self.templates)):
+                built[id(genome)] = graph
+
+        for entity in entities:
+            neurons: list[Neuron] | None = built.pop(id(entity.brain.genome), None)
+            if neurons is None:
+                entity.brain.init()
+            else:
+                entity.brain.load(neurons)
+
+    def cancel(self) -> None:
+        for _, future in self.pending:
+            future.cancel()
+        self.pending = []
+
+    def stop(self) -> None:
+        self.cancel()
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.executor = None
@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import time
+from collections.abc import Callable
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from lifesim.brain.neuron import Neuron
+from lifesim.brain.neuron_type import NeuronType
+from lifesim.brain.precision import BrainPrecision
+from lifesim.utils.rng import rng
+
+if TYPE_CHECKING:
+    from lifesim.common.typing import Entity
+    from lifesim.utils.phase_timer import PhaseTimer
+
+# weight = raw / 0xFFFF * 8 - 4 with raw in [0, 0xFFFF]; storing q = raw - 0x8000 as int16
+# gives weight = (q + 0.5) * WEIGHT_SCALE exactly
+WEIGHT_SCALE: float = 8 / 0xFFFF
+
+TANH_RANGE: float = 8.0
+TANH_TABLE_SIZE: int = 4097
+_TANH_TABLE: np.ndarray = np.tanh(np.linspace(-TANH_RANGE, TANH_RANGE, TANH_TABLE_SIZE)).astype(np.float32)
+_TANH_STEP: float = (TANH_TABLE_SIZE - 1) / (2 * TANH_RANGE)
+
+
+def tabulated_tanh(x: float) -> np.float32:
+    position = (x + TANH_RANGE) * _TANH_STEP
+    if position <= 0:
+        return _TANH_TABLE[0]
+    if position >= TANH_TABLE_SIZE - 1:
+        return _TANH_TABLE[-1]
+
+    # linear interpolation keeps small activations from collapsing onto the nearest table entry
+    index = int(position)
+    low = _TANH_TABLE[index]
+    return np.float32(low + (_TANH_TABLE[index + 1] - low) * np.float32(position - index))
+
+
+def quantize_weight(weight: float) -> int:
+    raw: int = round((weight + 4) / 8 * 0xFFFF)
+    return raw - 0x8000
+
+
+class CompiledBrain:
+    def __init__(self, neurons: list[Neuron], precision: BrainPrecision) -> None:
+        if precision == BrainPrecision.FLOAT64:
+            raise ValueError("FLOAT64 brains run on the neuron graph, compile only reduced precision")
+
+        self.precision: BrainPrecision = precision
+        index: dict[Neuron, int] = {n: i for i, n in enumerate(neurons)}
+
+        # nodes keep the sorted neuron order so input sampling and output firing draw from rng
+        # in the same sequence as Brain.process
+        self.nodes: list[tuple[int, NeuronType, int, int, Callable | None]] = []  # (node, type, edge_start, edge_end, func)
+
+        sources: list[int] = []
+        weights: list[float] = []
+
+        for i, n in enumerate(neurons):
+            start = len(sources)
+            if n.type == NeuronType.INPUT:
+                self.nodes.append((i, n.type, start, start, n.input_func))
+                continue
+
+            for src, weight in zip(n.input_neurons, n.input_weights):
+                sources.append(index[src])
+                weights.append(weight)
+
+            self.nodes.append((i, n.type, start, len(sources), n.output_func))
+
+        self.sources: np.ndarray = np.array(sources, dtype=np.int16)
+        if precision == BrainPrecision.INT16:
+            self.weights: np.ndarray = np.array([quantize_weight(w) for w in weights], dtype=np.int16)
+        else:
+            self.weights = np.array(weights, dtype=np.float32)
+
+        self.values: np.ndarray = np.zeros(len(neurons), dtype=np.float32)
+
+    @property
+    def weight_bytes(self) -> int:
+        return self.weights.nbytes
+
+    def weighted_sum(self, start: int, end: int) -> np.float32:
+        inputs = self.values[self.sources[start:end]]
+        if self.precision == BrainPrecision.INT16:
+            # sum((q + 0.5) * s * v) == s * (q . v + 0.5 * sum(v))
+            raw = np.dot(inputs, self.weights[start:end].astype(np.float32)) + np.float32(0.5) * inputs.sum()
+            return np.float32(raw * np.float32(WEIGHT_SCALE))
+        return np.dot(inputs, self.weights[start:end])
+
+    def process(self, entity: Entity) -> None:
+        values = self.values
+        for i, neuron_type, start, end, func in self.nodes:
+            if neuron_type == NeuronType.INPUT:
+                assert func is not None  # for mypy
+                values[i] = func(entity)
+                continue
+
+            neuron_output = tabulated_tanh(float(self.weighted_sum(start, end)))
+
+            if neuron_type == NeuronType.INTERNAL:
+                values[i] = neuron_output
+            elif neuron_output > 0:
+                assert func is not None  # for mypy
+                if neuron_output > rng.random.random():
+                    func(entity)
+
+    def process_timed(self, entity: Entity, timer: PhaseTimer) -> None:
+        # process with every node charged to the phase of its type, see Brain.process_timed
+        clock = time.perf_counter_ns
+        sensing = brain_eval = actions = 0
+        values = self.values
+        last = clock()
+
+        for i, neuron_type, start, end, func in self.nodes:
+            if neuron_type == NeuronType.INPUT:
+                assert func is not None  # for mypy
+                values[i] = func(entity)
+                now = clock()
+                sensing += now - last
+                last = now
+                continue
+
+            neuron_output = tabulated_tanh(float(self.weighted_sum(start, end)))
+
+            if neuron_type == NeuronType.INTERNAL:
+                values[i] = neuron_output
+                now = clock()
+                brain_eval += now - last
+            else:
+                if neuron_output > 0:
+                    assert func is not None  # for mypy
+                    if neuron_output > rng.random.random():
+                        func(entity)
+                now = clock()
+                actions += now - last
+            last = now
+
+        timer.add_step(sensing, brain_eval, actions)
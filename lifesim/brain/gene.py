@@ -2,7 +2,22 @@ from lifesim.brain.connection import ConnectionEndType, ConnectionTipType
 from lifesim.utils.rng import rng
 
 
+def random_gene() -> int:
+    return rng.random.randint(0, 0xFFFF_FFFF)
+
+
+def mutate_gene(gene: int, probability: float) -> int:
+    # Gene.try_mutate on a raw code, with the same rng draws
+    if rng.random.random() < probability:
+        gene ^= 1 << rng.random.randint(0, 31)
+    return gene
+
+
 class Gene:
+    # Decoding view of one 32-bit gene. Genomes store raw codes, a Gene is only created to read
+    # the connection fields of a code.
+    __slots__ = ("_gene",)
+
     def __init__(self, gene:  int | None = None) -> None:
         self._gene:  int | None = None
         if gene is None:
@@ -21,7 +36,7 @@ class Gene:
         self._gene = value
 
     def randomize(self) -> None:
-        self.gene: int = rng.random.randint(0, 0xFFFF_FFFF)
+        self.gene: int = random_gene()
 
     def __int__(self) -> int:
         return self.gene
@@ -1,28 +1,40 @@
 from __future__ import annotations
 
-from lifesim.brain.gene import Gene
+from array import array
+from collections.abc import Iterable, Iterator
+
+from lifesim.brain.gene import Gene, mutate_gene, random_gene
 from lifesim.utils.rng import rng
 
+
+def get_max_genome_length(brain_size: int) -> int:
+    # crossover keeps max(1, len // 2) genes of each parent, so children settle at 2 * half
+    return max(brain_size, 2 * max(1, brain_size // 2))
+
+
 class Genome:
-    def __init__(self, size: int | None = None, genes: list[Gene] | None = None) -> None:
-        self.genes: list[Gene] | None = None
+    # genes are raw uint32 codes in an array, 4 bytes each instead of a Gene object and an int
+    __slots__ = ("genes", "size")
+
+    def __init__(self, size: int | None = None, genes: Iterable[int] | None = None) -> None:
+        self.genes: array[int] | None = None
         self.size: int | None = size
 
         if genes is None:
             self.randomize()
         else:
-            self.genes = genes
+            self.genes = array("I", genes)
 
     def randomize(self) -> None:
         if self.size is None:
             raise ValueError("Genome size cannot be None when randomizing")
-        self.genes = [Gene() for _ in range(self.size)]
+        self.genes = array("I", [random_gene() for _ in range(self.size)])
 
     def __str__(self) -> str:
         assert self.genes is not None  # for mypy
-        return '\n'.join(str(g) for g in self.genes)
+        return '\n'.join(str(Gene(g)) for g in self.genes)
     
-    def __iter__(self):
+    def __iter__(self) -> Iterator[int]:
         assert self.genes is not None  # for mypy
         return iter(self.genes)
 
@@ -39,9 +51,4 @@ class Genome:
         half_a = rng.random.sample(genome_a.genes, half_len_a)
         half_b = rng.random.sample(genome_b.genes, half_len_b)
         
-        genes: list[Gene] = [Gene(data.gene) for data in half_a] + [Gene(data.gene) for data in half_b]
-        
-        for gene in genes:
-            gene.try_mutate(mutation_probability)
-            
-        return Genome(genes=genes)
\ No newline at end of file
+        return Genome(genes=[mutate_gene(gene, mutation_probability) for gene in half_a + half_b])
\ No newline at end of file
@@ -5,13 +5,17 @@ from math import tanh
 from typing import TYPE_CHECKING
 
 from lifesim.brain.neuron_type import NeuronType
-from lifesim.utils import rng
+from lifesim.utils.rng import rng
 
 if TYPE_CHECKING:
     from lifesim.common.typing import Entity
 
 
 class Neuron:
+    # weights live on the end neuron, input_weights[i] belongs to input_neurons[i]
+    __slots__ = ("name", "type", "input_func", "output_func", "input_neurons", "output_neurons", "input_weights",
+                 "output", "disabled")
+
     def __init__(self, name: str, type: NeuronType, *, input_func: Callable | None = None, output_func: Callable | None = None) -> None:
         self.name: str = name
         self.type: NeuronType = type
@@ -25,10 +29,11 @@ class Neuron:
 
         self.output_func: Callable | None = output_func
     
-        self.input_neurons: list[Neuron] = []
-        self.output_neurons: list[Neuron] = []
+        # lists while the brain is built, tuples once Neuron.freeze has run
+        self.input_neurons: list[Neuron] | tuple[Neuron, ...] = []
+        self.output_neurons: list[Neuron] | tuple[Neuron, ...] = []
 
-        self.weights: dict[Neuron, float] = {}
+        self.input_weights: list[float] | tuple[float, ...] = []
 
         self.output: float | None = None 
         self.disabled: bool = False
@@ -53,8 +58,8 @@ class Neuron:
 
     def execute_as_output_neuron(self, entity: Entity) -> None:
             input_neurons_sum = sum(
-                (n.output or 0.0) * n.weights[self]
-                for n in self.input_neurons
+                (n.output or 0.0) * w
+                for n, w in zip(self.input_neurons, self.input_weights)
             )
             neuron_output = tanh(input_neurons_sum)
 
@@ -65,8 +70,8 @@ class Neuron:
 
     def execute_as_internal_neuron(self) -> None:
             input_neurons_sum = sum(
-                (n.output or 0.0) * n.weights[self]
-                for n in self.input_neurons
+                (n.output or 0.0) * w
+                for n, w in zip(self.input_neurons, self.input_weights)
             )
             neuron_output = tanh(input_neurons_sum)
             self.output = neuron_output
@@ -88,6 +93,9 @@ class Neuron:
         if end_neuron in tip_neuron.output_neurons or tip_neuron in end_neuron.input_neurons:
             raise ValueError("Connection duplicate not allowed")
 
+        assert isinstance(tip_neuron.output_neurons, list) and isinstance(end_neuron.input_neurons, list)  # for mypy
+        assert isinstance(end_neuron.input_weights, list)  # for mypy
+
         tip_neuron.output_neurons.append(end_neuron)
         end_neuron.input_neurons.append(tip_neuron)
         
@@ -96,7 +104,7 @@ class Neuron:
             end_neuron.input_neurons.remove(tip_neuron)
             raise ValueError("Adding this connection creates a cycle")
         
-        tip_neuron.weights[end_neuron] = connection_weight 
+        end_neuron.input_weights.append(connection_weight)
 
     @staticmethod
     def detect_cycle(start: Neuron) -> bool:
@@ -140,6 +148,17 @@ class Neuron:
         sorted_map = {neuron.name: index for index, neuron in enumerate(sorted_neurons)}
         neurons.sort(key=lambda neuron: sorted_map.get(neuron.name, float('inf')))
 
+    @staticmethod
+    def freeze(neurons: list[Neuron]) -> None:
+        # Connections never change once a brain is built; tuples are exact-size and the empty one
+        # is shared, where every list costs 56 bytes plus spare capacity. Links to pruned neurons
+        # are dropped too, they are never executed and would otherwise stay alive with the brain.
+        kept = set(neurons)
+        for n in neurons:
+            n.input_neurons = tuple(n.input_neurons)
+            n.output_neurons = tuple(m for m in n.output_neurons if m in kept)
+            n.input_weights = tuple(n.input_weights)
+
     @staticmethod
     def filter_and_prune(neurons: list['Neuron']) -> None:
         pruned = []
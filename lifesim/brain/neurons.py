@@ -1,9 +1,12 @@
 from __future__ import annotations
 
+import math
+import sys
 from typing import TYPE_CHECKING
 
 from lifesim.brain.neuron import Neuron
 from lifesim.brain.neuron_type import NeuronType
+from lifesim.evolution.safe_zone_field import DIRECTION_DX, DIRECTION_DY
 from lifesim.utils.direction import Direction
 from lifesim.utils.rng import rng
 
@@ -89,7 +92,44 @@ def meets_condition_input(entity: Entity) -> float:
 
 def get_entities_alive(entity: Entity) -> float:
     simulation: Simulation = entity.simulation
-    return len(simulation.entities) / simulation.settings.max_entity_count
+    return simulation.population_size / simulation.settings.max_entity_count
+
+
+def get_population_density(entity: Entity) -> float:
+    return float(entity.simulation.neighbor_sensing().density[entity.population_index])
+
+
+def get_nearest_neighbor_distance(entity: Entity) -> float:
+    return float(entity.simulation.neighbor_sensing().nearest_distance[entity.population_index])
+
+
+def get_neighbor_forward(entity: Entity) -> float:
+    return 1.0 if entity.simulation.neighbor_sensing().forward_neighbor[entity.population_index] else 0.0
+
+
+def get_safe_zone_distance(entity: Entity) -> float:
+    simulation: Simulation = entity.simulation
+    distance = simulation.safe_zone_distance[entity.transform.position_y, entity.transform.position_x]
+    return min(1.0, distance / max(simulation.settings.grid_width, simulation.settings.grid_height))
+
+
+def get_safe_zone_direction_x(entity: Entity) -> float:
+    index = entity.simulation.safe_zone_direction[entity.transform.position_y, entity.transform.position_x]
+    return float(DIRECTION_DX[index])
+
+
+def get_safe_zone_direction_y(entity: Entity) -> float:
+    index = entity.simulation.safe_zone_direction[entity.transform.position_y, entity.transform.position_x]
+    return float(DIRECTION_DY[index])
+
+
+def get_safe_zone_forward(entity: Entity) -> float:
+    index = entity.simulation.safe_zone_direction[entity.transform.position_y, entity.transform.position_x]
+    if index < 0:
+        return 0.0
+    facing_x, facing_y = entity.transform.direction.value
+    dx, dy = DIRECTION_DX[index], DIRECTION_DY[index]
+    return float((facing_x * dx + facing_y * dy) / math.sqrt((facing_x ** 2 + facing_y ** 2) * (dx ** 2 + dy ** 2)))
 
 
 # ======= OUTPUT NEURON FUNCTIONS =======
@@ -181,7 +221,7 @@ def stay_still(entity: Entity) -> None:
 
 
 def kys(entity: Entity) -> None:
-    entity.die()
+    entity.simulation.kill(entity)
 
 
 def kill(entity: Entity) -> None:
@@ -191,11 +231,9 @@ def kill(entity: Entity) -> None:
     if not grid.in_boundaries(x, y):
         return
 
-    target_cell = grid.grid[x][y]
-    target_entity = target_cell.object
-
-    if isinstance(target_entity, Entity):
-        target_entity.die()
+    target_entity: Entity | None = grid.get_object(x, y)
+    if target_entity is not None:
+        entity.simulation.kill(target_entity)
         
 
 input_neuron_definitions: list[Neuron] = [
@@ -218,6 +256,22 @@ input_neuron_definitions: list[Neuron] = [
 ]
 
 
+social_input_neuron_definitions: list[Neuron] = [
+    Neuron('I_population_density', NeuronType.INPUT, input_func=get_population_density),
+    Neuron('I_nearest_neighbor_distance', NeuronType.INPUT, input_func=get_nearest_neighbor_distance),
+    Neuron('I_neighbor_forward', NeuronType.INPUT, input_func=get_neighbor_forward),
+]
+
+
+safe_zone_input_neuron_definitions: list[Neuron] = [
+    Neuron('I_meets_condition', NeuronType.INPUT, input_func=meets_condition_input),
+    Neuron('I_safe_zone_distance', NeuronType.INPUT, input_func=get_safe_zone_distance),
+    Neuron('I_safe_zone_direction_x', NeuronType.INPUT, input_func=get_safe_zone_direction_x),
+    Neuron('I_safe_zone_direction_y', NeuronType.INPUT, input_func=get_safe_zone_direction_y),
+    Neuron('I_safe_zone_forward', NeuronType.INPUT, input_func=get_safe_zone_forward),
+]
+
+
 output_neuron_definitions: list[Neuron] = [
     Neuron('O_move_forward', NeuronType.OUTPUT, output_func=move_forward),
     Neuron('O_reverse', NeuronType.OUTPUT, output_func=reverse),
@@ -227,17 +281,32 @@ output_neuron_definitions: list[Neuron] = [
     Neuron('O_move_east', NeuronType.OUTPUT, output_func=move_east),
     Neuron('O_move_south', NeuronType.OUTPUT, output_func=move_south),
     Neuron('O_move_west', NeuronType.OUTPUT, output_func=move_west),
-    # Neuron('kys', NeuronType.OUTPUT, output_func=kys),
-    # Neuron('kill', NeuronType.OUTPUT, output_func=kill),
 ]
 
+
+predation_output_neuron_definitions: list[Neuron] = [
+    Neuron('O_kys', NeuronType.OUTPUT, output_func=kys),
+    Neuron('O_kill', NeuronType.OUTPUT, output_func=kill),
+]
+
+def get_neuron_templates(settings: SimulationSettings) -> list[Neuron]:
+    # one unwired neuron per slot of a brain under these settings, in brain order, to be copied;
+    # internal names are interned so every brain shares one copy of each
+    internal_neurons = [Neuron(sys.intern(f'internal_{i+1}'), NeuronType.INTERNAL)
+                        for i in range(settings.max_internal_neurons)]
+
+    definitions = list(input_neuron_definitions)
+    if settings.social_sensing:
+        definitions += social_input_neuron_definitions
+    if settings.safe_zone_sensing:
+        definitions += safe_zone_input_neuron_definitions
+
+    definitions += output_neuron_definitions
+    if settings.predation:
+        definitions += predation_output_neuron_definitions
+    return definitions + internal_neurons
+
+
 def get_fresh_neurons(settings: SimulationSettings) -> list[Neuron]:
-    internal_count = settings.max_internal_neurons
-    internal_neurons = [Neuron(f'internal_{i+1}', NeuronType.INTERNAL) for i in range(internal_count)]
-
-    neurons = (
-        [Neuron(n.name, n.type, input_func=n.input_func, output_func=n.output_func)
-         for n in input_neuron_definitions + output_neuron_definitions] +
-        internal_neurons
-    )
-    return neurons
\ No newline at end of file
+    return [Neuron(n.name, n.type, input_func=n.input_func, output_func=n.output_func)
+            for n in get_neuron_templates(settings)]
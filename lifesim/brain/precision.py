@@ -0,0 +1,7 @@
+from enum import Enum
+
+
+class BrainPrecision(Enum):
+    FLOAT64 = "float64"
+    FLOAT32 = "float32"
+    INT16 = "int16"
@@ -0,0 +1,88 @@
+from lifesim.brain.neuron_type import NeuronType
+from lifesim.brain.precision import BrainPrecision
+from lifesim.utils.rng import rng
+
+
+def record_positions(config: dict, precision: BrainPrecision, seed: int, generations: int) -> tuple[list[list[tuple[int, int]]], int]:
+    from lifesim.core.simulation import Simulation
+
+    rng.reseed(seed)
+    simulation: Simulation = Simulation({**config, "brain_precision": precision.value})
+    simulation.populate()
+
+    steps: list[list[tuple[int, int]]] = []
+    weight_bytes: int = 0
+
+    for generation in range(1, generations + 1):
+        simulation.current_generation = generation
+        simulation.update_selection_index()
+        for entity in simulation.entities:
+            entity.brain.init()
+            if entity.brain.compiled is not None:
+                weight_bytes += entity.brain.compiled.weight_bytes
+            else:
+                weight_bytes += 8 * sum(len(n.input_neurons) for n in entity.brain.neurons if n.type != NeuronType.INPUT)
+
+        for step in range(1, simulation.settings.steps_per_generation + 1):
+            simulation.current_step = step
+            simulation.update_cached_inputs()
+            simulation.process_entities()
+            steps.append([(e.transform.position_x, e.transform.position_y) for e in simulation.entities])
+
+        simulation.on_generation_end([])
+        if simulation.simulation_ended:
+            break
+
+    return steps, weight_bytes
+
+
+def report_precision_divergence(config: dict, precision: BrainPrecision, seed: int = 0, generations: int = 1) -> dict:
+    reference, reference_bytes = record_positions(config, BrainPrecision.FLOAT64, seed, generations)
+    candidate, candidate_bytes = record_positions(config, precision, seed, generations)
+
+    first_divergent_step: int | None = None
+    mismatched = 0
+    total = 0
+
+    for step, (expected, actual) in enumerate(zip(reference, candidate), start=1):
+        step_mismatched = sum(1 for a, b in zip(expected, actual) if a != b) + abs(len(expected) - len(actual))
+        if step_mismatched and first_divergent_step is None:
+            first_divergent_step = step
+        mismatched += step_mismatched
+        total += max(len(expected), len(actual))
+
+    final_mismatched = sum(1 for a, b in zip(reference[-1], candidate[-1]) if a != b) if reference and candidate else 0
+
+    report: dict = {
+        "precision": precision.value,
+        "seed": seed,
+        "steps_compared": min(len(reference), len(candidate)),
+        "first_divergent_step": first_divergent_step,
+        "position_mismatch_rate": mismatched / total if total else 0.0,
+        "final_position_mismatch_rate": final_mismatched / len(reference[-1]) if reference and reference[-1] else 0.0,
+        "weight_bytes_float64": reference_bytes,
+        "weight_bytes": candidate_bytes,
+    }
+
+    print(
+        f"[LOG] Precision {precision.value} vs float64 (seed {seed}): "
+        f"first divergence at step {first_divergent_step}, "
+        f"mismatch rate {report['position_mismatch_rate'] * 100:.2f}%, "
+        f"weight bytes {candidate_bytes}/{reference_bytes}",
+        flush=True
+    )
+    return report
+
+
+if __name__ == "__main__":
+    config = {
+        "grid_width": 80,
+        "grid_height": 80,
+        "steps_per_generation": 120,
+        "selection_condition": "bottom_right_square",
+        "max_entity_count": 250,
+        "brain_size": 10,
+        "max_internal_neurons": 8,
+    }
+    for p in (BrainPrecision.FLOAT32, BrainPrecision.INT16):
+        report_precision_divergence(config, p, seed=0, generations=3)
@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+import argparse
+import json
+import threading
+from typing import TYPE_CHECKING
+
+from lifesim.core.config_file import load_config_files
+from lifesim.utils.rng import rng
+from lifesim.utils.utils import timeit
+
+if TYPE_CHECKING:
+    from lifesim.core.batched_simulation import BatchedSimulation
+    from lifesim.core.metrics_server import MetricsServer
+    from lifesim.core.simulation import Simulation
+    from lifesim.utils.sampling_profiler import SamplingProfiler
+
+ENGINES: tuple[str, ...] = ("object", "compiled", "tiled", "batched")
+
+# used when no config file is given
+DEFAULT_CONFIG: dict = {
+    "grid_width": 80,
+    "grid_height": 80,
+
+    "steps_per_generation": 120,
+    "max_generations": 1_000_000,
+    "selection_condition": "bottom_right_square",
+
+    "max_entity_count": 250,
+    "brain_size": 10,
+    "max_internal_neurons": 8,
+    "fresh_minds": 10,
+
+    "gene_mutation_probability": 1 / 10_000,
+
+    "video_framerate": 40,
+    "video_upscale_factor": 8,
+}
+
+DEFAULT_TILE_COUNT: int = 4
+
+
+def get_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m lifesim", description="LifeSim")
+    parser.add_argument("configs", nargs="*", metavar="CONFIG",
+                        help="JSON or TOML simulation configs; a file may hold one config, a list, "
+                             "or shared settings plus a 'simulations' list")
+    parser.add_argument("--headless", action="store_true",
+                        help="run without the render UI; tkinter and OpenCV are never imported")
+    parser.add_argument("--generations", type=int, default=None, help="override max_generations of every config")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="seed the shared rng; a single simulation is then reproducible")
+    parser.add_argument("--engine", choices=ENGINES, default=None,
+                        help="object model, float32 compiled brains, tiled worker processes or one batched "
+                             "tensor simulation; by default tile_count > 1 selects tiled, else object")
+    parser.add_argument("--profile", action="store_true",
+                        help="sample simulation stacks and write profile.folded per simulation")
+    parser.add_argument("--profile-start", type=int, default=1, help="first profiled generation")
+    parser.add_argument("--profile-generations", type=int, default=5, help="number of profiled generations")
+    parser.add_argument("--profile-interval", type=float, default=0.005, help="seconds between samples")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="serve Prometheus metrics on this local port")
+    parser.add_argument("--memory-report", action="store_true",
+                        help="print the bytes per entity of the object model under every config and exit")
+    parser.add_argument("--memory-report-sample", type=int, default=1000,
+                        help="entities built to measure the memory report")
+    return parser
+
+
+def get_engine_config(config: dict, engine: str | None) -> dict:
+    config = dict(config)
+    # precision and tile count are chosen independently, compiled runs are never tiled
+    if engine == "compiled" and config.get("brain_precision", "float64") == "float64":
+        config["brain_precision"] = "float32"
+    if engine == "tiled" and config.get("tile_count", 1) <= 1:
+        config["tile_count"] = DEFAULT_TILE_COUNT
+    elif engine in ("object", "compiled", "batched"):
+        config["tile_count"] = 1
+    return config
+
+
+def create_simulation(config: dict) -> Simulation:
+    # engine modules are imported on demand, a headless object-model run never loads the
+    # tile worker or tensor code
+    if config.get("tile_count", 1) > 1:
+        from lifesim.core.tiled_simulation import TiledSimulation
+        return TiledSimulation(config)
+
+    from lifesim.core.simulation import Simulation
+    return Simulation(config)
+
+
+def launch_render_ui(simulations: list[Simulation]) -> None:
+    # without tkinter or a display the simulations keep running headless
+    try:
+        import tkinter
+
+        from lifesim.visualization import render_toggle_ui
+    except ImportError as e:
+        print(f"[LOG] Render UI unavailable ({e}), running headless", flush=True)
+        return
+    try:
+        render_toggle_ui.launch_render_ui(simulations)
+    except tkinter.TclError as e:
+        print(f"[LOG] Render UI unavailable ({e}), running headless", flush=True)
+
+
+@timeit
+def simulation_thread(simulation: Simulation) -> None:
+    print(f'\n--- starting simulation "{simulation.settings.name}" ---')
+    simulation.start()
+
+
+def run_batched(configs: list[dict], profiler: SamplingProfiler | None, metrics: MetricsServer | None) -> None:
+    from lifesim.core.batched_simulation import BatchedSimulation
+
+    batch: BatchedSimulation = BatchedSimulation(configs)
+    if profiler is not None:
+        profiler.register(batch)
+    if metrics is not None:
+        metrics.register(batch)
+    batch.start()
+
+
+def run_simulations(configs: list[dict], headless: bool, profiler: SamplingProfiler | None,
+                    metrics: MetricsServer | None) -> None:
+    simulations: list[Simulation] = []
+    threads: list[threading.Thread] = []
+
+    for config in configs:
+        simulation = create_simulation(config)
+        simulations.append(simulation)
+
+        thread = threading.Thread(target=simulation_thread, args=(simulation,))
+        threads.append(thread)
+        if profiler is not None:
+            profiler.register(simulation, thread)
+        if metrics is not None:
+            metrics.register(simulation)
+
+    for thread in threads:
+        thread.start()
+
+    if not headless:
+        launch_render_ui(simulations)
+
+    for thread in threads:
+        thread.join()
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = get_parser()
+    args = parser.parse_args(argv)
+
+    try:
+        configs = load_config_files(args.configs) if args.configs else [dict(DEFAULT_CONFIG)]
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    configs = [get_engine_config(config, args.engine) for config in configs]
+    if args.generations is not None:
+        for config in configs:
+            config["max_generations"] = args.generations
+    if args.seed is not None:
+        rng.reseed(args.seed)
+
+    if args.memory_report:
+        from lifesim.utils.memory_monitor import get_entity_memory_report
+        for config in configs:
+            print(json.dumps(get_entity_memory_report(config, args.memory_report_sample), indent=4), flush=True)
+        return 0
+
+    sampling_profiler: SamplingProfiler | None = None
+    if args.profile:
+        from lifesim.utils.sampling_profiler import SamplingProfiler
+        sampling_profiler = SamplingProfiler(args.profile_interval, args.profile_start, args.profile_generations)
+        sampling_profiler.start()
+
+    metrics_server: MetricsServer | None = None
+    if args.metrics_port is not None:
+        from lifesim.core.metrics_server import MetricsServer
+        metrics_server = MetricsServer(port=args.metrics_port)
+        metrics_server.start()
+
+    try:
+        if args.engine == "batched":
+            # batched runs have no per-simulation grid to render
+            run_batched(configs, sampling_profiler, metrics_server)
+        else:
+            run_simulations(configs, args.headless, sampling_profiler, metrics_server)
+    finally:
+        if sampling_profiler is not None:
+            sampling_profiler.stop()
+        if metrics_server is not None:
+            metrics_server.stop()
+    return 0
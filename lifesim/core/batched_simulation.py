@@ -0,0 +1,469 @@
+from __future__ import annotations
+
+import itertools
+import math
+import time
+from collections.abc import Iterator
+
+import numpy as np
+
+from lifesim.brain.batched_brain import BatchedBrains
+from lifesim.brain.batched_neurons import (ACTION_RANDOM, ACTION_RELATIVE,
+                                           ACTION_STAY, DX, DY,
+                                           RELATIVE_DIRECTIONS,
+                                           batched_input_functions,
+                                           batched_output_actions)
+from lifesim.brain.genome import get_max_genome_length
+from lifesim.brain.neuron_type import NeuronType
+from lifesim.brain.neurons import get_fresh_neurons
+from lifesim.core.grid_backing import GridBacking
+from lifesim.core.simulation import Simulation
+from lifesim.core.simulation_settings import SimulationSettings
+from lifesim.core.spatial_index import NeighborSensing, SpatialIndex
+from lifesim.core.state_view import GenerationView, StepView, read_only
+from lifesim.evolution.convergence import ConvergenceMonitor
+from lifesim.evolution.history_store import HistoryStore
+from lifesim.utils.memory_monitor import MemoryMonitor
+from lifesim.utils.phase_timer import PhaseTimer
+from lifesim.utils.rng import rng
+
+# settings that fix the tensor shapes, every simulation of a batch must agree on them
+BATCH_SHAPE_SETTINGS: tuple[str, ...] = (
+    "grid_width", "grid_height", "max_entity_count", "brain_size", "max_internal_neurons",
+    "steps_per_generation", "social_sensing", "neighbor_sensing_radius", "safe_zone_sensing",
+)
+
+
+class BatchMember(Simulation):
+    # One slot of a BatchedSimulation. Keeps its own settings, selection schedule, masks, logs and
+    # simulation data, while positions and genomes live in the batch tensors.
+    def __init__(self, settings: dict | None = None) -> None:
+        self.id = Simulation.take_id()
+        self.init_state(SimulationSettings(self.id, settings))
+        if self.grid_backing == GridBacking.SPARSE:
+            raise RuntimeError("Batched simulations need dense grids, the occupancy is a full (S, h, w) tensor")
+
+        self.convergence_monitor: ConvergenceMonitor | None = self.create_convergence_monitor()
+        self.history: HistoryStore | None = self.create_history_store()
+        self.primary_survival_rate: float = self.get_primary_survival_rate()
+
+    @property
+    def population_size(self) -> int:
+        return self.settings.max_entity_count
+
+
+class BatchedSimulation:
+    # S simulations with identical grid and brain dimensions stepped together. Per-entity state is
+    # stored as (S, N) arrays, genomes as (S, N, G), occupancy and masks as (S, h, w); every step is
+    # one pass of the array neurons and one batched brain evaluation over all S * N entities.
+    #
+    # Semantics follow Simulation except where the object model is inherently sequential: all
+    # entities sense start-of-step occupancy, a contested cell goes to the lowest entity index and a
+    # cell vacated this step cannot be entered until the next one. Output neurons fire in definition
+    # order instead of each brain's topological order. Runs are headless (no video).
+    def __init__(self, configs: list[dict]) -> None:
+        if not configs:
+            raise ValueError("Batched simulation needs at least one config")
+
+        self.members: list[BatchMember] = [BatchMember(config) for config in configs]
+        self.settings: SimulationSettings = self.members[0].settings
+        for member in self.members[1:]:
+            for key in BATCH_SHAPE_SETTINGS:
+                if getattr(member.settings, key) != getattr(self.settings, key):
+                    raise ValueError(
+                        f"Setting '{key}' of '{member.settings.name}' differs from '{self.settings.name}', "
+                        "batched simulations must share their tensor shapes"
+                    )
+
+        neurons = get_fresh_neurons(self.settings)
+        input_names = [n.name for n in neurons if n.type == NeuronType.INPUT]
+        output_names = [n.name for n in neurons if n.type == NeuronType.OUTPUT]
+        unsupported = [n for n in input_names if n not in batched_input_functions]
+        unsupported += [n for n in output_names if n not in batched_output_actions]
+        if unsupported:
+            raise ValueError(f"Neurons without a batched implementation: {', '.join(unsupported)}")
+
+        self.input_functions = [batched_input_functions[n] for n in input_names]
+        self.action_kinds: np.ndarray = np.array([batched_output_actions[n][0] for n in output_names], dtype=np.int64)
+        self.action_directions: np.ndarray = np.array([batched_output_actions[n][1] for n in output_names], dtype=np.int64)
+        self.brains: BatchedBrains = BatchedBrains(input_names, output_names, self.settings.max_internal_neurons)
+        self.outputs: np.ndarray = np.zeros((0, len(output_names)))  # (S * N, O) of the last step
+
+        s, n = len(self.members), self.settings.max_entity_count
+        w, h = self.settings.grid_width, self.settings.grid_height
+        if n > w * h:
+            raise ValueError("max_entity_count does not fit on the grid")
+
+        self.half_genome: int = max(1, self.settings.brain_size // 2)
+        self.genome_width: int = get_max_genome_length(self.settings.brain_size)
+
+        self.sim_index: np.ndarray = np.repeat(np.arange(s)[:, None], n, axis=1)
+        self.genomes: np.ndarray = np.zeros((s, n, self.genome_width), dtype=np.uint32)
+        self.genome_lengths: np.ndarray = np.zeros((s, n), dtype=np.int64)
+        # rows of both parents in the previous generation, -1 for fresh minds
+        self.parents: np.ndarray = np.full((s, n, 2), -1, dtype=np.int32)
+        self.xs: np.ndarray = np.zeros((s, n), dtype=np.int64)
+        self.ys: np.ndarray = np.zeros((s, n), dtype=np.int64)
+        self.facing: np.ndarray = np.zeros((s, n), dtype=np.int64)
+        self.occupancy: np.ndarray = np.zeros((s, h, w), dtype=bool)
+        self.active: np.ndarray = np.ones(s, dtype=bool)
+
+        self.selection_masks: np.ndarray = np.zeros((s, h, w), dtype=bool)
+        self.safe_zone_distances: np.ndarray = np.zeros((0, h, w), dtype=np.uint16)
+        self.safe_zone_directions: np.ndarray = np.zeros((0, h, w), dtype=np.int8)
+        self._mask_indices: list[int] | None = None
+
+        self.current_generation: int = 0
+        self.current_step: int = 0
+        self.simulation_ended: bool = False
+        self.cached_inputs: dict[str, float] = {}
+        self.spatial_index: SpatialIndex = SpatialIndex(self.settings.neighbor_sensing_radius)
+        self._neighbor_sensing: NeighborSensing | None = None
+        # one timer for the whole batch, every phase covers all S simulations
+        self.phase_timer: PhaseTimer = PhaseTimer(self.settings.phase_timing)
+        for member in self.members:
+            member.phase_timer = self.phase_timer
+        # one report for the process, in the directory of the first simulation
+        self.memory_monitor: MemoryMonitor | None = self.members[0].create_memory_monitor()
+        # x, y and facing after the last step, kept while reproduction overwrites the live tensors
+        self.final_state: np.ndarray = np.zeros((3, s, n), dtype=np.int64)
+        self._stream: Iterator[str] | None = None
+
+    @property
+    def batch_size(self) -> int:
+        return len(self.members)
+
+    def start(self) -> None:
+        self.populate()
+        self.simulation_loop()
+
+    def populate(self) -> None:
+        s, n = self.genomes.shape[:2]
+        self.genomes[:, :, :self.settings.brain_size] = self.random_genes((s, n, self.settings.brain_size))
+        self.genome_lengths[:] = self.settings.brain_size
+        self.place_new_generation_entities()
+
+    @staticmethod
+    def random_genes(shape: tuple[int, ...]) -> np.ndarray:
+        return rng.np.integers(0, 1 << 32, size=shape, dtype=np.uint64).astype(np.uint32)
+
+    def simulation_loop(self) -> None:
+        for _ in self.iter_loop():
+            pass
+
+    def iter_loop(self) -> Iterator[str]:
+        # events as in Simulation.iter_loop
+        self.current_generation = 1
+        loop_start_time = time.perf_counter()
+        if self.memory_monitor is not None:
+            self.memory_monitor.start()
+
+        while not self.simulation_ended:
+            elapsed = time.perf_counter() - loop_start_time
+            for i, member in enumerate(self.members):
+                if not self.active[i]:
+                    continue
+                budget = member.settings.max_wall_clock_seconds
+                if self.current_generation > member.settings.max_generations:
+                    member.stop_reason = "max_generations"
+                    self.active[i] = False
+                elif budget is not None and elapsed >= budget:
+                    member.stop_reason = "wall_clock"
+                    self.active[i] = False
+            if not self.active.any():
+                break
+            yield from self.iter_generation()
+            self.current_generation += 1
+
+        if self.memory_monitor is not None:
+            self.memory_monitor.stop()
+        for member in self.members:
+            if member.history is not None:
+                member.history.close()
+            member.write_simulation_data({"generation": member.current_generation, "stop_reason": member.stop_reason})
+        print('[LOG] batched simulation ended')
+
+    def get_stream(self) -> Iterator[str]:
+        if self._stream is None:
+            if not self.genome_lengths.any():
+                self.populate()
+            self._stream = self.iter_loop()
+        return self._stream
+
+    def iter_steps(self) -> Iterator[StepView]:
+        # views of the live (S, N) tensors, nothing is gathered or copied per step
+        for event in self.get_stream():
+            if event == "step":
+                yield StepView(
+                    self.current_generation, self.current_step, read_only(self.xs), read_only(self.ys),
+                    read_only(self.facing), np.broadcast_to(self.active[:, None], self.xs.shape)
+                )
+
+    def run_steps(self, n: int) -> Iterator[StepView]:
+        return itertools.islice(self.iter_steps(), n)
+
+    def iter_generations(self) -> Iterator[GenerationView]:
+        for event in self.get_stream():
+            if event == "selection":
+                np.copyto(self.final_state[0], self.xs)
+                np.copyto(self.final_state[1], self.ys)
+                np.copyto(self.final_state[2], self.facing)
+            elif event == "generation":
+                xs, ys, facing = self.final_state
+                state = StepView(
+                    self.current_generation, self.current_step, read_only(xs), read_only(ys), read_only(facing),
+                    np.broadcast_to(self.active[:, None], xs.shape)
+                )
+                survivors = read_only(self.selection_masks[self.sim_index, ys, xs])
+                yield GenerationView(state, survivors, self.get_generation_stats())
+
+    def get_generation_stats(self) -> dict:
+        # Simulation.get_generation_stats with one value per member
+        stats: dict = {
+            "generation": self.current_generation,
+            "steps": self.current_step,
+            "seconds": np.array([m.last_generation_seconds for m in self.members]),
+            "survival_rate": np.array([m.survival_rate for m in self.members]),
+            "genome_diversity": np.array([m.genome_diversity for m in self.members]),
+            "diversity": [m.diversity for m in self.members],
+            "stop_reason": [m.stop_reason for m in self.members],
+        }
+        if self.phase_timer.enabled:
+            stats["phase_seconds"] = self.phase_timer.last_generation
+        return stats
+
+    def generation_loop(self) -> None:
+        for _ in self.iter_generation():
+            pass
+
+    def iter_generation(self) -> Iterator[str]:
+        for i, member in enumerate(self.members):
+            member.generation_start_time = time.perf_counter()
+            if self.active[i]:
+                member.current_generation = self.current_generation
+                member.update_selection_index()
+        self.update_masks()
+
+        s, n = self.genomes.shape[:2]
+        with self.phase_timer.measure("brain_init"):
+            self.brains.compile(self.genomes.reshape(s * n, -1), self.genome_lengths.ravel())
+
+        for step in range(1, self.settings.steps_per_generation + 1):
+            self.current_step = step
+            self.update_cached_inputs()
+            self.step()
+            yield "step"
+
+        for i, member in enumerate(self.members):
+            if self.active[i]:
+                member.steps_total += self.settings.steps_per_generation
+
+        yield "selection"
+        self.on_generation_end()
+        yield "generation"
+
+    def update_masks(self) -> None:
+        indices = [member.selection_index for member in self.members]
+        if indices == self._mask_indices:
+            return
+
+        self._mask_indices = indices
+        self.selection_masks = np.stack([member.selection_mask for member in self.members])
+        if self.settings.safe_zone_sensing:
+            self.safe_zone_distances = np.stack([member.safe_zone_distance for member in self.members])
+            self.safe_zone_directions = np.stack([member.safe_zone_direction for member in self.members])
+
+    def update_cached_inputs(self) -> None:
+        self._neighbor_sensing = None
+        self.cached_inputs['age'] = self.current_step / self.settings.steps_per_generation
+        self.cached_inputs['oscillator'] = 0.5 * (
+            math.sin(2 * math.pi / self.settings.steps_per_generation * self.current_step) + 1
+        )
+
+    def neighbor_sensing(self) -> NeighborSensing:
+        # simulations are stacked vertically with a gap wider than the radius, so one index serves all
+        if self._neighbor_sensing is None:
+            gap = self.settings.grid_height + self.settings.neighbor_sensing_radius + 1
+            self._neighbor_sensing = self.spatial_index.sense(
+                self.xs.ravel(), (self.ys + self.sim_index * gap).ravel(),
+                DX[self.facing].ravel(), DY[self.facing].ravel()
+            )
+        return self._neighbor_sensing
+
+    def step(self) -> None:
+        timer = self.phase_timer
+        with timer.measure("sensing"):
+            inputs = np.stack([np.broadcast_to(f(self), self.xs.shape).ravel() for f in self.input_functions], axis=1)
+        with timer.measure("brain_eval"):
+            self.outputs = self.brains.process(inputs)
+        with timer.measure("actions"):
+            self.apply_actions(self.outputs)
+
+    def apply_actions(self, outputs: np.ndarray) -> None:
+        w, h = self.settings.grid_width, self.settings.grid_height
+        fired = (outputs > 0) & (outputs > rng.np.random(outputs.shape))
+        chosen = fired.argmax(axis=1)
+        kinds = self.action_kinds[chosen]
+
+        facing = self.facing.ravel()
+        direction = self.action_directions[chosen]
+        direction = np.where(kinds == ACTION_RELATIVE, RELATIVE_DIRECTIONS[facing, direction], direction)
+        direction = np.where(kinds == ACTION_RANDOM, rng.np.integers(0, len(DX), len(direction)), direction)
+
+        xs, ys, sims = self.xs.ravel(), self.ys.ravel(), self.sim_index.ravel()
+        target_x = xs + DX[direction]
+        target_y = ys + DY[direction]
+
+        moving = fired.any(axis=1) & (kinds != ACTION_STAY) & self.active[sims]
+        moving &= (target_x >= 0) & (target_x < w) & (target_y >= 0) & (target_y < h)
+        candidates = np.flatnonzero(moving)
+        candidates = candidates[~self.occupancy[sims[candidates], target_y[candidates], target_x[candidates]]]
+
+        # np.unique reports the first occurrence, i.e. the lowest entity index claiming each cell
+        keys = (sims[candidates] * h + target_y[candidates]) * w + target_x[candidates]
+        _, first = np.unique(keys, return_index=True)
+        movers = candidates[first]
+
+        self.occupancy[sims[movers], ys[movers], xs[movers]] = False
+        self.occupancy[sims[movers], target_y[movers], target_x[movers]] = True
+        xs[movers] = target_x[movers]
+        ys[movers] = target_y[movers]
+        facing[movers] = direction[movers]
+
+    def on_generation_end(self) -> None:
+        timer = self.phase_timer
+        with timer.measure("io"):
+            self.update_simulation_data()
+            for i, member in enumerate(self.members):
+                if self.active[i] and member.history is not None:
+                    member.history.append(self.current_generation, self.genomes[i], self.genome_lengths[i], self.parents[i])
+        with timer.measure("selection"):
+            survivors = self.do_natural_selection()
+
+        with timer.measure("io"):
+            for i, member in enumerate(self.members):
+                if self.active[i]:
+                    elapsed = time.perf_counter() - member.generation_start_time
+                    member.last_generation_seconds = elapsed
+                    member.log_generation_summary(elapsed, int(survivors[i].sum()))
+
+        with timer.measure("selection"):
+            self.check_convergence(survivors)
+        with timer.measure("reproduction"):
+            self.reproduce(survivors)
+        with timer.measure("placement"):
+            self.place_new_generation_entities()
+        if self.memory_monitor is not None:
+            with timer.measure("io"):
+                self.memory_monitor.update(self.current_generation)
+        timer.end_generation()
+
+    def get_phase_timings(self) -> dict[str, dict]:
+        return self.phase_timer.summary()
+
+    def update_simulation_data(self) -> None:
+        n = self.settings.max_entity_count
+        for i, member in enumerate(self.members):
+            if not self.active[i]:
+                continue
+            member.generation_data["generation"] = self.current_generation
+            member.generation_data["random_brains_3"] = [  # type: ignore[assignment]
+                self.brains.descriptions[i * n + rng.random.randrange(n)] for _ in range(3)
+            ]
+            member.generation_data["survival_rate"] = member.survival_rate  # type: ignore[assignment]
+            member.generation_data["genome_diversity"] = member.genome_diversity  # type: ignore[assignment]
+            if member.diversity:
+                member.generation_data["diversity"] = member.diversity  # type: ignore[assignment]
+            if member.settings.phase_timing_telemetry:
+                member.generation_data["phase_seconds"] = self.phase_timer.last_generation  # type: ignore[assignment]
+            member.write_simulation_data(member.generation_data)
+
+    def do_natural_selection(self) -> np.ndarray:
+        survivors = self.selection_masks[self.sim_index, self.ys, self.xs]
+        for i, member in enumerate(self.members):
+            if self.active[i]:
+                member.update_survival_rate(int(survivors[i].sum()))
+        return survivors
+
+    def check_convergence(self, survivors: np.ndarray) -> None:
+        for i, member in enumerate(self.members):
+            if not self.active[i]:
+                continue
+            alive = survivors[i]
+            member.check_convergence(self.genomes[i][alive], self.genome_lengths[i][alive])
+            if member.simulation_ended:
+                self.active[i] = False
+
+    def reproduce(self, survivors: np.ndarray) -> None:
+        s, n = self.genomes.shape[:2]
+        parents_a = np.zeros((s, n), dtype=np.int64)
+        parents_b = np.zeros((s, n), dtype=np.int64)
+        fresh = np.zeros((s, n), dtype=bool)
+
+        for i, member in enumerate(self.members):
+            if not self.active[i]:
+                continue
+            alive = np.flatnonzero(survivors[i])
+            if len(alive) < 2:
+                print(f"[LOG] Population of '{member.settings.name}' went extinct after {self.current_generation} generations")
+                member.simulation_ended = True
+                member.stop_reason = "extinct"
+                self.active[i] = False
+                continue
+
+            # pairs are drawn without replacement and the pool is refilled once it runs dry,
+            # i.e. consecutive pairs of fresh shuffles of the survivors
+            fresh_minds = min(member.settings.fresh_minds, n)
+            children = n - fresh_minds
+            pairs_per_shuffle = len(alive) // 2
+            shuffles = -(-children // pairs_per_shuffle)
+            order = np.argsort(rng.np.random((shuffles, len(alive))), axis=1)[:, :2 * pairs_per_shuffle]
+            pairs = alive[order].reshape(-1, 2)[:children]
+
+            fresh[i, :fresh_minds] = True
+            parents_a[i, fresh_minds:] = pairs[:, 0]
+            parents_b[i, fresh_minds:] = pairs[:, 1]
+
+        if not self.active.any():
+            self.simulation_ended = True
+            return
+
+        genomes = np.zeros_like(self.genomes)
+        genomes[:, :, :self.half_genome] = self.crossover_half(parents_a)
+        genomes[:, :, self.half_genome:2 * self.half_genome] = self.crossover_half(parents_b)
+
+        mutation_probability = np.array([m.settings.gene_mutation_probability for m in self.members])
+        child_genes = genomes[:, :, :2 * self.half_genome]
+        flips = rng.np.random(child_genes.shape) < mutation_probability[:, None, None]
+        bits = rng.np.integers(0, 32, size=child_genes.shape, dtype=np.uint32)
+        child_genes ^= flips.astype(np.uint32) << bits
+        lengths = np.full((s, n), 2 * self.half_genome, dtype=np.int64)
+
+        genomes[fresh] = 0
+        genomes[fresh, :self.settings.brain_size] = self.random_genes((int(fresh.sum()), self.settings.brain_size))
+        lengths[fresh] = self.settings.brain_size
+
+        self.genomes[self.active] = genomes[self.active]
+        self.genome_lengths[self.active] = lengths[self.active]
+        parents = np.stack((parents_a, parents_b), axis=2).astype(np.int32)
+        parents[fresh] = -1
+        self.parents[self.active] = parents[self.active]
+
+    def crossover_half(self, parents: np.ndarray) -> np.ndarray:
+        # a random sample of half_genome genes of every parent, in random order
+        genes = self.genomes[self.sim_index, parents]
+        keys = rng.np.random(genes.shape)
+        keys[np.arange(self.genome_width) >= self.genome_lengths[self.sim_index, parents][..., None]] = np.inf
+        picked = np.argsort(keys, axis=2)[:, :, :self.half_genome]
+        return np.take_along_axis(genes, picked, axis=2)
+
+    def place_new_generation_entities(self) -> None:
+        w, h = self.settings.grid_width, self.settings.grid_height
+        n = self.settings.max_entity_count
+        for i in np.flatnonzero(self.active):
+            cells = rng.np.choice(w * h, n, replace=False)
+            self.xs[i] = cells % w
+            self.ys[i] = cells // w
+            self.occupancy[i] = False
+            self.occupancy[i, self.ys[i], self.xs[i]] = True
+        self.facing[self.active] = rng.np.integers(0, len(DX), size=(int(self.active.sum()), n))
@@ -2,6 +2,8 @@ from lifesim.core.entity import Entity
 
 
 class Cell:
+    __slots__ = ("object",)
+
     def __init__(self) -> None:
         self.object: Entity | None = None
 
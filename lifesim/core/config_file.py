@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+import json
+import os
+import tomllib
+
+CONFIG_EXTENSIONS: tuple[str, ...] = (".json", ".toml")
+
+
+def get_simulation_configs(document: dict | list, path: str) -> list[dict]:
+    # a document is one config, a list of configs, or shared settings plus a "simulations" list
+    # whose entries override them, e.g. a TOML file with top-level keys and [[simulations]] tables
+    if isinstance(document, list):
+        configs = document
+    elif "simulations" in document:
+        shared = {k: v for k, v in document.items() if k != "simulations"}
+        configs = [{**shared, **config} for config in document["simulations"]]
+    else:
+        configs = [document]
+
+    for config in configs:
+        if not isinstance(config, dict):
+            raise ValueError(f"Config file '{path}' holds a {type(config).__name__} where a simulation table was expected")
+    return [dict(config) for config in configs]
+
+
+def load_config_file(path: str) -> list[dict]:
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".json":
+        with open(path, encoding="utf-8") as f:
+            document = json.load(f)
+    elif extension == ".toml":
+        with open(path, "rb") as f:
+            document = tomllib.load(f)
+    else:
+        raise ValueError(f"Unsupported config file '{path}', expected one of {', '.join(CONFIG_EXTENSIONS)}")
+
+    if not isinstance(document, (dict, list)):
+        raise ValueError(f"Config file '{path}' must hold a table or a list of tables")
+    return get_simulation_configs(document, path)
+
+
+def load_config_files(paths: list[str]) -> list[dict]:
+    return [config for path in paths for config in load_config_file(path)]
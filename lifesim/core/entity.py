@@ -11,6 +11,8 @@ if TYPE_CHECKING:
 
 
 class Entity:
+    __slots__ = ("brain", "transform", "dead", "simulation", "grid", "performed_actions", "population_index")
+
     def __init__(self, genome: Genome, simulation: Simulation) -> None:
         from lifesim.brain.brain import Brain 
         
@@ -20,6 +22,7 @@ class Entity:
         self.simulation: Simulation = simulation
         self.grid: Grid | None = None
         self.performed_actions: set[str] = set()
+        self.population_index: int = 0
 
     def __str__(self) -> str:
         return f"E(dead={self.dead})"
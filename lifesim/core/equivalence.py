@@ -0,0 +1,468 @@
+from __future__ import annotations
+
+import contextlib
+import os
+import random
+from abc import ABC, abstractmethod
+from collections.abc import Iterator
+from math import tanh
+
+import numpy as np
+
+from lifesim.brain.compiled_brain import tabulated_tanh
+from lifesim.brain.genome import Genome
+from lifesim.brain.neuron_type import NeuronType
+from lifesim.brain.neurons import get_fresh_neurons
+from lifesim.brain.precision import BrainPrecision
+from lifesim.core.batched_simulation import BatchedSimulation
+from lifesim.core.entity import Entity
+from lifesim.core.simulation import Simulation
+from lifesim.core.simulation_settings import SimulationSettings
+from lifesim.utils.direction import Direction
+from lifesim.utils.rng import rng
+
+EQUIVALENCE_DIRECTORY: str = "./simulations/equivalence"
+DIRECTIONS: list[Direction] = list(Direction)
+HISTORY_LENGTH: int = 5
+
+# candidate name -> settings it runs with on top of the shared config
+OBJECT_CANDIDATES: dict[str, dict] = {
+    "float32": {"brain_precision": BrainPrecision.FLOAT32.value},
+    "int16": {"brain_precision": BrainPrecision.INT16.value},
+    "sparse": {"grid_backing": "sparse"},
+}
+CANDIDATES: tuple[str, ...] = (*OBJECT_CANDIDATES, "batched")
+
+# default neuron output tolerance; reduced precision brains use a tabulated tanh and float32 or
+# quantized weights, so they only match the float64 graph approximately
+CANDIDATE_ATOL: dict[str, float] = {"float32": 1e-4, "int16": 1e-2}
+DEFAULT_ATOL: float = 1e-9
+
+
+class PopulationState:
+    # everything a backend needs to continue from another backend's population
+    def __init__(self, genomes: list[list[int]], xs: np.ndarray, ys: np.ndarray, facing: np.ndarray) -> None:
+        self.genomes: list[list[int]] = genomes
+        self.xs: np.ndarray = xs
+        self.ys: np.ndarray = ys
+        self.facing: np.ndarray = facing
+
+
+class EngineBackend(ABC):
+    # One engine stepped from outside. Every backend owns its random streams and swaps them into
+    # the global rng around each call, so two backends in one process never consume each other's
+    # draws and a backend that draws like the reference also draws the same numbers.
+    def __init__(self, name: str, seed: int) -> None:
+        self.name: str = name
+        self.random: random.Random = random.Random(seed)
+        self.np: np.random.Generator = np.random.default_rng(seed)
+
+    @contextlib.contextmanager
+    def active(self) -> Iterator[None]:
+        saved = rng.random, rng.np
+        rng.random, rng.np = self.random, self.np
+        try:
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                yield
+        finally:
+            rng.random, rng.np = saved
+
+    def sync_rng(self, other: EngineBackend) -> None:
+        # continue from the same point of the streams as `other`
+        self.random.setstate(other.random.getstate())
+        self.np.bit_generator.state = other.np.bit_generator.state
+
+    @abstractmethod
+    def populate(self) -> None:
+        ...
+
+    @abstractmethod
+    def load(self, state: PopulationState) -> None:
+        ...
+
+    @abstractmethod
+    def export(self) -> PopulationState:
+        ...
+
+    @abstractmethod
+    def init_generation(self, generation: int) -> None:
+        ...
+
+    @abstractmethod
+    def step(self, step: int) -> None:
+        ...
+
+    @abstractmethod
+    def positions(self) -> np.ndarray:
+        # (N, 2) x, y in entity order
+        ...
+
+    @abstractmethod
+    def neuron_outputs(self) -> np.ndarray:
+        # (N, O) activation of every output neuron in the last step, 0 where a brain lacks it
+        ...
+
+    @abstractmethod
+    def survivors(self) -> np.ndarray:
+        ...
+
+    @abstractmethod
+    def end_generation(self) -> None:
+        ...
+
+    def genomes(self) -> list[list[int]]:
+        return self.export().genomes
+
+    def describe(self, index: int) -> str:
+        return ""
+
+
+class ObjectBackend(EngineBackend):
+    # Simulation and its neuron graph, stepped exactly like Simulation.generation_loop
+    def __init__(self, name: str, config: dict, seed: int) -> None:
+        super().__init__(name, seed)
+        with self.active():
+            self.simulation: Simulation = Simulation(config)
+        self.output_names: list[str] = [
+            n.name for n in get_fresh_neurons(self.simulation.settings) if n.type == NeuronType.OUTPUT
+        ]
+
+    def populate(self) -> None:
+        with self.active():
+            self.simulation.populate()
+
+    def load(self, state: PopulationState) -> None:
+        simulation = self.simulation
+        with self.active():
+            for entity in simulation.entities:
+                simulation.grid.remove_entity(entity.transform.position_x, entity.transform.position_y)
+            simulation.entities = []
+            for genes, x, y, facing in zip(state.genomes, state.xs, state.ys, state.facing):
+                entity = Entity(Genome(genes=genes), simulation)
+                entity.transform.direction = DIRECTIONS[int(facing)]
+                simulation.grid.place_object(entity, int(x), int(y))
+                entity.grid = simulation.grid
+                simulation.entities.append(entity)
+
+    def export(self) -> PopulationState:
+        entities = self.simulation.entities
+        return PopulationState(
+            [[int(g) for g in e.brain.genome] for e in entities],
+            np.array([e.transform.position_x for e in entities], dtype=np.int64),
+            np.array([e.transform.position_y for e in entities], dtype=np.int64),
+            np.array([DIRECTIONS.index(e.transform.direction) for e in entities], dtype=np.int64),
+        )
+
+    def init_generation(self, generation: int) -> None:
+        simulation = self.simulation
+        with self.active():
+            simulation.current_generation = generation
+            simulation.update_selection_index()
+            simulation.generation_start_time = 0.0
+            for entity in simulation.entities:
+                entity.brain.init()
+
+    def step(self, step: int) -> None:
+        simulation = self.simulation
+        with self.active():
+            simulation.current_step = step
+            simulation.update_cached_inputs()
+            simulation.process_entities()
+
+    def positions(self) -> np.ndarray:
+        return np.array([(e.transform.position_x, e.transform.position_y) for e in self.simulation.entities],
+                        dtype=np.int64).reshape(-1, 2)
+
+    def neuron_outputs(self) -> np.ndarray:
+        # recomputed from the inputs and internal values the step left behind, which draws nothing
+        column = {name: i for i, name in enumerate(self.output_names)}
+        outputs = np.zeros((len(self.simulation.entities), len(self.output_names)))
+
+        for row, entity in enumerate(self.simulation.entities):
+            brain = entity.brain
+            if brain.compiled is not None:
+                compiled = brain.compiled
+                for i, neuron_type, start, end, _ in compiled.nodes:
+                    if neuron_type == NeuronType.OUTPUT:
+                        value = tabulated_tanh(float(compiled.weighted_sum(start, end)))
+                        outputs[row, column[brain.neurons[i].name]] = value
+                continue
+
+            for n in brain.output_neurons:
+                outputs[row, column[n.name]] = tanh(sum((i.output or 0.0) * w for i, w in zip(n.input_neurons, n.input_weights)))
+        return outputs
+
+    def survivors(self) -> np.ndarray:
+        simulation = self.simulation
+        return np.array([
+            simulation.selection_condition(e.transform.position_x, e.transform.position_y)
+            for e in simulation.entities
+        ], dtype=bool)
+
+    def end_generation(self) -> None:
+        with self.active():
+            self.simulation.on_generation_end([])
+
+    def describe(self, index: int) -> str:
+        return str(self.simulation.entities[index].brain)
+
+
+class BatchedBackend(EngineBackend):
+    # a BatchedSimulation of one member, stepped like BatchedSimulation.generation_loop
+    def __init__(self, name: str, config: dict, seed: int) -> None:
+        super().__init__(name, seed)
+        with self.active():
+            self.batch: BatchedSimulation = BatchedSimulation([config])
+
+    def populate(self) -> None:
+        with self.active():
+            self.batch.populate()
+
+    def load(self, state: PopulationState) -> None:
+        batch = self.batch
+        if len(state.genomes) != batch.settings.max_entity_count:
+            raise ValueError("Batched backends hold exactly max_entity_count entities")
+        if max(len(g) for g in state.genomes) > batch.genome_width:
+            raise ValueError(f"Genomes longer than the batch genome width {batch.genome_width}")
+
+        batch.genomes[0] = 0
+        for i, genes in enumerate(state.genomes):
+            batch.genomes[0, i, :len(genes)] = genes
+            batch.genome_lengths[0, i] = len(genes)
+        batch.xs[0] = state.xs
+        batch.ys[0] = state.ys
+        batch.facing[0] = state.facing
+        batch.occupancy[0] = False
+        batch.occupancy[0, state.ys, state.xs] = True
+
+    def export(self) -> PopulationState:
+        batch = self.batch
+        return PopulationState(
+            [batch.genomes[0, i, :batch.genome_lengths[0, i]].tolist() for i in range(batch.genomes.shape[1])],
+            batch.xs[0].copy(), batch.ys[0].copy(), batch.facing[0].copy(),
+        )
+
+    def init_generation(self, generation: int) -> None:
+        batch = self.batch
+        with self.active():
+            batch.current_generation = generation
+            member = batch.members[0]
+            member.current_generation = generation
+            member.update_selection_index()
+            batch.update_masks()
+            s, n = batch.genomes.shape[:2]
+            batch.brains.compile(batch.genomes.reshape(s * n, -1), batch.genome_lengths.ravel())
+
+    def step(self, step: int) -> None:
+        with self.active():
+            self.batch.current_step = step
+            self.batch.update_cached_inputs()
+            self.batch.step()
+
+    def positions(self) -> np.ndarray:
+        return np.stack((self.batch.xs[0], self.batch.ys[0]), axis=1)
+
+    def neuron_outputs(self) -> np.ndarray:
+        return self.batch.outputs
+
+    def survivors(self) -> np.ndarray:
+        batch = self.batch
+        return batch.selection_masks[0, batch.ys[0], batch.xs[0]]
+
+    def end_generation(self) -> None:
+        with self.active():
+            self.batch.on_generation_end()
+
+    def describe(self, index: int) -> str:
+        return self.batch.brains.descriptions[index]
+
+
+def create_backend(candidate: str, config: dict, seed: int, directory: str) -> EngineBackend:
+    config = {**config, "name": f"equivalence-{candidate}", "simulation_directory": os.path.join(directory, candidate)}
+    if candidate == "batched":
+        return BatchedBackend(candidate, config, seed)
+    if candidate not in OBJECT_CANDIDATES:
+        raise ValueError(f"Unknown candidate '{candidate}', expected one of {', '.join(CANDIDATES)}")
+    return ObjectBackend(candidate, {**config, **OBJECT_CANDIDATES[candidate]}, seed)
+
+
+class Divergence:
+    def __init__(self, generation: int, step: int | None, kind: str, entity: int | None, expected: object,
+                 actual: object, mismatched: int, context: dict) -> None:
+        self.generation: int = generation
+        self.step: int | None = step
+        self.kind: str = kind
+        self.entity: int | None = entity
+        self.expected: object = expected
+        self.actual: object = actual
+        self.mismatched: int = mismatched
+        self.context: dict = context
+
+    def to_dict(self) -> dict:
+        return {
+            "generation": self.generation, "step": self.step, "kind": self.kind, "entity": self.entity,
+            "expected": self.expected, "actual": self.actual, "mismatched": self.mismatched, "context": self.context,
+        }
+
+    def __str__(self) -> str:
+        where = f"generation {self.generation}" + (f" step {self.step}" if self.step is not None else "")
+        who = f" entity {self.entity}" if self.entity is not None else ""
+        return f"{self.kind} at {where}{who}: expected {self.expected}, got {self.actual} ({self.mismatched} mismatched)"
+
+
+class EquivalenceHarness:
+    # Runs the object model (float64 neuron graph, dense grid) as the reference and a candidate
+    # engine in lockstep from the same population and seed. After every step positions (exact) and
+    # output neuron activations (within atol) are compared, after every generation the survivor
+    # sets and the reproduced genomes. The first divergence is kept with the entity's genome, brain
+    # and recent positions on both sides.
+    #
+    # With resync the candidate is reloaded from the reference population at the start of every
+    # generation, so a divergence in one generation does not hide the comparison of the next one.
+    # Candidates that intentionally differ from the reference (batched: start-of-step sensing and
+    # its own rng streams) are expected to diverge, the report shows where and by how much.
+    def __init__(self, config: dict, candidate: str, seed: int = 0, generations: int = 1, atol: float | None = None,
+                 resync: bool = True, stop_at_first: bool = False, directory: str = EQUIVALENCE_DIRECTORY) -> None:
+        self.config: dict = config
+        self.candidate_name: str = candidate
+        self.seed: int = seed
+        self.generations: int = generations
+        self.atol: float = atol if atol is not None else CANDIDATE_ATOL.get(candidate, DEFAULT_ATOL)
+        self.resync: bool = resync
+        self.stop_at_first: bool = stop_at_first
+        self.directory: str = directory
+
+        self.first_divergence: Divergence | None = None
+        self.mismatches: dict[str, int] = {"positions": 0, "neuron_outputs": 0, "survivors": 0, "genomes": 0}
+        self.comparisons: dict[str, int] = dict.fromkeys(self.mismatches, 0)
+        self.history: list[tuple[np.ndarray, np.ndarray]] = []
+
+    def run(self) -> dict:
+        reference = ObjectBackend("reference", {
+            **self.config, "name": "equivalence-reference",
+            "simulation_directory": os.path.join(self.directory, "reference"),
+        }, self.seed)
+        candidate = create_backend(self.candidate_name, self.config, self.seed, self.directory)
+        steps = SimulationSettings(0, self.config, save=False).steps_per_generation
+
+        reference.populate()
+        candidate.load(reference.export())
+        candidate.sync_rng(reference)
+        generation = 0
+
+        for generation in range(1, self.generations + 1):
+            if self.resync and generation > 1:
+                candidate.load(reference.export())
+                candidate.sync_rng(reference)
+            reference.init_generation(generation)
+            candidate.init_generation(generation)
+            self.history = []
+
+            for step in range(1, steps + 1):
+                reference.step(step)
+                candidate.step(step)
+                expected, actual = reference.positions(), candidate.positions()
+                self.history = (self.history + [(expected, actual)])[-HISTORY_LENGTH:]
+
+                self.compare_arrays("positions", generation, step, expected, actual, reference, candidate)
+                self.compare_arrays("neuron_outputs", generation, step, reference.neuron_outputs(),
+                                    candidate.neuron_outputs(), reference, candidate, self.atol)
+                if self.stopped:
+                    break
+            if self.stopped:
+                break
+
+            self.compare_arrays("survivors", generation, None, reference.survivors(), candidate.survivors(),
+                                reference, candidate)
+            reference.end_generation()
+            candidate.end_generation()
+            self.compare_genomes(generation, reference.genomes(), candidate.genomes())
+            if self.stopped or not reference.export().genomes:
+                break
+
+        return self.report(generation)
+
+    @property
+    def stopped(self) -> bool:
+        return self.stop_at_first and self.first_divergence is not None
+
+    def compare_arrays(self, kind: str, generation: int, step: int | None, expected: np.ndarray, actual: np.ndarray,
+                       reference: EngineBackend, candidate: EngineBackend, atol: float = 0.0) -> None:
+        self.comparisons[kind] += max(len(expected), len(actual))
+        if expected.shape != actual.shape:
+            self.record(kind, generation, step, None, list(expected.shape), list(actual.shape), max(len(expected), len(actual)),
+                        reference, candidate)
+            return
+
+        different = ~np.isclose(expected, actual, rtol=0.0, atol=atol) if atol else expected != actual
+        rows = np.flatnonzero(different.reshape(len(expected), -1).any(axis=1)) if len(expected) else np.empty(0, dtype=np.int64)
+        if not len(rows):
+            return
+        self.mismatches[kind] += len(rows)
+        entity = int(rows[0])
+        self.record(kind, generation, step, entity, expected[entity].tolist(), actual[entity].tolist(), len(rows),
+                    reference, candidate)
+
+    def compare_genomes(self, generation: int, expected: list[list[int]], actual: list[list[int]]) -> None:
+        self.comparisons["genomes"] += max(len(expected), len(actual))
+        rows = [i for i, (a, b) in enumerate(zip(expected, actual)) if a != b]
+        rows += list(range(min(len(expected), len(actual)), max(len(expected), len(actual))))
+        if not rows:
+            return
+        self.mismatches["genomes"] += len(rows)
+        entity = rows[0]
+        self.record("genomes", generation, None, entity,
+                    [f"{g:08x}" for g in expected[entity]] if entity < len(expected) else None,
+                    [f"{g:08x}" for g in actual[entity]] if entity < len(actual) else None,
+                    len(rows), None, None)
+
+    def record(self, kind: str, generation: int, step: int | None, entity: int | None, expected: object, actual: object,
+               mismatched: int, reference: EngineBackend | None, candidate: EngineBackend | None) -> None:
+        if self.first_divergence is not None:
+            return
+
+        context: dict = {}
+        if entity is not None and reference is not None and candidate is not None:
+            state = reference.export()
+            if entity < len(state.genomes):
+                context["genome"] = [f"{g:08x}" for g in state.genomes[entity]]
+                context["reference_brain"] = reference.describe(entity)
+                context["candidate_brain"] = candidate.describe(entity)
+            context["recent_positions"] = [
+                {"reference": e[entity].tolist() if entity < len(e) else None,
+                 "candidate": a[entity].tolist() if entity < len(a) else None}
+                for e, a in self.history
+            ]
+        self.first_divergence = Divergence(generation, step, kind, entity, expected, actual, mismatched, context)
+
+    def report(self, generations: int) -> dict:
+        divergence = self.first_divergence
+        report = {
+            "candidate": self.candidate_name,
+            "seed": self.seed,
+            "generations": generations,
+            "resync": self.resync,
+            "atol": self.atol,
+            "equivalent": divergence is None,
+            "first_divergence": divergence.to_dict() if divergence is not None else None,
+            "mismatch_rates": {
+                kind: self.mismatches[kind] / max(self.comparisons[kind], 1) for kind in self.mismatches
+            },
+        }
+        print(f"[LOG] Equivalence {self.candidate_name} vs reference (seed {self.seed}): "
+              + ("equivalent" if divergence is None else f"first divergence: {divergence}"), flush=True)
+        return report
+
+
+if __name__ == "__main__":
+    config = {
+        "grid_width": 80,
+        "grid_height": 80,
+        "steps_per_generation": 120,
+        "selection_condition": "bottom_right_square",
+        "max_entity_count": 250,
+        "brain_size": 10,
+        "max_internal_neurons": 8,
+    }
+    for name in CANDIDATES:
+        EquivalenceHarness(config, name, seed=0, generations=2).run()
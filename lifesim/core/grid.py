@@ -4,7 +4,6 @@ import os
 import threading
 from typing import TYPE_CHECKING
 
-import cv2
 import numpy as np
 
 from lifesim.core.cell import Cell
@@ -16,6 +15,9 @@ from lifesim.utils.rng import rng
 if TYPE_CHECKING:
     from lifesim.core.simulation import Simulation  
 
+VIDEO_ENCODER_THREAD: str = "video-encoder"
+
+
 class Grid:
     def __init__(self, width: int, height: int, simulation: Simulation) -> None:
         self.width: int = width
@@ -56,6 +58,12 @@ class Grid:
 
         raise Exception('All cells are taken')
     
+    def get_object(self, x: int, y: int) -> Entity | None:
+        return self.grid[x][y].object
+
+    def is_occupied(self, x: int, y: int) -> bool:
+        return self.grid[x][y].is_occupied
+
     def try_set_position(self, object: Entity, x: int, y: int) -> bool:
         if not self.in_boundaries(x, y):
             return False
@@ -92,6 +100,9 @@ class Grid:
         return picture
 
     def save_video(self, pictures: list[np.ndarray], generation: int, survival_rate: float) -> None:
+        # imported on first use, headless runs never load the OpenCV video stack
+        import cv2
+
         pictures_copy = list(pictures)
         def save() -> None:
             if not pictures_copy:
@@ -117,7 +128,7 @@ class Grid:
 
             video.release()
 
-        threading.Thread(target=save, daemon=True).start()
+        threading.Thread(target=save, name=f"{VIDEO_ENCODER_THREAD}-{generation}", daemon=True).start()
 
     def move(self, entity: Entity, direction: Direction) -> None:
         x: int = entity.transform.position_x
@@ -0,0 +1,28 @@
+from __future__ import annotations
+
+from enum import Enum
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from lifesim.common.typing import SimulationSettings
+
+# below this many cells a dense grid is always cheap enough
+SPARSE_MIN_AREA: int = 1_000_000
+# fraction of cells that may be occupied before a sparse grid stops paying off
+SPARSE_MAX_DENSITY: float = 0.01
+
+
+class GridBacking(Enum):
+    AUTO = "auto"
+    DENSE = "dense"
+    SPARSE = "sparse"
+
+
+def resolve_grid_backing(settings: SimulationSettings) -> GridBacking:
+    if settings.grid_backing != GridBacking.AUTO:
+        return settings.grid_backing
+
+    area = settings.grid_width * settings.grid_height
+    if area >= SPARSE_MIN_AREA and settings.max_entity_count / area < SPARSE_MAX_DENSITY:
+        return GridBacking.SPARSE
+    return GridBacking.DENSE
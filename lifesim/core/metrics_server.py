@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from lifesim.core.batched_simulation import BatchedSimulation
+from lifesim.core.simulation import Simulation
+from lifesim.utils.memory_monitor import get_resident_memory
+from lifesim.utils.phase_timer import HISTOGRAM_BUCKETS, PHASES
+
+CONTENT_TYPE: str = "text/plain; version=0.0.4; charset=utf-8"
+
+# (name, type, help) in exposition order
+METRICS: tuple[tuple[str, str, str], ...] = (
+    ("lifesim_generation", "gauge", "Current generation"),
+    ("lifesim_steps_total", "counter", "Simulation steps run"),
+    ("lifesim_steps_per_second", "gauge", "Steps per second over the last generation"),
+    ("lifesim_generations_per_minute", "gauge", "Generations per minute over the last generation"),
+    ("lifesim_population", "gauge", "Entities alive"),
+    ("lifesim_survival_rate_percent", "gauge", "Survival rate of the last selection"),
+    ("lifesim_genome_diversity", "gauge", "Share of distinct genomes among the last survivors"),
+    ("lifesim_allele_entropy_bits", "gauge", "Mean per-bit allele entropy of the last survivors"),
+    ("lifesim_species", "gauge", "MinHash/LSH species among the last survivors"),
+    ("lifesim_simulation_ended", "gauge", "1 once the simulation loop has stopped"),
+    ("lifesim_mask_cache_hits_total", "counter", "Selection masks loaded from the mask cache"),
+    ("lifesim_mask_cache_misses_total", "counter", "Selection masks built from their condition"),
+    ("lifesim_phase_seconds_total", "counter", "Wall time spent per phase"),
+    ("lifesim_phase_last_generation_seconds", "gauge", "Wall time per phase in the last generation"),
+    ("lifesim_phase_generation_seconds", "histogram", "Wall time per phase and generation"),
+    ("lifesim_brain_cache_hits_total", "counter", "Batched brains reused from the compile cache"),
+    ("lifesim_brain_cache_misses_total", "counter", "Batched brains compiled from their genome"),
+    ("lifesim_process_resident_memory_bytes", "gauge", "Resident set size of the process"),
+    ("lifesim_process_peak_resident_memory_bytes", "gauge", "Peak resident set size of the process"),
+)
+
+
+def escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{escape_label_value(v)}"' for k, v in labels.items()) + "}"
+
+
+class MetricsCollector:
+    def __init__(self) -> None:
+        self.simulations: list[Simulation] = []
+        self.batches: list[BatchedSimulation] = []
+        self.lock: threading.Lock = threading.Lock()
+
+    def register(self, simulation: Simulation | BatchedSimulation) -> None:
+        with self.lock:
+            if isinstance(simulation, BatchedSimulation):
+                self.batches.append(simulation)
+                self.simulations.extend(simulation.members)
+            else:
+                self.simulations.append(simulation)
+
+    def collect(self) -> dict[str, list[tuple[str, dict[str, str], float]]]:
+        samples: dict[str, list[tuple[str, dict[str, str], float]]] = {name: [] for name, _, _ in METRICS}
+        with self.lock:
+            simulations = list(self.simulations)
+            batches = list(self.batches)
+
+        for simulation in simulations:
+            labels = {"simulation": simulation.settings.name}
+            seconds = simulation.last_generation_seconds
+            samples["lifesim_generation"].append(("", labels, simulation.current_generation))
+            samples["lifesim_steps_total"].append(("", labels, simulation.steps_total))
+            samples["lifesim_steps_per_second"].append(
+                ("", labels, simulation.settings.steps_per_generation / seconds if seconds else 0.0)
+            )
+            samples["lifesim_generations_per_minute"].append(("", labels, 60 / seconds if seconds else 0.0))
+            samples["lifesim_population"].append(("", labels, simulation.population_size))
+            samples["lifesim_survival_rate_percent"].append(("", labels, simulation.survival_rate))
+            samples["lifesim_genome_diversity"].append(("", labels, simulation.genome_diversity))
+            if simulation.diversity:
+                samples["lifesim_allele_entropy_bits"].append(("", labels, simulation.diversity["allele_entropy"]))
+                samples["lifesim_species"].append(("", labels, simulation.diversity["species"]))
+            samples["lifesim_simulation_ended"].append(("", labels, float(simulation.stop_reason is not None)))
+            samples["lifesim_mask_cache_hits_total"].append(("", labels, simulation.mask_cache.hits))
+            samples["lifesim_mask_cache_misses_total"].append(("", labels, simulation.mask_cache.misses))
+
+            timer = simulation.phase_timer
+            if not timer.enabled:
+                continue
+            for phase in PHASES:
+                phase_labels = {**labels, "phase": phase}
+                samples["lifesim_phase_seconds_total"].append(("", phase_labels, timer.total_ns[phase] / 1e9))
+                samples["lifesim_phase_last_generation_seconds"].append(("", phase_labels, timer.last_generation[phase]))
+
+                # cumulative buckets, bucket i of the timer ends at 2^i microseconds
+                histogram = samples["lifesim_phase_generation_seconds"]
+                cumulative = 0
+                for i, count in enumerate(timer.histograms[phase][:-1]):
+                    cumulative += count
+                    histogram.append(("_bucket", {**phase_labels, "le": f"{2 ** i / 1e6:g}"}, cumulative))
+                cumulative += timer.histograms[phase][HISTOGRAM_BUCKETS - 1]
+                histogram.append(("_bucket", {**phase_labels, "le": "+Inf"}, cumulative))
+                histogram.append(("_sum", phase_labels, timer.total_ns[phase] / 1e9))
+                histogram.append(("_count", phase_labels, cumulative))
+
+        for batch in batches:
+            labels = {"batch": batch.settings.name}
+            samples["lifesim_brain_cache_hits_total"].append(("", labels, batch.brains.cache_hits))
+            samples["lifesim_brain_cache_misses_total"].append(("", labels, batch.brains.cache_misses))
+
+        current, peak = get_resident_memory()
+        samples["lifesim_process_resident_memory_bytes"].append(("", {}, current))
+        samples["lifesim_process_peak_resident_memory_bytes"].append(("", {}, peak))
+        return samples
+
+    def render(self) -> str:
+        lines: list[str] = []
+        samples = self.collect()
+        for name, kind, help_text in METRICS:
+            if not samples[name]:
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for suffix, labels, value in samples[name]:
+                lines.append(f"{name}{suffix}{format_labels(labels)} {float(value)!r}")
+        return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    # Serves the metrics of every registered simulation at http://host:port/metrics in the
+    # Prometheus text format. Values are read from the running simulations on every scrape, the
+    # simulation threads never wait on the server.
+    def __init__(self, host: str = "127.0.0.1", port: int = 9464) -> None:
+        self.host: str = host
+        self.port: int = port
+        self.collector: MetricsCollector = MetricsCollector()
+        self.server: ThreadingHTTPServer | None = None
+        self.thread: threading.Thread | None = None
+
+    def register(self, simulation: Simulation | BatchedSimulation) -> None:
+        self.collector.register(simulation)
+
+    def start(self) -> None:
+        collector = self.collector
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path.split("?")[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                body = collector.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: object) -> None:
+                pass  # scrapes would drown the [LOG] output
+
+        self.server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever, name="metrics-server", daemon=True)
+        self.thread.start()
+        print(f"[LOG] Metrics at http://{self.host}:{self.port}/metrics", flush=True)
+
+    def stop(self) -> None:
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
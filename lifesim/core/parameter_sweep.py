@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import hashlib
+import itertools
+import json
+import multiprocessing as mp
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from lifesim.core.simulation_settings import SimulationSettings
+from lifesim.utils.rng import rng
+
+RESULT_FILE: str = "result.json"
+
+# resolved settings that do not change what a run computes
+UNHASHED_SETTINGS: tuple[str, ...] = ("general", "directories", "video", "instrumentation", "history")
+
+
+def get_settings_hash(config: dict, seed: int) -> str:
+    resolved = SimulationSettings(0, config, save=False).to_dict()
+    for section in UNHASHED_SETTINGS:
+        resolved.pop(section, None)
+    payload = json.dumps({"settings": resolved, "seed": seed}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def run_sweep_cell(config: dict, seed: int, directory: str) -> dict:
+    # runs in a pool worker; the result file is written last and atomically, so a crashed or
+    # killed run leaves no result and is simply recomputed by the next sweep
+    from lifesim.core.simulation import Simulation
+    from lifesim.core.tiled_simulation import TiledSimulation
+
+    rng.reseed(seed)
+    data_path = os.path.join(directory, "simulation_data.jsonl")
+    if os.path.exists(data_path):
+        os.remove(data_path)
+
+    simulation = TiledSimulation(config) if config.get("tile_count", 1) > 1 else Simulation(config)
+    start_time = time.perf_counter()
+    simulation.start()
+
+    result: dict = {
+        "name": simulation.settings.name,
+        "seed": seed,
+        "settings": simulation.settings.to_dict(),
+        "generations": simulation.current_generation - 1,
+        "survival_rate": simulation.survival_rate,
+        "stop_reason": simulation.stop_reason,
+        "wall_clock_seconds": time.perf_counter() - start_time,
+    }
+
+    path = os.path.join(directory, RESULT_FILE)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=4)
+    os.replace(temp_path, path)
+    return result
+
+
+class SweepCell:
+    def __init__(self, parameters: dict, seed: int, config: dict, settings_hash: str, directory: str) -> None:
+        self.parameters: dict = parameters
+        self.seed: int = seed
+        self.config: dict = config
+        self.settings_hash: str = settings_hash
+        self.directory: str = directory
+
+    @property
+    def result_path(self) -> str:
+        return os.path.join(self.directory, RESULT_FILE)
+
+    def load_result(self) -> dict | None:
+        try:
+            with open(self.result_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+
+class ParameterSweep:
+    # Cartesian product of `grid` over `base_config`, times `seeds`. Every cell is keyed by the hash
+    # of its fully resolved settings plus seed and stored in <directory>/<hash>; cells that already
+    # have a result are skipped, so extending the grid only computes the new cells.
+    def __init__(self, base_config: dict, grid: dict[str, list], seeds: list[int] | None = None,
+                 workers: int | None = None, max_generations: int | None = None,
+                 max_wall_clock_seconds: float | None = None, directory: str = "./simulations/sweeps") -> None:
+        self.base_config: dict = base_config
+        self.grid: dict[str, list] = grid
+        self.seeds: list[int] = seeds if seeds is not None else [0]
+        self.workers: int = workers or os.cpu_count() or 1
+        self.max_generations: int | None = max_generations
+        self.max_wall_clock_seconds: float | None = max_wall_clock_seconds
+        self.directory: str = directory
+
+    def cells(self) -> list[SweepCell]:
+        keys = list(self.grid)
+        cells: list[SweepCell] = []
+
+        for values in itertools.product(*(self.grid[k] for k in keys)):
+            parameters = dict(zip(keys, values))
+            config = {**self.base_config, **parameters}
+            if self.max_generations is not None:
+                config["max_generations"] = self.max_generations
+            if self.max_wall_clock_seconds is not None:
+                config["max_wall_clock_seconds"] = self.max_wall_clock_seconds
+
+            for seed in self.seeds:
+                settings_hash = get_settings_hash(config, seed)
+                directory = os.path.join(self.directory, settings_hash)
+                cell_config = {**config, "name": f"sweep-{settings_hash}", "simulation_directory": directory}
+                cells.append(SweepCell(parameters, seed, cell_config, settings_hash, directory))
+
+        return cells
+
+    def run(self) -> list[dict]:
+        cells = self.cells()
+        results: dict[str, dict] = {}
+        pending: list[SweepCell] = []
+
+        queued: set[str] = set()
+        for cell in cells:
+            if cell.settings_hash in results or cell.settings_hash in queued:
+                continue
+            result = cell.load_result()
+            if result is None:
+                pending.append(cell)
+                queued.add(cell.settings_hash)
+            else:
+                results[cell.settings_hash] = result
+
+        print(f"[LOG] Sweep: {len(queued) + len(results)} cells, {len(results)} cached, {len(pending)} to run", flush=True)
+
+        if pending:
+            # spawn, not fork: simulations may start their own worker processes
+            context = mp.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=min(self.workers, len(pending)), mp_context=context) as pool:
+                futures = {
+                    pool.submit(run_sweep_cell, cell.config, cell.seed, cell.directory): cell
+                    for cell in pending
+                }
+                for future in as_completed(futures):
+                    cell = futures[future]
+                    try:
+                        results[cell.settings_hash] = future.result()
+                    except Exception as e:
+                        print(f"[LOG] Sweep cell {cell.settings_hash} {cell.parameters} failed: {e}", flush=True)
+
+        return [
+            {**results[cell.settings_hash], "parameters": cell.parameters, "hash": cell.settings_hash}
+            for cell in cells if cell.settings_hash in results
+        ]
+
+
+if __name__ == "__main__":
+    sweep = ParameterSweep(
+        base_config={
+            "grid_width": 80,
+            "grid_height": 80,
+            "steps_per_generation": 120,
+            "selection_condition": "bottom_right_square",
+            "max_entity_count": 250,
+        },
+        grid={
+            "gene_mutation_probability": [1 / 10_000, 1 / 1_000],
+            "brain_size": [4, 10],
+            "max_internal_neurons": [0, 8],
+            "fresh_minds": [0, 10],
+        },
+        seeds=[0, 1],
+        max_generations=20,
+    )
+    for result in sweep.run():
+        print(result["parameters"], result["seed"], f'{result["survival_rate"]:.2f}%', result["stop_reason"])
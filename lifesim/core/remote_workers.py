@@ -0,0 +1,360 @@
+from __future__ import annotations
+
+import argparse
+import collections
+import json
+import multiprocessing as mp
+import socket
+import struct
+import threading
+import time
+import zlib
+from enum import Enum
+
+import numpy as np
+
+from lifesim.utils.rng import rng
+
+# Frame: (header length, blob length) big-endian, a JSON header, then an opaque blob.
+# JSON instead of pickle so a worker never executes anything it receives over the network.
+FRAME_HEADER = struct.Struct(">II")
+MAX_HEADER_SIZE: int = 16 * 1024 * 1024
+
+
+def encode_setting(value: object) -> object:
+    if isinstance(value, Enum):
+        return value.value
+    if hasattr(value, "to_dict"):
+        return value.to_dict()
+    raise TypeError(f"Setting of type {type(value).__name__} cannot be sent to a worker")
+
+
+def send_message(sock: socket.socket, header: dict, blob: bytes = b"") -> None:
+    data = json.dumps(header, default=encode_setting).encode("utf-8")
+    sock.sendall(FRAME_HEADER.pack(len(data), len(blob)) + data + blob)
+
+
+def receive_exact(sock: socket.socket, size: int) -> bytes:
+    chunks: list[bytes] = []
+    while size:
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            raise ConnectionError("Connection closed")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def receive_message(sock: socket.socket) -> tuple[dict, bytes]:
+    header_size, blob_size = FRAME_HEADER.unpack(receive_exact(sock, FRAME_HEADER.size))
+    if header_size > MAX_HEADER_SIZE:
+        raise ConnectionError(f"Header of {header_size} bytes refused")
+    header = json.loads(receive_exact(sock, header_size))
+    return header, receive_exact(sock, blob_size) if blob_size else b""
+
+
+def pack_genomes(genomes: list[list[int]]) -> bytes:
+    # uint32 genome count, uint16 lengths, then all genes as uint32, zlib compressed
+    lengths = np.array([len(g) for g in genomes], dtype="<u2")
+    genes = np.array([gene for genome in genomes for gene in genome], dtype="<u4")
+    return zlib.compress(struct.pack("<I", len(genomes)) + lengths.tobytes() + genes.tobytes())
+
+
+def unpack_genomes(blob: bytes) -> list[list[int]]:
+    if not blob:
+        return []
+    data = zlib.decompress(blob)
+    (count,) = struct.unpack_from("<I", data)
+    lengths = np.frombuffer(data, dtype="<u2", count=count, offset=4)
+    genes = np.frombuffer(data, dtype="<u4", offset=4 + 2 * count).tolist()
+    offsets = np.concatenate(([0], np.cumsum(lengths, dtype=np.int64))).tolist()
+    return [genes[offsets[i]:offsets[i + 1]] for i in range(count)]
+
+
+def run_remote_job(config: dict, seed: int, migrants: list[list[int]]) -> tuple[dict, bytes]:
+    # One simulation run; migrants replace the genomes of the first entities of generation 1.
+    # Returns the run metrics and the final population as a genome checkpoint.
+    from lifesim.brain.genome import Genome
+    from lifesim.core.simulation import Simulation
+    from lifesim.core.tiled_simulation import TiledSimulation
+
+    rng.reseed(seed)
+    simulation = TiledSimulation(config) if config.get("tile_count", 1) > 1 else Simulation(config)
+    start_time = time.perf_counter()
+
+    if isinstance(simulation, TiledSimulation):
+        simulation.start_workers()
+    try:
+        simulation.populate()
+        for entity, genes in zip(simulation.entities, migrants):
+            entity.brain.genome = Genome(genes=genes)
+        simulation.simulation_loop()
+    finally:
+        if isinstance(simulation, TiledSimulation):
+            simulation.stop_workers()
+
+    metrics = {
+        "name": simulation.settings.name,
+        "generations": simulation.current_generation - 1,
+        "survival_rate": simulation.survival_rate,
+        "stop_reason": simulation.stop_reason,
+        "population": len(simulation.entities),
+        "wall_clock_seconds": time.perf_counter() - start_time,
+    }
+    checkpoint = pack_genomes([[int(g) for g in e.brain.genome] for e in simulation.entities])
+    return metrics, checkpoint
+
+
+class RemoteJob:
+    def __init__(self, job_id: int, config: dict, seed: int, migrants: bytes) -> None:
+        self.job_id: int = job_id
+        self.config: dict = config
+        self.seed: int = seed
+        self.migrants: bytes = migrants
+        self.attempts: int = 0
+        self.metrics: dict | None = None
+        self.checkpoint: bytes = b""
+        self.error: str | None = None
+        self.done: threading.Event = threading.Event()
+
+    @property
+    def genomes(self) -> list[list[int]]:
+        return unpack_genomes(self.checkpoint)
+
+
+class WorkerConnection:
+    def __init__(self, sock: socket.socket, address: tuple) -> None:
+        self.sock: socket.socket = sock
+        self.address: tuple = address
+        self.name: str = f"{address[0]}:{address[1]}"
+        self.send_lock: threading.Lock = threading.Lock()
+        self.last_seen: float = time.monotonic()
+        self.job: RemoteJob | None = None
+        self.alive: bool = True
+
+    def send(self, header: dict, blob: bytes = b"") -> None:
+        with self.send_lock:
+            send_message(self.sock, header, blob)
+
+
+class Coordinator:
+    # Hands queued jobs to idle workers over TCP. A worker that closes its socket or stays silent
+    # for heartbeat_timeout is dropped and its job goes back to the front of the queue, up to
+    # max_attempts times.
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, heartbeat_timeout: float = 10.0,
+                 max_attempts: int = 3) -> None:
+        self.host: str = host
+        self.port: int = port
+        self.heartbeat_timeout: float = heartbeat_timeout
+        self.max_attempts: int = max_attempts
+
+        self.lock: threading.Lock = threading.Lock()
+        self.queue: collections.deque[RemoteJob] = collections.deque()
+        self.workers: list[WorkerConnection] = []
+        self.jobs: list[RemoteJob] = []
+        self.jobs_requeued: int = 0
+        self.server: socket.socket | None = None
+        self.running: bool = False
+        self.threads: list[threading.Thread] = []
+
+    @property
+    def address(self) -> tuple[str, int]:
+        return self.host, self.port
+
+    def start(self) -> None:
+        self.server = socket.create_server((self.host, self.port))
+        self.port = self.server.getsockname()[1]
+        self.running = True
+        for target in (self.accept_loop, self.monitor_loop):
+            thread = threading.Thread(target=target, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self) -> None:
+        self.running = False
+        with self.lock:
+            workers = list(self.workers)
+        for worker in workers:
+            try:
+                worker.send({"type": "stop"})
+            except OSError:
+                pass
+            worker.sock.close()
+        if self.server is not None:
+            self.server.close()
+            self.server = None
+
+    def submit(self, config: dict, seed: int = 0, migrants: list[list[int]] | None = None) -> RemoteJob:
+        with self.lock:
+            job = RemoteJob(len(self.jobs), config, seed, pack_genomes(migrants) if migrants else b"")
+            self.jobs.append(job)
+            self.queue.append(job)
+        self.dispatch()
+        return job
+
+    def wait(self, jobs: list[RemoteJob], timeout: float | None = None) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for job in jobs:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not job.done.wait(remaining):
+                return False
+        return True
+
+    def accept_loop(self) -> None:
+        while self.running and self.server is not None:
+            try:
+                sock, address = self.server.accept()
+            except OSError:
+                return
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            worker = WorkerConnection(sock, address)
+            threading.Thread(target=self.serve, args=(worker,), daemon=True).start()
+
+    def serve(self, worker: WorkerConnection) -> None:
+        try:
+            while self.running:
+                header, blob = receive_message(worker.sock)
+                worker.last_seen = time.monotonic()
+                kind = header.get("type")
+
+                if kind == "hello":
+                    worker.name = header.get("name") or worker.name
+                    with self.lock:
+                        self.workers.append(worker)
+                    self.dispatch()
+                elif kind == "result":
+                    self.finish(worker, header, blob)
+                elif kind == "error":
+                    self.finish(worker, header, b"")
+        except (ConnectionError, OSError, ValueError):
+            pass
+        self.lose(worker)
+
+    def finish(self, worker: WorkerConnection, header: dict, blob: bytes) -> None:
+        with self.lock:
+            job = worker.job
+            worker.job = None
+            if job is None or job.job_id != header.get("job"):
+                return
+            if header.get("type") == "error":
+                job.error = header.get("message", "unknown error")
+            else:
+                job.metrics = header.get("metrics", {})
+                job.checkpoint = blob
+        job.done.set()
+        self.dispatch()
+
+    def lose(self, worker: WorkerConnection) -> None:
+        failed: RemoteJob | None = None
+        with self.lock:
+            if not worker.alive:
+                return
+            worker.alive = False
+            if worker in self.workers:
+                self.workers.remove(worker)
+            job, worker.job = worker.job, None
+            if job is not None:
+                if job.attempts >= self.max_attempts:
+                    job.error = f"lost {job.attempts} workers"
+                    failed = job
+                else:
+                    self.queue.appendleft(job)
+                    self.jobs_requeued += 1
+        try:
+            worker.sock.close()
+        except OSError:
+            pass
+        if failed is not None:
+            failed.done.set()
+        if self.running:
+            print(f"[LOG] Worker {worker.name} lost", flush=True)
+        self.dispatch()
+
+    def dispatch(self) -> None:
+        assignments: list[tuple[WorkerConnection, RemoteJob]] = []
+        with self.lock:
+            for worker in self.workers:
+                if worker.job is None and worker.alive and self.queue:
+                    job = self.queue.popleft()
+                    job.attempts += 1
+                    worker.job = job
+                    assignments.append((worker, job))
+
+        for worker, job in assignments:
+            try:
+                worker.send({"type": "job", "job": job.job_id, "config": job.config, "seed": job.seed}, job.migrants)
+            except OSError:
+                self.lose(worker)
+
+    def monitor_loop(self) -> None:
+        while self.running:
+            time.sleep(min(1.0, self.heartbeat_timeout / 4))
+            now = time.monotonic()
+            with self.lock:
+                silent = [w for w in self.workers if now - w.last_seen > self.heartbeat_timeout]
+            for worker in silent:
+                self.lose(worker)
+
+    def spawn_local_workers(self, count: int, heartbeat_interval: float = 1.0) -> list[mp.process.BaseProcess]:
+        context = mp.get_context("spawn")
+        processes: list[mp.process.BaseProcess] = []
+        for i in range(count):
+            process = context.Process(
+                target=run_worker, args=(self.host, self.port, heartbeat_interval, f"local-{i}"), daemon=True
+            )
+            process.start()
+            processes.append(process)
+        return processes
+
+
+def run_worker(host: str, port: int, heartbeat_interval: float = 1.0, name: str | None = None) -> None:
+    sock = socket.create_connection((host, port))
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    send_lock = threading.Lock()
+    stopped = threading.Event()
+
+    def send(header: dict, blob: bytes = b"") -> None:
+        with send_lock:
+            send_message(sock, header, blob)
+
+    def heartbeat() -> None:
+        # a separate thread, so a long generation never looks like a dead worker
+        while not stopped.wait(heartbeat_interval):
+            try:
+                send({"type": "heartbeat"})
+            except OSError:
+                return
+
+    send({"type": "hello", "name": name or socket.gethostname()})
+    threading.Thread(target=heartbeat, daemon=True).start()
+
+    try:
+        while True:
+            header, blob = receive_message(sock)
+            if header.get("type") == "stop":
+                break
+            if header.get("type") != "job":
+                continue
+
+            job_id = header["job"]
+            try:
+                metrics, checkpoint = run_remote_job(header["config"], int(header.get("seed", 0)), unpack_genomes(blob))
+            except Exception as e:
+                send({"type": "error", "job": job_id, "message": f"{type(e).__name__}: {e}"})
+                continue
+            send({"type": "result", "job": job_id, "metrics": metrics}, checkpoint)
+    except (ConnectionError, OSError):
+        pass
+    finally:
+        stopped.set()
+        sock.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="LifeSim remote worker")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, required=True)
+    parser.add_argument("--heartbeat-interval", type=float, default=1.0)
+    parser.add_argument("--name", default=None)
+    args = parser.parse_args()
+    run_worker(args.host, args.port, args.heartbeat_interval, args.name)
@@ -1,72 +1,172 @@
 import copy
+import itertools
 import json
 import math
+import os
 import threading
 import time
+from collections.abc import Callable, Iterator
+from types import ModuleType
 
 import numpy as np
 
-from lifesim.brain.genome import Genome
+from lifesim.brain.brain_compiler import BrainCompiler
+from lifesim.brain.genome import Genome, get_max_genome_length
 from lifesim.core.entity import Entity
-from lifesim.core.grid import Grid
+from lifesim.core.grid import VIDEO_ENCODER_THREAD, Grid
+from lifesim.core.grid_backing import GridBacking, resolve_grid_backing
 from lifesim.core.simulation_settings import SimulationSettings
+from lifesim.core.sparse_grid import SparseGrid
+from lifesim.core.spatial_index import NeighborSensing, SpatialIndex
+from lifesim.core.state_view import GenerationView, StateBuffer, StepView
+from lifesim.evolution.convergence import ConvergenceMonitor
+from lifesim.evolution.diversity import get_diversity_metrics, get_unique_genome_share
+from lifesim.evolution.history_store import HISTORY_DIRECTORY, HistoryStore
+from lifesim.evolution.safe_zone_field import compute_direction_field, compute_distance_field
+from lifesim.evolution.selection_conditions.enum import SelectionCondition
+from lifesim.evolution.selection_mask import MaskCache
+from lifesim.utils.memory_monitor import MemoryMonitor
+from lifesim.utils.phase_timer import PhaseTimer
 from lifesim.utils.rng import rng
 from lifesim.utils.utils import load_selection_condition_module
 
+# tombstoned entities are compacted out of the population once they make up this share of it
+TOMBSTONE_COMPACTION_SHARE: float = 0.25
+
 
 class Simulation:
     _id_counter_lock = threading.Lock()
     _id_counter = 1
     
     def __init__(self, settings: dict | None = None) -> None:
+        self.id = Simulation.take_id()
+        self.init_state(SimulationSettings(self.id, settings))
+
+        self.grid: Grid = self.create_grid()
+        self.convergence_monitor: ConvergenceMonitor | None = self.create_convergence_monitor()
+        self.memory_monitor: MemoryMonitor | None = self.create_memory_monitor()
+        self.history: HistoryStore | None = self.create_history_store()
+        self.brain_compiler: BrainCompiler | None = self.create_brain_compiler()
+        # rows of both parents of every entity in the previous generation, -1 for fresh minds
+        self.parent_indices: np.ndarray = np.full((0, 2), -1, dtype=np.int32)
+        self.state_buffer: StateBuffer = StateBuffer(self.settings.max_entity_count)
+        self._stream: Iterator[str] | None = None
+
+        if self.settings.safe_zone_sensing and self.grid_backing == GridBacking.SPARSE:
+            raise RuntimeError("safe_zone_sensing needs a dense grid, the distance field is a full raster")
+            
+        self.primary_survival_rate: float = self.get_primary_survival_rate()
+
+    @staticmethod
+    def take_id() -> int:
         with Simulation._id_counter_lock:
-            self.id = Simulation._id_counter
+            simulation_id = Simulation._id_counter
             Simulation._id_counter += 1
-            
-        self.settings = SimulationSettings(self.id, settings)
-        self.grid: Grid = Grid(self.settings.grid_width, self.settings.grid_height, self)
+        return simulation_id
+
+    def init_state(self, settings: SimulationSettings) -> None:
+        # State every engine that runs entities needs, also TileSimulation in a tile worker and
+        # BatchMember in a batch: counters, timer, per-step inputs, neighbour sensing, mask cache
+        # and selection conditions. Grid and population setup stay with each engine.
+        self.settings: SimulationSettings = settings
+        self.grid_backing: GridBacking = resolve_grid_backing(settings)
         self.current_generation: int = 0
         self.current_step: int = 0
         self.entities: list[Entity] = []
+        # entities in self.entities that died mid-generation and were not compacted out yet
+        self.dead_count: int = 0
         self.simulation_ended: bool = False
+        self.stop_reason: str | None = None
         self.survival_rate: float = 0.0
+        self.genome_diversity: float = 0.0
+        self.diversity: dict = {}
         self.generation_data: dict[str, int | str] = {}
         self.generation_start_time: float = 0.0
+        self.last_generation_seconds: float = 0.0
+        self.steps_total: int = 0
+        self.phase_timer: PhaseTimer = PhaseTimer(settings.phase_timing, settings.neuron_timing)
         self.cached_inputs: dict[str, float] = {}
-        self._selection_mask: np.ndarray | None = None
+        self.spatial_index: SpatialIndex = SpatialIndex(settings.neighbor_sensing_radius)
+        self._neighbor_sensing: NeighborSensing | None = None
+        # start-of-step (x, y, facing x, facing y) rows of the sensing snapshot, and which are still alive
+        self._sensed_positions: tuple[np.ndarray, ...] | None = None
+        self._sensed_alive: np.ndarray | None = None
         self.render_enabled = False
-        
-        selection_condition = getattr(self.settings, "selection_condition", None)
-        if selection_condition is not None:
-            try:
-                mod = load_selection_condition_module(selection_condition.value)
-            except Exception as e:
-                raise RuntimeError(
-                    f"Failed to load selection condition '{selection_condition.value}': {e}"
-                )
-
-            if not hasattr(mod, "condition") or not callable(mod.condition):
-                raise RuntimeError(
-                    f"Selection condition module '{selection_condition.value}' "
-                    "does not define callable 'condition(x, y, w, h)'"
-                )
-
-            self._selection_condition_callable = mod.condition
+
+        self.mask_cache: MaskCache = MaskCache(settings.mask_cache_directory)
+        self.init_selection_conditions()
+
+    def init_selection_conditions(self) -> None:
+        # one module (and, on dense grids, one slice of the mask stack) per condition in the schedule
+        schedule = self.settings.selection_schedule
+        if schedule is not None:
+            self.selection_conditions: list[SelectionCondition] = list(schedule.conditions)
+        elif self.settings.selection_condition is not None:
+            self.selection_conditions = [self.settings.selection_condition]
         else:
-            self._selection_condition_callable = None
-            
-        self.primary_survival_rate: float = self.get_primary_survival_rate()
-    
-    def get_primary_survival_rate(self):
-        total_squares = self.settings.grid_width * self.settings.grid_height
-        safe_squares = sum(
-            1
-            for x in range(self.settings.grid_width)
-            for y in range(self.settings.grid_height)
-            if self.selection_condition(x, y)
+            self.selection_conditions = []
+
+        self._selection_condition_modules: list[ModuleType] = [
+            self.load_selection_condition(c) for c in self.selection_conditions
+        ]
+        self._selection_masks: np.ndarray | None = None
+        self._selection_mask: np.ndarray | None = None
+        self._safe_zone_distances: np.ndarray | None = None
+        self._safe_zone_directions: np.ndarray | None = None
+        self._safe_zone_distance: np.ndarray | None = None
+        self._safe_zone_direction: np.ndarray | None = None
+        self._primary_survival_rates: dict[int, float] = {}
+        self.selection_index: int = 0
+
+        self._selection_condition_module: ModuleType | None = (
+            self._selection_condition_modules[0] if self._selection_condition_modules else None
+        )
+        self._selection_condition_callable: Callable | None = (
+            self._selection_condition_module.condition if self._selection_condition_module else None
         )
-        
-        return safe_squares / total_squares * 100
+    
+    def load_selection_condition(self, selection_condition: SelectionCondition) -> ModuleType:
+        try:
+            mod = load_selection_condition_module(selection_condition.value)
+        except Exception as e:
+            raise RuntimeError(
+                f"Failed to load selection condition '{selection_condition.value}': {e}"
+            )
+
+        if not hasattr(mod, "condition") or not callable(mod.condition):
+            raise RuntimeError(
+                f"Selection condition module '{selection_condition.value}' "
+                "does not define callable 'condition(x, y, w, h)'"
+            )
+
+        return mod
+
+    @property
+    def population_size(self) -> int:
+        return len(self.entities) - self.dead_count
+
+    def get_primary_survival_rate(self) -> float:
+        if self.selection_index in self._primary_survival_rates:
+            return self._primary_survival_rates[self.selection_index]
+
+        if self.grid_backing == GridBacking.SPARSE:
+            rate = self.estimate_primary_survival_rate()
+        else:
+            if self._selection_mask is None:
+                self.build_selection_mask()
+            mask = self._selection_mask
+            assert mask is not None  # for mypy
+            rate = float(mask.mean()) * 100
+
+        self._primary_survival_rates[self.selection_index] = rate
+        return rate
+
+    def estimate_primary_survival_rate(self, samples_per_axis: int = 128) -> float:
+        # sparse worlds never materialize a full mask, so PRS is measured on a regular lattice
+        xs = np.linspace(0, self.settings.grid_width - 1, min(samples_per_axis, self.settings.grid_width)).astype(int)
+        ys = np.linspace(0, self.settings.grid_height - 1, min(samples_per_axis, self.settings.grid_height)).astype(int)
+        safe_samples = sum(1 for x in xs for y in ys if self.selection_condition(int(x), int(y)))
+        return safe_samples / (len(xs) * len(ys)) * 100
     
     def start(self) -> None:
         self.populate()
@@ -74,66 +174,288 @@ class Simulation:
         
     def populate(self) -> None:
         self.entities = []
+        self.dead_count = 0
         for _ in range(self.settings.max_entity_count):
             genome: Genome = Genome(self.settings.brain_size)
             entity: Entity = Entity(genome, self)
             self.entities.append(entity)
+        if self.brain_compiler is not None:
+            self.brain_compiler.submit(self.entities)
         
         for entity in self.entities:
             self.grid.deploy_entity_randomly(entity)
+        self.parent_indices = np.full((len(self.entities), 2), -1, dtype=np.int32)
             
     def simulation_loop(self) -> None:
+        for _ in self.iter_loop():
+            pass
+
+    def iter_loop(self) -> Iterator[str]:
+        # the simulation loop as a generator of events: "step" after every step, "selection" when
+        # the last step of a generation is done and "generation" once the next one is placed
         self.current_generation = 1
-    
-        while not self.simulation_ended and self.current_generation < (self.settings.max_generations + 1):
-            self.generation_loop()
-            self.current_generation += 1
+        loop_start_time = time.perf_counter()
+        if self.memory_monitor is not None:
+            self.memory_monitor.start()
+        # released also when a stream is closed early, the compiler pool would outlive it otherwise
+        try:
+            while not self.simulation_ended and self.current_generation < (self.settings.max_generations + 1):
+                budget = self.settings.max_wall_clock_seconds
+                if budget is not None and time.perf_counter() - loop_start_time >= budget:
+                    self.stop_reason = "wall_clock"
+                    break
+                self.update_selection_index()
+                yield from self.iter_generation()
+                self.current_generation += 1
+        finally:
+            if self.memory_monitor is not None:
+                self.memory_monitor.stop()
+            if self.history is not None:
+                self.history.close()
+            if self.brain_compiler is not None:
+                self.brain_compiler.stop()
+
+        if self.stop_reason is None:
+            self.stop_reason = "max_generations"
+        self.write_simulation_data({"generation": self.current_generation - 1, "stop_reason": self.stop_reason})
+        print(f'[LOG] simulation ended ({self.stop_reason})')
+
+    def create_grid(self) -> Grid:
+        if self.grid_backing == GridBacking.SPARSE:
+            return SparseGrid(self.settings.grid_width, self.settings.grid_height, self)
+        return Grid(self.settings.grid_width, self.settings.grid_height, self)
+
+    def create_memory_monitor(self) -> MemoryMonitor | None:
+        if self.settings.memory_monitor_interval <= 0:
+            return None
+        return MemoryMonitor(
+            self.settings.simulation_directory, self.settings.memory_monitor_interval,
+            self.settings.memory_monitor_top_sites, VIDEO_ENCODER_THREAD
+        )
+
+    def create_brain_compiler(self) -> BrainCompiler | None:
+        if self.settings.brain_workers <= 0:
+            return None
+        return BrainCompiler(self.settings, self.settings.brain_workers)
+
+    def create_history_store(self) -> HistoryStore | None:
+        if not self.settings.history_store:
+            return None
+        return HistoryStore(
+            os.path.join(self.settings.simulation_directory, HISTORY_DIRECTORY),
+            get_max_genome_length(self.settings.brain_size), self.settings.history_delta,
+            self.settings.history_keyframe_interval
+        )
 
-        print('[LOG] simulation ended')
+    def get_genome_matrix(self, entities: list[Entity]) -> tuple[np.ndarray, np.ndarray]:
+        # (N, W) zero-padded genes and (N,) lengths, the layout of the batched engine
+        genomes = np.zeros((len(entities), get_max_genome_length(self.settings.brain_size)), dtype=np.uint32)
+        lengths = np.zeros(len(entities), dtype=np.int64)
+        for i, entity in enumerate(entities):
+            genes = entity.brain.genome.genes
+            assert genes is not None  # for mypy
+            genomes[i, :len(genes)] = genes
+            lengths[i] = len(genes)
+        return genomes, lengths
+
+    def record_history(self) -> None:
+        # genomes of the generation that just lived, before selection, with the parents they came from
+        assert self.history is not None  # for mypy
+        genomes, lengths = self.get_genome_matrix(self.entities)
+        self.history.append(self.current_generation, genomes, lengths, self.parent_indices)
+
+    def create_convergence_monitor(self) -> ConvergenceMonitor | None:
+        if self.settings.plateau_window <= 0:
+            return None
+        return ConvergenceMonitor(
+            self.settings.plateau_window, self.settings.plateau_threshold, self.settings.plateau_diversity_threshold
+        )
+
+    def check_convergence(self, genomes: np.ndarray, lengths: np.ndarray) -> None:
+        # called after natural selection, on the survivors; every metric is a hash or count pass
+        # over the genome matrix, linear in the population
+        if self.settings.diversity_metrics:
+            self.diversity = get_diversity_metrics(genomes, lengths)
+            self.genome_diversity = self.diversity["unique_genome_share"]
+        else:
+            self.genome_diversity = get_unique_genome_share(genomes, lengths)
+        monitor = self.convergence_monitor
+        if monitor is not None and monitor.update(self.survival_rate, self.genome_diversity):
+            print(f"[LOG] Plateau after {self.current_generation} generations: {monitor.describe()}", flush=True)
+            self.simulation_ended = True
+            self.stop_reason = "plateau"
+
+    def get_stream(self) -> Iterator[str]:
+        # one loop shared by run_steps, iter_steps and iter_generations, each continues where the
+        # previous one stopped; not to be mixed with start()
+        if self._stream is None:
+            if not self.entities:
+                self.populate()
+            self._stream = self.iter_loop()
+        return self._stream
+
+    def iter_steps(self) -> Iterator[StepView]:
+        for event in self.get_stream():
+            if event == "step":
+                self.state_buffer.gather(self.entities)
+                yield self.state_buffer.view(self.current_generation, self.current_step - 1)
+
+    def run_steps(self, n: int) -> Iterator[StepView]:
+        return itertools.islice(self.iter_steps(), n)
+
+    def iter_generations(self) -> Iterator[GenerationView]:
+        state: StepView | None = None
+        for event in self.get_stream():
+            if event == "selection":
+                self.state_buffer.gather(self.entities)
+                state = self.state_buffer.view(self.current_generation, self.current_step - 1)
+            elif event == "generation" and state is not None:
+                yield GenerationView(state, self.get_survivor_mask(state.x, state.y), self.get_generation_stats())
+
+    def get_survivor_mask(self, xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
+        # the entities at these positions that natural selection keeps
+        if self.grid_backing == GridBacking.SPARSE:
+            return np.fromiter((self.selection_condition(int(x), int(y)) for x, y in zip(xs, ys)), dtype=bool, count=len(xs))
+        return self.selection_mask[ys, xs]
+
+    def get_generation_stats(self) -> dict:
+        stats: dict = {
+            "generation": self.current_generation,
+            "steps": self.current_step - 1,
+            "seconds": self.last_generation_seconds,
+            "survival_rate": self.survival_rate,
+            "genome_diversity": self.genome_diversity,
+            "diversity": self.diversity,
+            "stop_reason": self.stop_reason,
+        }
+        if self.phase_timer.enabled:
+            stats["phase_seconds"] = self.phase_timer.last_generation
+        return stats
 
     def generation_loop(self) -> None:
+        for _ in self.iter_generation():
+            pass
+
+    def iter_generation(self) -> Iterator[str]:
         self.generation_start_time = time.perf_counter()
         self.current_step = 1
 
-        for entity in self.entities:
-            entity.brain.init()
+        timer = self.phase_timer
+        with timer.measure("brain_init"):
+            if self.brain_compiler is not None:
+                # only what the workers did not finish while the last generation was wrapped up
+                self.brain_compiler.load(self.entities)
+            else:
+                for entity in self.entities:
+                    entity.brain.init()
 
         pictures: list = []
         while self.settings.steps_per_generation >= self.current_step and not self.simulation_ended:
             self.update_cached_inputs()
-            
-            for entity in self.entities:
-                entity.brain.process()   
-                entity.performed_actions.clear()
+            self.process_entities()
 
             if self.render_enabled:
-                pictures.append(self.grid.get_picture())
+                with timer.measure("rendering"):
+                    pictures.append(self.grid.get_picture())
             self.current_step += 1
+            self.steps_total += 1
+            yield "step"
 
+        # selection, the telemetry and the history only see the living
+        if self.dead_count:
+            self.compact_entities()
+        yield "selection"
         self.on_generation_end(pictures)
+        yield "generation"
+
+    def process_entities(self) -> None:
+        # sensing, brain_eval and actions are charged per neuron inside Brain.process
+        for entity in self.entities:
+            if entity.dead:
+                continue
+            entity.brain.process()
+            entity.performed_actions.clear()
+        if self.dead_count and self.dead_count >= TOMBSTONE_COMPACTION_SHARE * len(self.entities):
+            self.compact_entities()
+
+    def kill(self, entity: Entity) -> None:
+        # Mid-generation death (kys and kill outputs). The entity leaves the grid and stays in
+        # self.entities as a tombstone: the rest of the step and later steps skip it, and it is
+        # dropped at the next compaction, so a death costs O(1) and no death costs nothing.
+        if entity.dead:
+            return
+        entity.die()
+        # output neurons it has left this step must not move it back onto the grid
+        entity.performed_actions.add("moved")
+        self.dead_count += 1
+        alive = self._sensed_alive
+        if alive is not None and entity.population_index < len(alive) and alive[entity.population_index]:
+            # no longer anyone's neighbour, the snapshot is re-sensed without it on next use
+            alive[entity.population_index] = False
+            self._neighbor_sensing = None
+
+    def compact_entities(self) -> None:
+        # one pass over the population for a batch of deaths; parent rows of the history stay aligned
+        if len(self.parent_indices) == len(self.entities):
+            keep = np.fromiter((not e.dead for e in self.entities), dtype=bool, count=len(self.entities))
+            self.parent_indices = self.parent_indices[keep]
+        self.entities = [e for e in self.entities if not e.dead]
+        self.dead_count = 0
                 
     def on_generation_end(self, pictures: list[np.ndarray]) -> None:
-        self.update_simulation_data()
-        self.do_natural_selection()  
+        timer = self.phase_timer
+        with timer.measure("io"):
+            self.update_simulation_data()
+            if self.history is not None:
+                self.record_history()
+        with timer.measure("selection"):
+            self.do_natural_selection()  
+            self.check_convergence(*self.get_genome_matrix(self.entities))
 
         elapsed = time.perf_counter() - self.generation_start_time
-        self.log_generation_summary(elapsed) 
-
-        self.reproduce()
+        self.last_generation_seconds = elapsed
+        with timer.measure("io"):
+            self.log_generation_summary(elapsed) 
+
+        with timer.measure("reproduction"):
+            self.reproduce()
+            # offspring brains build in the pool while the video, placement and sampling below run
+            if self.brain_compiler is not None and not self.simulation_ended:
+                self.brain_compiler.submit(self.entities)
         if self.render_enabled:
-            self.grid.save_video(pictures, self.current_generation, self.survival_rate)
-        self.place_new_generation_entities()
+            with timer.measure("rendering"):
+                self.grid.save_video(pictures, self.current_generation, self.survival_rate)
+        with timer.measure("placement"):
+            self.place_new_generation_entities()
+        if self.memory_monitor is not None:
+            with timer.measure("io"):
+                self.memory_monitor.update(self.current_generation)
+        timer.end_generation()
+
+    def get_phase_timings(self) -> dict[str, dict]:
+        # lifetime totals, per-generation means, last generation and histograms for every phase
+        return self.phase_timer.summary()
 
     def update_simulation_data(self):
         self.generation_data["generation"] = self.current_generation
-        self.generation_data['random_brains_3'] = [str(rng.random.choice([e.brain for e in self.entities])) for _ in range(3)]
+        # a population killed off mid-generation (predation) has no brains left to sample
+        self.generation_data['random_brains_3'] = (
+            [str(rng.random.choice([e.brain for e in self.entities])) for _ in range(3)] if self.entities else []
+        )
         self.generation_data["survival_rate"] = self.survival_rate
+        self.generation_data["genome_diversity"] = self.genome_diversity
+        if self.diversity:
+            self.generation_data["diversity"] = self.diversity  # type: ignore[assignment]
+        if self.settings.phase_timing_telemetry:
+            # like survival_rate, the timings are those of the previous generation
+            self.generation_data["phase_seconds"] = self.phase_timer.last_generation  # type: ignore[assignment]
 
         self.write_simulation_data(self.generation_data)
        
     def do_natural_selection(self) -> None:
         alive_entities = []
-        for entity in self.entities:
+        for i, entity in enumerate(self.entities):
+            entity.population_index = i  # parents are recorded by their row in this generation
             if self.selection_condition(entity.transform.position_x, entity.transform.position_y):
                 alive_entities.append(entity)
             else:
@@ -167,15 +489,18 @@ class Simulation:
         used_parents: list[Entity] = []
 
         new_entities: list[Entity] = []
+        parent_indices: list[tuple[int, int]] = []
 
         if len(parents) < 2:
             print(f"[LOG] Population went extinct after {self.current_generation} generations")
             self.simulation_ended = True
+            self.stop_reason = "extinct"
             return      
         
         for _ in range(self.settings.fresh_minds):
             fresh_mind: Entity = Entity(Genome(self.settings.brain_size), self)
             new_entities.append(fresh_mind)
+            parent_indices.append((-1, -1))
         
         while len(new_entities) < self.settings.max_entity_count:      
 
@@ -188,6 +513,7 @@ class Simulation:
 
             entity: Entity = Entity(child_genome, self)
             new_entities.append(entity)
+            parent_indices.append((parent_a.population_index, parent_b.population_index))
 
             used_parents.append(parent_a)
             used_parents.append(parent_b)
@@ -199,6 +525,7 @@ class Simulation:
             e.die()
 
         self.entities = new_entities
+        self.parent_indices = np.array(parent_indices, dtype=np.int32).reshape(-1, 2)
 
     def place_new_generation_entities(self) -> None:
         for entity in self.entities:
@@ -211,6 +538,11 @@ class Simulation:
             f.write('\n')
     
     def selection_condition(self, x: int, y: int) -> bool:
+        if self.grid_backing == GridBacking.SPARSE:
+            cond = self._selection_condition_callable
+            assert cond is not None  # for mypy
+            return bool(cond(x, y, self.settings.grid_width, self.settings.grid_height))
+
         if self._selection_mask is None:
             self.build_selection_mask()
         mask = self._selection_mask
@@ -225,13 +557,106 @@ class Simulation:
         self.cached_inputs['oscillator'] = 0.5 * (
             math.sin(2 * math.pi / self.settings.steps_per_generation * self.current_step) + 1
         )
-        
+        if self.settings.social_sensing:
+            self.sense_neighbors()
+
+    def sense_neighbors(self) -> None:
+        # Snapshot of the living population before anyone acts in this step, so density, nearest
+        # neighbour and forward cone do not depend on entity order or on which brain asks first.
+        # Row i belongs to the entity with population_index i.
+        entities = self.entities
+        if self.dead_count:
+            entities = [e for e in entities if not e.dead]
+        n = len(entities)
+        xs = np.empty(n, dtype=np.int64)
+        ys = np.empty(n, dtype=np.int64)
+        facing_x = np.empty(n, dtype=np.int64)
+        facing_y = np.empty(n, dtype=np.int64)
+
+        for i, entity in enumerate(entities):
+            entity.population_index = i
+            xs[i] = entity.transform.position_x
+            ys[i] = entity.transform.position_y
+            facing_x[i], facing_y[i] = entity.transform.direction.value
+
+        self._sensed_positions = (xs, ys, facing_x, facing_y)
+        self._sensed_alive = np.ones(n, dtype=bool)
+        self._neighbor_sensing = self.spatial_index.sense(xs, ys, facing_x, facing_y)
+
+    def neighbor_sensing(self) -> NeighborSensing:
+        if self._sensed_alive is None:
+            self.sense_neighbors()
+        if self._neighbor_sensing is None:
+            # entities killed since the snapshot are dropped from it, their rows are left unused
+            alive = self._sensed_alive
+            assert alive is not None and self._sensed_positions is not None  # for mypy
+            sensing = self.spatial_index.sense(*(a[alive] for a in self._sensed_positions))
+            density = np.zeros(len(alive))
+            nearest_distance = np.ones(len(alive))
+            forward_neighbor = np.zeros(len(alive), dtype=bool)
+            density[alive] = sensing.density
+            nearest_distance[alive] = sensing.nearest_distance
+            forward_neighbor[alive] = sensing.forward_neighbor
+            self._neighbor_sensing = NeighborSensing(density, nearest_distance, forward_neighbor)
+        return self._neighbor_sensing
+
     def build_selection_mask(self) -> None:
+        # every condition of the schedule is stacked once, switching phases only swaps the view
         w, h = self.settings.grid_width, self.settings.grid_height
-        cond = self._selection_condition_callable
-        
-        self._selection_mask = np.fromfunction(
-            np.vectorize(lambda y, x: bool(cond(int(x), int(y), w, h))),
-            (h, w),
-            dtype=int
-        )
\ No newline at end of file
+        self._selection_masks = np.stack([
+            self.mask_cache.load(condition.value, module, w, h)
+            for condition, module in zip(self.selection_conditions, self._selection_condition_modules)
+        ])
+        self._selection_mask = self._selection_masks[self.selection_index]
+
+        if self.settings.safe_zone_sensing:
+            self._safe_zone_distances = np.stack([compute_distance_field(mask) for mask in self._selection_masks])
+            self._safe_zone_directions = np.stack([compute_direction_field(d) for d in self._safe_zone_distances])
+            self._safe_zone_distance = self._safe_zone_distances[self.selection_index]
+            self._safe_zone_direction = self._safe_zone_directions[self.selection_index]
+
+    @property
+    def selection_mask(self) -> np.ndarray:
+        # active slice of the mask stack, indexed [y, x]
+        if self._selection_mask is None:
+            self.build_selection_mask()
+        assert self._selection_mask is not None  # for mypy
+        return self._selection_mask
+
+    @property
+    def safe_zone_distance(self) -> np.ndarray:
+        # chessboard distance from each cell to the nearest safe cell of the active mask, indexed [y, x]
+        if self._safe_zone_distance is None:
+            self.build_selection_mask()
+        assert self._safe_zone_distance is not None  # for mypy
+        return self._safe_zone_distance
+
+    @property
+    def safe_zone_direction(self) -> np.ndarray:
+        # index into Direction of the first step towards the nearest safe cell, -1 when already safe
+        if self._safe_zone_direction is None:
+            self.build_selection_mask()
+        assert self._safe_zone_direction is not None  # for mypy
+        return self._safe_zone_direction
+
+    def update_selection_index(self) -> None:
+        schedule = self.settings.selection_schedule
+        if schedule is not None:
+            self.set_selection_index(schedule.slice_for_generation(self.current_generation))
+
+    def set_selection_index(self, index: int) -> None:
+        if index == self.selection_index:
+            return
+
+        self.selection_index = index
+        self._selection_condition_module = self._selection_condition_modules[index]
+        self._selection_condition_callable = self._selection_condition_module.condition
+        if self._selection_masks is not None:
+            self._selection_mask = self._selection_masks[index]
+        if self._safe_zone_distances is not None and self._safe_zone_directions is not None:
+            self._safe_zone_distance = self._safe_zone_distances[index]
+            self._safe_zone_direction = self._safe_zone_directions[index]
+        if isinstance(self.grid, SparseGrid):
+            self.grid.reset_background()
+
+        self.primary_survival_rate = self.get_primary_survival_rate()
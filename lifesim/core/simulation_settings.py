@@ -1,73 +1,142 @@
 import json
 import os
 
+from lifesim.brain.precision import BrainPrecision
+from lifesim.core.grid_backing import GridBacking
 from lifesim.evolution.selection_conditions.enum import SelectionCondition
+from lifesim.evolution.selection_schedule import SelectionSchedule
 from lifesim.utils.utils import get_time_now
 
 
 class SimulationSettings:
-    def __init__(self, simulation_id: int, settings_dict: dict | None = None):
+    def __init__(self, simulation_id: int, settings_dict: dict | None = None, save: bool = True):
         self.name: str = f'simulation_{simulation_id}'
 
         self.grid_width: int = 128
         self.grid_height: int = 128
+        self.tile_count: int = 1
+        self.grid_backing: GridBacking = GridBacking.AUTO
 
         self.steps_per_generation: int = 256
         self.max_generations: int = 10_000_000
+        self.max_wall_clock_seconds: float | None = None
+        self.plateau_window: int = 0
+        self.plateau_threshold: float = 0.5
+        self.plateau_diversity_threshold: float = 0.02
         self.selection_condition: SelectionCondition | None = None
+        self.selection_schedule: SelectionSchedule | None = None
 
         self.max_entity_count: int = 1024
         self.brain_size: int = 1
         self.max_internal_neurons: int = 0
         self.fresh_minds: int = 1
+        self.brain_precision: BrainPrecision = BrainPrecision.FLOAT64
+        self.social_sensing: bool = False
+        self.neighbor_sensing_radius: int = 4
+        self.safe_zone_sensing: bool = False
+        self.predation: bool = False
 
         self.gene_mutation_probability: float = 1 / 10_000
 
+        self.phase_timing: bool = True
+        self.neuron_timing: bool = False  # per-neuron step timing costs about 5% of the step loop
+        self.phase_timing_telemetry: bool = False
+        self.memory_monitor_interval: int = 0
+        self.memory_monitor_top_sites: int = 10
+        self.diversity_metrics: bool = True
+        self.brain_workers: int = 0
+
+        self.history_store: bool = False
+        self.history_delta: bool = True
+        self.history_keyframe_interval: int = 64
+
         self.video_framerate: int = 30
         self.video_upscale_factor: int = 8
 
+        self.mask_cache_directory: str | None = "./simulations/mask_cache"
+        self.simulation_directory: str = ""
+
         if settings_dict:
             for key, value in settings_dict.items():
                 if key == "selection_condition" and isinstance(value, str):
                     self.selection_condition = SelectionCondition(value)
+                elif key == "selection_schedule" and isinstance(value, dict):
+                    self.selection_schedule = SelectionSchedule.from_dict(value)
+                elif key == "brain_precision" and isinstance(value, str):
+                    self.brain_precision = BrainPrecision(value)
+                elif key == "grid_backing" and isinstance(value, str):
+                    self.grid_backing = GridBacking(value)
                 elif hasattr(self, key):
                     setattr(self, key, value)
 
-        self.simulation_directory = f"./simulations/{self.name} {get_time_now()}"
+        if not self.simulation_directory:
+            self.simulation_directory = f"./simulations/{self.name} {get_time_now()}"
 
-        self.save_settings()
+        if save:
+            self.save_settings()
 
-    def save_settings(self) -> None:
-        os.makedirs(self.simulation_directory, exist_ok=True)
+    def to_dict(self) -> dict:
         data: dict = {
             "general": {
                 "name": self.name
             },
             "grid": {
                 "width": self.grid_width,
-                "height": self.grid_height
+                "height": self.grid_height,
+                "tile_count": self.tile_count,
+                "grid_backing": self.grid_backing.value
             },
             "simulation_control": {
                 "steps_per_generation": self.steps_per_generation,
                 "max_generations": self.max_generations,
-                "selection_condition": self.selection_condition.value if self.selection_condition else None
+                "max_wall_clock_seconds": self.max_wall_clock_seconds,
+                "plateau_window": self.plateau_window,
+                "plateau_threshold": self.plateau_threshold,
+                "plateau_diversity_threshold": self.plateau_diversity_threshold,
+                "selection_condition": self.selection_condition.value if self.selection_condition else None,
+                "selection_schedule": self.selection_schedule.to_dict() if self.selection_schedule else None
             },
             "entities_and_brain": {
                 "max_entity_count": self.max_entity_count,
                 "brain_size": self.brain_size,
                 "max_internal_neurons": self.max_internal_neurons,
-                "fresh_minds": self.fresh_minds
+                "fresh_minds": self.fresh_minds,
+                "brain_precision": self.brain_precision.value,
+                "social_sensing": self.social_sensing,
+                "neighbor_sensing_radius": self.neighbor_sensing_radius,
+                "safe_zone_sensing": self.safe_zone_sensing,
+                "predation": self.predation
             },
             "mutation_and_evolution": {
                 "gene_mutation_probability": self.gene_mutation_probability
             },
+            "instrumentation": {
+                "phase_timing": self.phase_timing,
+                "neuron_timing": self.neuron_timing,
+                "phase_timing_telemetry": self.phase_timing_telemetry,
+                "memory_monitor_interval": self.memory_monitor_interval,
+                "memory_monitor_top_sites": self.memory_monitor_top_sites,
+                "diversity_metrics": self.diversity_metrics,
+                "brain_workers": self.brain_workers
+            },
+            "history": {
+                "history_store": self.history_store,
+                "history_delta": self.history_delta,
+                "history_keyframe_interval": self.history_keyframe_interval
+            },
             "video": {
                 "video_framerate": self.video_framerate,
                 "video_upscale_factor": self.video_upscale_factor
             },
             "directories": {
-                "simulation_directory": self.simulation_directory
+                "simulation_directory": self.simulation_directory,
+                "mask_cache_directory": self.mask_cache_directory
             }
         }
+        return data
+
+    def save_settings(self) -> None:
+        os.makedirs(self.simulation_directory, exist_ok=True)
+        data = self.to_dict()
         with open(f"{self.simulation_directory}/settings.json", "w+") as f:
             json.dump(data, f, indent=4)
\ No newline at end of file
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from lifesim.core.entity import Entity
+from lifesim.core.grid import Grid
+from lifesim.utils.direction import Direction
+
+if TYPE_CHECKING:
+    from lifesim.core.simulation import Simulation
+
+MAX_PICTURE_SIZE: int = 1024
+
+
+class SparseGrid(Grid):
+    # Spatial hash keyed by cell coordinates: memory follows the population, not the world area
+    def __init__(self, width: int, height: int, simulation: Simulation) -> None:
+        self.width: int = width
+        self.height: int = height
+        self.simulation: Simulation = simulation
+        self.objects: dict[tuple[int, int], Entity] = {}
+        self._background: np.ndarray | None = None
+
+    def __str__(self) -> str:
+        return f'SparseGrid({self.width}x{self.height}, {len(self.objects)} occupied)'
+
+    def get_object(self, x: int, y: int) -> Entity | None:
+        return self.objects.get((x, y))
+
+    def is_occupied(self, x: int, y: int) -> bool:
+        return (x, y) in self.objects
+
+    def try_set_position(self, object: Entity, x: int, y: int) -> bool:
+        if not self.in_boundaries(x, y):
+            return False
+
+        if (x, y) in self.objects:
+            return False
+
+        self.place_object(object, x, y)
+        return True
+
+    def place_object(self, object: Entity, x: int, y: int) -> None:
+        self.objects[(x, y)] = object
+        object.set_position(x, y)
+
+    def remove_entity(self, x: int, y: int) -> None:
+        self.objects.pop((x, y), None)
+
+    def blockage_in_direction(self, entity: Entity, direction: Direction) -> bool:
+        x: int = entity.transform.position_x + direction.value[0]
+        y: int = entity.transform.position_y + direction.value[1]
+        return not self.in_boundaries(x, y) or (x, y) in self.objects
+
+    def reset_background(self) -> None:
+        self._background = None
+
+    @property
+    def picture_scale(self) -> int:
+        return max(1, -(-max(self.width, self.height) // MAX_PICTURE_SIZE))
+
+    def get_picture(self) -> np.ndarray:
+        # huge worlds are rendered downscaled, one pixel per picture_scale x picture_scale block
+        sim = self.simulation
+        scale = self.picture_scale
+
+        if self._background is None:
+            w, h = -(-self.width // scale), -(-self.height // scale)
+            background = np.full((h, w, 3), 255, dtype=np.uint8)
+            if sim._selection_condition_callable is not None:
+                safe = np.fromfunction(
+                    np.vectorize(lambda y, x: sim.selection_condition(int(x) * scale, int(y) * scale)),
+                    (h, w),
+                    dtype=int
+                )
+                background[safe] = (144, 238, 144)
+            self._background = background
+
+        picture = self._background.copy()
+        for entity in sim.entities:
+            picture[entity.transform.position_y // scale, entity.transform.position_x // scale] = entity.color
+
+        return picture
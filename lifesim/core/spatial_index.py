@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import numpy as np
+
+# cos(45 deg): a neighbour is "in the forward cone" when it is within 45 degrees of the facing direction
+FORWARD_CONE_COS: float = float(np.sqrt(0.5))
+
+
+class NeighborSensing:
+    def __init__(self, density: np.ndarray, nearest_distance: np.ndarray, forward_neighbor: np.ndarray) -> None:
+        self.density: np.ndarray = density
+        self.nearest_distance: np.ndarray = nearest_distance
+        self.forward_neighbor: np.ndarray = forward_neighbor
+
+
+class SpatialIndex:
+    # Uniform bucket grid with bucket side == radius, so every neighbour within the radius is in
+    # the 3x3 block of buckets around an entity. Queries cost O(N * local density), never O(N^2).
+    def __init__(self, radius: int) -> None:
+        if radius < 1:
+            raise ValueError("Spatial index radius must be at least 1")
+        self.radius: int = radius
+
+        offsets = np.arange(-radius, radius + 1)
+        self.cells_in_radius: int = int(((offsets[:, None] ** 2 + offsets[None, :] ** 2) <= radius ** 2).sum()) - 1
+
+        self.xs: np.ndarray = np.empty(0, dtype=np.int64)
+        self.ys: np.ndarray = np.empty(0, dtype=np.int64)
+        self._order: np.ndarray = np.empty(0, dtype=np.int64)
+        self._sorted_keys: np.ndarray = np.empty(0, dtype=np.int64)
+        self._keys_x: np.ndarray = np.empty(0, dtype=np.int64)
+        self._keys_y: np.ndarray = np.empty(0, dtype=np.int64)
+        self._stride: int = 0
+
+    def __len__(self) -> int:
+        return len(self.xs)
+
+    def build(self, xs: np.ndarray, ys: np.ndarray) -> None:
+        self.xs = np.asarray(xs, dtype=np.int64)
+        self.ys = np.asarray(ys, dtype=np.int64)
+
+        # +1 keeps the keys of the surrounding buckets non-negative
+        self._keys_x = self.xs // self.radius + 1
+        self._keys_y = self.ys // self.radius + 1
+        self._stride = int(self._keys_y.max()) + 2 if len(self.ys) else 0
+
+        keys = self._keys_x * self._stride + self._keys_y
+        self._order = np.argsort(keys, kind="stable")
+        self._sorted_keys = keys[self._order]
+
+    def neighbor_pairs(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # every ordered pair (i, j), i != j, with squared distance <= radius^2
+        n = len(self.xs)
+        pairs_i: list[np.ndarray] = []
+        pairs_j: list[np.ndarray] = []
+
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                keys = (self._keys_x + dx) * self._stride + (self._keys_y + dy)
+                start = np.searchsorted(self._sorted_keys, keys, side="left")
+                counts = np.searchsorted(self._sorted_keys, keys, side="right") - start
+                total = int(counts.sum())
+                if total == 0:
+                    continue
+
+                first = np.cumsum(counts) - counts
+                within = np.arange(total) - np.repeat(first, counts)
+                pairs_i.append(np.repeat(np.arange(n), counts))
+                pairs_j.append(self._order[np.repeat(start, counts) + within])
+
+        if not pairs_i:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty, empty
+
+        i = np.concatenate(pairs_i)
+        j = np.concatenate(pairs_j)
+        distance_sq = (self.xs[j] - self.xs[i]) ** 2 + (self.ys[j] - self.ys[i]) ** 2
+
+        keep = (i != j) & (distance_sq <= self.radius ** 2)
+        return i[keep], j[keep], distance_sq[keep]
+
+    def radius_counts(self) -> np.ndarray:
+        i, _, _ = self.neighbor_pairs()
+        return np.bincount(i, minlength=len(self.xs))
+
+    def nearest_neighbors(self) -> tuple[np.ndarray, np.ndarray]:
+        # (distance, index) of the nearest neighbour within the radius; (inf, -1) when there is none
+        n = len(self.xs)
+        distance = np.full(n, np.inf)
+        index = np.full(n, -1, dtype=np.int64)
+
+        i, j, distance_sq = self.neighbor_pairs()
+        if len(i):
+            order = np.lexsort((distance_sq, i))
+            nearest_i, first = np.unique(i[order], return_index=True)
+            distance[nearest_i] = np.sqrt(distance_sq[order][first])
+            index[nearest_i] = j[order][first]
+
+        return distance, index
+
+    def sense(self, xs: np.ndarray, ys: np.ndarray, facing_x: np.ndarray, facing_y: np.ndarray) -> NeighborSensing:
+        self.build(xs, ys)
+        n = len(self.xs)
+
+        i, j, distance_sq = self.neighbor_pairs()
+        density = np.bincount(i, minlength=n) / self.cells_in_radius
+
+        nearest = np.ones(n)
+        if len(i):
+            order = np.lexsort((distance_sq, i))
+            nearest_i, first = np.unique(i[order], return_index=True)
+            nearest[nearest_i] = np.sqrt(distance_sq[order][first]) / self.radius
+
+        facing_x = np.asarray(facing_x)
+        facing_y = np.asarray(facing_y)
+        dot = (self.xs[j] - self.xs[i]) * facing_x[i] + (self.ys[j] - self.ys[i]) * facing_y[i]
+        facing_length = np.sqrt(facing_x[i] ** 2 + facing_y[i] ** 2)
+        in_cone = dot >= FORWARD_CONE_COS * np.sqrt(distance_sq) * facing_length
+        forward_neighbor = np.bincount(i[in_cone], minlength=n) > 0
+
+        return NeighborSensing(density, nearest, forward_neighbor)
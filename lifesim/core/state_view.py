@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from lifesim.utils.direction import Direction
+
+if TYPE_CHECKING:
+    from lifesim.core.entity import Entity
+
+# direction codes of the views, the same order as the direction indices of the batched engine
+DIRECTION_INDEX: dict[Direction, int] = {d: i for i, d in enumerate(Direction)}
+
+
+def read_only(array: np.ndarray) -> np.ndarray:
+    view = array.view()
+    view.flags.writeable = False
+    return view
+
+
+class StepView:
+    # State right after one step. The arrays are read-only views of buffers owned by the engine
+    # and are overwritten when it advances, copy whatever has to outlive the next step. Shapes are
+    # (N,) for a Simulation and (S, N) for a BatchedSimulation.
+    def __init__(self, generation: int, step: int, x: np.ndarray, y: np.ndarray, direction: np.ndarray,
+                 alive: np.ndarray) -> None:
+        self.generation: int = generation
+        self.step: int = step
+        self.x: np.ndarray = x
+        self.y: np.ndarray = y
+        self.direction: np.ndarray = direction
+        self.alive: np.ndarray = alive
+
+
+class GenerationView:
+    # One finished generation: the state after its last step, the entities that passed selection
+    # and the stats written to the telemetry. Arrays follow the StepView rules.
+    def __init__(self, state: StepView, survivors: np.ndarray, stats: dict) -> None:
+        self.generation: int = state.generation
+        self.state: StepView = state
+        self.survivors: np.ndarray = survivors
+        self.stats: dict = stats
+
+
+class StateBuffer:
+    # Preallocated per-entity arrays the object model is gathered into, reused for every view so
+    # streaming a run allocates no arrays per step. Grows only if a population outgrows it.
+    def __init__(self, capacity: int) -> None:
+        self.size: int = 0
+        self.allocate(capacity)
+
+    def allocate(self, capacity: int) -> None:
+        self.x: np.ndarray = np.zeros(capacity, dtype=np.int64)
+        self.y: np.ndarray = np.zeros(capacity, dtype=np.int64)
+        self.direction: np.ndarray = np.zeros(capacity, dtype=np.int8)
+        self.alive: np.ndarray = np.zeros(capacity, dtype=bool)
+
+    def gather(self, entities: list[Entity]) -> None:
+        n = len(entities)
+        if n > len(self.x):
+            self.allocate(n)
+        self.size = n
+        transforms = [e.transform for e in entities]
+        self.x[:n] = [t.position_x for t in transforms]
+        self.y[:n] = [t.position_y for t in transforms]
+        self.direction[:n] = [DIRECTION_INDEX[t.direction] for t in transforms]
+        self.alive[:n] = [not e.dead for e in entities]
+
+    def view(self, generation: int, step: int) -> StepView:
+        n = self.size
+        return StepView(
+            generation, step,
+            read_only(self.x[:n]), read_only(self.y[:n]), read_only(self.direction[:n]), read_only(self.alive[:n])
+        )
@@ -0,0 +1,415 @@
+from __future__ import annotations
+
+import multiprocessing as mp
+import time
+from collections.abc import Iterator
+from multiprocessing import shared_memory
+from multiprocessing.connection import Connection
+
+import numpy as np
+
+from lifesim.brain.brain_compiler import BrainCompiler
+from lifesim.brain.genome import Genome
+from lifesim.core.entity import Entity
+from lifesim.core.grid import Grid
+from lifesim.core.simulation import Simulation
+from lifesim.core.simulation_settings import SimulationSettings
+from lifesim.core.sparse_grid import SparseGrid
+from lifesim.core.state_view import StepView
+from lifesim.utils.direction import Direction
+from lifesim.utils.rng import rng
+
+# (entity id, genes, x, y, direction name)
+EntityRecord = tuple[int, list[int], int, int, str]
+# (entity id, from x, from y, to x, to y, direction name)
+Handoff = tuple[int, int, int, int, int, str]
+
+
+def get_tile_bounds(height: int, tile_count: int) -> list[int]:
+    tile_count = max(1, min(tile_count, height))
+    return [height * t // tile_count for t in range(tile_count + 1)]
+
+
+class TileGrid(Grid):
+    # One horizontal band of the world. Occupancy of the whole world lives in shared memory,
+    # this worker only writes rows [y0, y1) and reads its neighbours' edge rows from the halo
+    # snapshot taken before the step. Entities are only stored for the band.
+    def __init__(self, width: int, height: int, simulation: Simulation, bounds: list[int], tile_index: int,
+                 occupancy: np.ndarray, halo: np.ndarray) -> None:
+        self.width: int = width
+        self.height: int = height
+        self.simulation: Simulation = simulation
+        self.tile_index: int = tile_index
+        self.y0: int = bounds[tile_index]
+        self.y1: int = bounds[tile_index + 1]
+        self.occupancy: np.ndarray = occupancy
+        self.halo: np.ndarray = halo
+        self.objects: dict[tuple[int, int], Entity] = {}
+        self.entity_ids: dict[Entity, int] = {}
+        self.handoffs: list[Handoff] = []
+
+    def __str__(self) -> str:
+        return f'TileGrid({self.tile_index}: rows {self.y0}-{self.y1 - 1})'
+
+    def owns(self, y: int) -> bool:
+        return self.y0 <= y < self.y1
+
+    def is_occupied(self, x: int, y: int) -> bool:
+        if self.owns(y):
+            return bool(self.occupancy[y, x])
+        if y == self.y0 - 1:
+            return bool(self.halo[self.tile_index - 1, 1, x])
+        if y == self.y1:
+            return bool(self.halo[self.tile_index + 1, 0, x])
+        return True
+
+    def try_set_position(self, object: Entity, x: int, y: int) -> bool:
+        if not self.in_boundaries(x, y) or not self.owns(y):
+            return False
+
+        if self.occupancy[y, x]:
+            return False
+
+        self.place_object(object, x, y)
+        return True
+
+    def place_object(self, object: Entity, x: int, y: int) -> None:
+        self.occupancy[y, x] = 1
+        self.objects[(x, y)] = object
+        object.set_position(x, y)
+
+    def remove_entity(self, x: int, y: int) -> None:
+        if self.objects.pop((x, y), None) is not None:
+            self.occupancy[y, x] = 0
+
+    def move(self, entity: Entity, direction: Direction) -> None:
+        x: int = entity.transform.position_x
+        y: int = entity.transform.position_y
+
+        new_x: int = x + direction.value[0]
+        new_y: int = y + direction.value[1]
+
+        if not self.in_boundaries(new_x, new_y) or self.is_occupied(new_x, new_y):
+            return
+
+        if self.owns(new_y):
+            self.remove_entity(x, y)
+            self.place_object(entity, new_x, new_y)
+            entity.transform.direction = direction
+            return
+
+        # the origin cell stays reserved until the coordinator accepts the handoff
+        self.handoffs.append((self.entity_ids[entity], x, y, new_x, new_y, direction.name))
+
+    def blockage_in_direction(self, entity: Entity, direction: Direction) -> bool:
+        x: int = entity.transform.position_x + direction.value[0]
+        y: int = entity.transform.position_y + direction.value[1]
+        return not self.in_boundaries(x, y) or self.is_occupied(x, y)
+
+
+class TileSimulation(Simulation):
+    # Stands in for the Simulation inside a tile worker, so neuron functions keep working unchanged
+    def __init__(self, settings: SimulationSettings, bounds: list[int], tile_index: int,
+                 occupancy: np.ndarray, halo: np.ndarray) -> None:
+        self.id = -1
+        # its own spatial index, so neighbours are sensed among the entities of this band only
+        self.init_state(settings)
+        self.grid: TileGrid = TileGrid(settings.grid_width, settings.grid_height, self, bounds, tile_index, occupancy, halo)
+        self._population_size: int = 0
+
+    @property
+    def population_size(self) -> int:
+        return self._population_size
+
+    def add_entity(self, record: EntityRecord) -> None:
+        entity_id, genes, x, y, direction_name = record
+        entity: Entity = Entity(Genome(genes=genes), self)
+        entity.grid = self.grid
+        entity.transform.direction = Direction[direction_name]
+        self.grid.objects[(x, y)] = entity
+        self.grid.entity_ids[entity] = entity_id
+        entity.set_position(x, y)
+        with self.phase_timer.measure("brain_init"):
+            entity.brain.init()
+        self.entities.append(entity)
+
+    def apply_transfers(self, arrivals: list[EntityRecord], departures: list[int]) -> None:
+        # occupancy for transfers was already updated by the coordinator
+        if departures:
+            leaving = set(departures)
+            staying: list[Entity] = []
+            for entity in self.entities:
+                if self.grid.entity_ids[entity] in leaving:
+                    del self.grid.objects[(entity.transform.position_x, entity.transform.position_y)]
+                    del self.grid.entity_ids[entity]
+                else:
+                    staying.append(entity)
+            self.entities = staying
+
+        for record in arrivals:
+            self.add_entity(record)
+
+    def step(self, cached_inputs: dict[str, float]) -> list[Handoff]:
+        self.cached_inputs = cached_inputs
+        if self.settings.social_sensing:
+            self.sense_neighbors()
+        self.grid.handoffs = []
+        for entity in self.entities:
+            entity.brain.process()
+            entity.performed_actions.clear()
+        return self.grid.handoffs
+
+    def collect(self) -> list[tuple[int, int, int, str]]:
+        # brain descriptions are rebuilt from the genome by the coordinator when needed
+        return [
+            (self.grid.entity_ids[e], e.transform.position_x, e.transform.position_y, e.transform.direction.name)
+            for e in self.entities
+        ]
+
+
+def run_tile_worker(settings: SimulationSettings, bounds: list[int], tile_index: int, seed: int,
+                    occupancy_name: str, halo_name: str, connection: Connection) -> None:
+    tile_count = len(bounds) - 1
+    rng.reseed(seed)
+    w, h = settings.grid_width, settings.grid_height
+
+    occupancy_memory = shared_memory.SharedMemory(name=occupancy_name)
+    halo_memory = shared_memory.SharedMemory(name=halo_name)
+    occupancy: np.ndarray = np.ndarray((h, w), dtype=np.uint8, buffer=occupancy_memory.buf)
+    halo: np.ndarray = np.ndarray((tile_count, 2, w), dtype=np.uint8, buffer=halo_memory.buf)
+
+    tile = TileSimulation(settings, bounds, tile_index, occupancy, halo)
+
+    try:
+        while True:
+            message = connection.recv()
+            command = message[0]
+
+            if command == "generation":
+                _, records, population_size, selection_index = message
+                tile.set_selection_index(selection_index)
+                tile.entities = []
+                tile.grid.objects.clear()
+                tile.grid.entity_ids.clear()
+                tile._population_size = population_size
+                for record in records:
+                    tile.add_entity(record)
+                connection.send(None)
+
+            elif command == "step":
+                _, step, cached_inputs, arrivals, departures = message
+                tile.current_step = step
+                tile.apply_transfers(arrivals, departures)
+                connection.send(tile.step(cached_inputs))
+
+            elif command == "collect":
+                _, arrivals, departures = message
+                tile.apply_transfers(arrivals, departures)
+                connection.send((tile.collect(), tile.phase_timer.take_generation()))
+
+            elif command == "stop":
+                break
+    finally:
+        del occupancy, halo, tile
+        occupancy_memory.close()
+        halo_memory.close()
+        connection.close()
+
+
+class TiledSimulation(Simulation):
+    # Splits the grid into `tile_count` horizontal bands, each stepped by its own worker process.
+    # Per step only the two edge rows of every band are exchanged (the halo), and entities that
+    # move across a band border are handed off through the coordinator. Selection, reproduction
+    # and placement still run here on the full population between generations.
+    def __init__(self, settings: dict | None = None) -> None:
+        super().__init__(settings)
+        if self.settings.predation:
+            raise RuntimeError("Tiled simulations do not support predation, a kill target can live in another tile")
+        self.tile_bounds: list[int] = get_tile_bounds(self.settings.grid_height, self.settings.tile_count)
+        self.tile_count: int = len(self.tile_bounds) - 1
+        self.row_tiles: np.ndarray = np.repeat(np.arange(self.tile_count), np.diff(self.tile_bounds))
+
+        self._occupancy_memory: shared_memory.SharedMemory | None = None
+        self._halo_memory: shared_memory.SharedMemory | None = None
+        self.occupancy: np.ndarray | None = None
+        self.halo: np.ndarray | None = None
+        self.workers: list[mp.process.BaseProcess] = []
+        self.connections: list[Connection] = []
+
+        self.arrivals: list[list[EntityRecord]] = [[] for _ in range(self.tile_count)]
+        self.departures: list[list[int]] = [[] for _ in range(self.tile_count)]
+        self.handoffs_accepted: int = 0
+        self.handoffs_rejected: int = 0
+
+    def create_grid(self) -> Grid:
+        # The coordinator only holds entities between generations, while the tiles step the world's
+        # occupancy lives in shared memory. A dict of entities keeps it from allocating a Cell per
+        # cell of the world, whichever backing the masks use.
+        return SparseGrid(self.settings.grid_width, self.settings.grid_height, self)
+
+    def create_brain_compiler(self) -> BrainCompiler | None:
+        # tile workers build the brains of the entities they are handed
+        return None
+
+    def sense_neighbors(self) -> None:
+        # positions live in the tile workers during a generation, each senses its own band
+        pass
+
+    def iter_loop(self) -> Iterator[str]:
+        # workers live as long as the loop, also when it is streamed and closed early; a caller
+        # that started them itself (run_remote_job) keeps them and stops them itself
+        owns_workers = not self.workers
+        if owns_workers:
+            self.start_workers()
+        try:
+            yield from super().iter_loop()
+        finally:
+            if owns_workers:
+                self.stop_workers()
+
+    def iter_steps(self) -> Iterator[StepView]:
+        raise RuntimeError(
+            "Tile workers own the positions during a generation, stream tiled runs with iter_generations"
+        )
+
+    def start_workers(self) -> None:
+        w, h = self.settings.grid_width, self.settings.grid_height
+        self._occupancy_memory = shared_memory.SharedMemory(create=True, size=w * h)
+        self._halo_memory = shared_memory.SharedMemory(create=True, size=self.tile_count * 2 * w)
+        self.occupancy = np.ndarray((h, w), dtype=np.uint8, buffer=self._occupancy_memory.buf)
+        self.halo = np.ndarray((self.tile_count, 2, w), dtype=np.uint8, buffer=self._halo_memory.buf)
+
+        # spawn, not fork: the coordinator usually runs on a thread next to the render UI
+        context = mp.get_context("spawn")
+        for tile_index in range(self.tile_count):
+            parent_connection, child_connection = context.Pipe()
+            worker = context.Process(
+                target=run_tile_worker,
+                args=(self.settings, self.tile_bounds, tile_index, rng.seed * 1_000_003 + tile_index + 1,
+                      self._occupancy_memory.name, self._halo_memory.name, child_connection),
+                daemon=True,
+            )
+            worker.start()
+            child_connection.close()
+            self.workers.append(worker)
+            self.connections.append(parent_connection)
+
+    def stop_workers(self) -> None:
+        for connection in self.connections:
+            try:
+                connection.send(("stop",))
+            except (BrokenPipeError, OSError):
+                pass
+        for worker in self.workers:
+            worker.join(timeout=5)
+            if worker.is_alive():
+                worker.terminate()
+        for connection in self.connections:
+            connection.close()
+        self.workers = []
+        self.connections = []
+
+        self.occupancy = None
+        self.halo = None
+        for memory in (self._occupancy_memory, self._halo_memory):
+            if memory is not None:
+                memory.close()
+                memory.unlink()
+        self._occupancy_memory = None
+        self._halo_memory = None
+
+    def broadcast(self, messages: list[tuple]) -> list:
+        for connection, message in zip(self.connections, messages):
+            connection.send(message)
+        return [connection.recv() for connection in self.connections]
+
+    def take_transfers(self) -> tuple[list[list[EntityRecord]], list[list[int]]]:
+        arrivals, departures = self.arrivals, self.departures
+        self.arrivals = [[] for _ in range(self.tile_count)]
+        self.departures = [[] for _ in range(self.tile_count)]
+        return arrivals, departures
+
+    def entity_record(self, entity_id: int) -> EntityRecord:
+        entity = self.entities[entity_id]
+        genes = entity.brain.genome.genes
+        assert genes is not None  # for mypy
+        return (entity_id, genes.tolist(), entity.transform.position_x,
+                entity.transform.position_y, entity.transform.direction.name)
+
+    def dispatch_generation(self) -> None:
+        assert self.occupancy is not None  # for mypy
+        self.occupancy[:] = 0
+
+        records: list[list[EntityRecord]] = [[] for _ in range(self.tile_count)]
+        for entity_id, entity in enumerate(self.entities):
+            x, y = entity.transform.position_x, entity.transform.position_y
+            self.occupancy[y, x] = 1
+            records[self.row_tiles[y]].append(self.entity_record(entity_id))
+            # the coordinator grid is rebuilt from the workers in collect_generation
+            self.grid.remove_entity(x, y)
+
+        self.take_transfers()
+        self.broadcast([("generation", r, self.population_size, self.selection_index) for r in records])
+
+    def refresh_halo(self) -> None:
+        assert self.occupancy is not None and self.halo is not None  # for mypy
+        self.halo[:, 0, :] = self.occupancy[self.tile_bounds[:-1]]
+        self.halo[:, 1, :] = self.occupancy[[b - 1 for b in self.tile_bounds[1:]]]
+
+    def resolve_handoffs(self, handoffs: list[list[Handoff]]) -> None:
+        # workers are idle here, so the coordinator may write any row of the shared occupancy
+        assert self.occupancy is not None  # for mypy
+        for source_tile, tile_handoffs in enumerate(handoffs):
+            for entity_id, x, y, new_x, new_y, direction_name in tile_handoffs:
+                if self.occupancy[new_y, new_x]:
+                    self.handoffs_rejected += 1
+                    continue
+
+                self.occupancy[y, x] = 0
+                self.occupancy[new_y, new_x] = 1
+
+                entity = self.entities[entity_id]
+                entity.set_position(new_x, new_y)
+                entity.transform.direction = Direction[direction_name]
+
+                self.departures[source_tile].append(entity_id)
+                self.arrivals[self.row_tiles[new_y]].append(self.entity_record(entity_id))
+                self.handoffs_accepted += 1
+
+    def iter_generation(self) -> Iterator[str]:
+        self.generation_start_time = time.perf_counter()
+        self.current_step = 1
+        self.dispatch_generation()
+
+        while self.settings.steps_per_generation >= self.current_step and not self.simulation_ended:
+            self.update_cached_inputs()
+            self.refresh_halo()
+
+            arrivals, departures = self.take_transfers()
+            handoffs = self.broadcast([
+                ("step", self.current_step, self.cached_inputs, arrivals[t], departures[t])
+                for t in range(self.tile_count)
+            ])
+            self.resolve_handoffs(handoffs)
+            self.current_step += 1
+            self.steps_total += 1
+            yield "step"
+
+        self.collect_generation()
+        yield "selection"
+        # per-step frames are not gathered from the workers, so tiled runs never record video
+        self.on_generation_end([])
+        yield "generation"
+
+    def collect_generation(self) -> None:
+        arrivals, departures = self.take_transfers()
+        results = self.broadcast([("collect", arrivals[t], departures[t]) for t in range(self.tile_count)])
+
+        # worker phases are summed over tiles, so they add up to more than the wall time of a step
+        for tile_results, (generation_ns, generation_counts) in results:
+            if self.phase_timer.enabled:
+                self.phase_timer.merge(generation_ns, generation_counts)
+            for entity_id, x, y, direction_name in tile_results:
+                entity = self.entities[entity_id]
+                entity.transform.direction = Direction[direction_name]
+                self.grid.place_object(entity, x, y)
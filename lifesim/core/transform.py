@@ -2,6 +2,8 @@ from lifesim.utils.direction import Direction
 
 
 class Transform:
+    __slots__ = ("position_x", "position_y", "direction")
+
     def __init__(self) -> None:
         self.position_x: int = 0
         self.position_y: int = 0
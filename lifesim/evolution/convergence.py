@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+from collections import deque
+
+
+class ConvergenceMonitor:
+    # Sliding window over per-generation survival rate and genome diversity. A run has plateaued
+    # once the mean survival rate of the last `window` generations beats the `window` before it by
+    # less than `threshold` percentage points while mean diversity moved by less than
+    # `diversity_threshold`.
+    def __init__(self, window: int, threshold: float, diversity_threshold: float) -> None:
+        if window < 1:
+            raise ValueError("Plateau window must be at least 1")
+        self.window: int = window
+        self.threshold: float = threshold
+        self.diversity_threshold: float = diversity_threshold
+
+        self.survival_rates: deque[float] = deque(maxlen=2 * window)
+        self.diversities: deque[float] = deque(maxlen=2 * window)
+        self.improvement: float | None = None
+        self.diversity_change: float | None = None
+
+    def update(self, survival_rate: float, diversity: float) -> bool:
+        self.survival_rates.append(survival_rate)
+        self.diversities.append(diversity)
+        if len(self.survival_rates) < 2 * self.window:
+            return False
+
+        rates = list(self.survival_rates)
+        diversities = list(self.diversities)
+        self.improvement = (sum(rates[self.window:]) - sum(rates[:self.window])) / self.window
+        self.diversity_change = abs(sum(diversities[self.window:]) - sum(diversities[:self.window])) / self.window
+        return self.improvement < self.threshold and self.diversity_change < self.diversity_threshold
+
+    def describe(self) -> str:
+        return (
+            f"survival rate improved {self.improvement:.3f} pp and diversity moved {self.diversity_change:.4f} "
+            f"over the last {self.window} generations"
+        )
@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import numpy as np
+
+GENE_BITS: int = 32
+MINHASH_PERMUTATIONS: int = 32
+# 8 bands of 4 rows: genomes whose gene sets have a Jaccard similarity above ~0.6 share a bucket
+LSH_BANDS: int = 8
+
+# rows per chunk while hashing genes, bounds the (rows, W, permutations) scratch
+HASH_CHUNK_CELLS: int = 1 << 22
+
+MIX_1: np.uint64 = np.uint64(0xBF58476D1CE4E5B9)
+MIX_2: np.uint64 = np.uint64(0x94D049BB133111EB)
+GOLDEN: np.uint64 = np.uint64(0x9E3779B97F4A7C15)
+
+
+def mix64(x: np.ndarray) -> np.ndarray:
+    # splitmix64 finalizer, uint64 arithmetic wraps
+    x = x ^ (x >> np.uint64(30))
+    x = x * MIX_1
+    x = x ^ (x >> np.uint64(27))
+    x = x * MIX_2
+    return x ^ (x >> np.uint64(31))
+
+
+def fold_columns(columns: np.ndarray, seed: np.ndarray | np.uint64) -> np.ndarray:
+    # order-dependent hash of every row of a (N, k) uint64 matrix
+    h = mix64(np.broadcast_to(np.asarray(seed, dtype=np.uint64), columns.shape[:1]).copy())
+    offsets = np.arange(1, columns.shape[1] + 1, dtype=np.uint64) * GOLDEN
+    for j in range(columns.shape[1]):
+        h = mix64(h ^ (columns[:, j] + offsets[j]))
+    return h
+
+
+def get_sorted_genes(genomes: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    # (N, W) uint64 with every genome's genes in ascending order and padding (2^32) last; crossover
+    # shuffles gene order, so genomes are compared as gene multisets and loci are sorted slots
+    valid = np.arange(genomes.shape[1]) < lengths[:, None]
+    return np.sort(np.where(valid, genomes.astype(np.uint64), np.uint64(1 << GENE_BITS)), axis=1)
+
+
+def get_genome_hashes(genomes: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    # one uint64 per genome, equal for genomes with the same genes in any order
+    return fold_columns(get_sorted_genes(genomes, lengths), lengths.astype(np.uint64))
+
+
+def get_unique_genome_share(genomes: np.ndarray, lengths: np.ndarray) -> float:
+    # share of distinct genomes, 1.0 when every genome is unique
+    if not len(genomes):
+        return 0.0
+    return len(np.unique(get_genome_hashes(genomes, lengths))) / len(genomes)
+
+
+def get_bit_entropies(sorted_genes: np.ndarray) -> np.ndarray:
+    # (32,) binary entropy of every gene bit, averaged over the gene slots: 0 when every genome
+    # carries the same bit in a slot, 1 for an even split; slots past a genome's length are skipped
+    valid = sorted_genes < np.uint64(1 << GENE_BITS)
+    carriers = np.maximum(valid.sum(axis=0), 1)
+    slots = valid.any(axis=0)
+    if not slots.any():
+        return np.zeros(GENE_BITS)
+    entropies = np.empty(GENE_BITS)
+    for bit in range(GENE_BITS):
+        p = np.count_nonzero((sorted_genes & np.uint64(1 << bit)).astype(bool) & valid, axis=0)[slots] / carriers[slots]
+        q = np.clip(p, 1e-12, 1 - 1e-12)
+        entropy = -(q * np.log2(q) + (1 - q) * np.log2(1 - q))
+        entropies[bit] = np.where((p <= 0) | (p >= 1), 0.0, entropy).mean()
+    return entropies
+
+
+def get_minhash_signatures(genomes: np.ndarray, lengths: np.ndarray,
+                           permutations: int = MINHASH_PERMUTATIONS) -> np.ndarray:
+    # (N, permutations) minimum of every hash function over the gene set of each genome
+    n, width = genomes.shape
+    seeds = mix64(np.arange(1, permutations + 1, dtype=np.uint64) * GOLDEN)
+    signatures = np.empty((n, permutations), dtype=np.uint64)
+    chunk = max(1, HASH_CHUNK_CELLS // max(1, width * permutations))
+
+    for start in range(0, n, chunk):
+        rows = slice(start, start + chunk)
+        # genes are mixed once, every permutation is then a cheap xor-multiply-shift of that hash
+        hashes = mix64(genomes[rows].astype(np.uint64))[:, :, None] ^ seeds
+        hashes *= MIX_2
+        hashes ^= hashes >> np.uint64(29)
+        hashes[np.arange(width) >= lengths[rows, None]] = np.iinfo(np.uint64).max
+        signatures[rows] = hashes.min(axis=1)
+    return signatures
+
+
+def get_species(signatures: np.ndarray, bands: int = LSH_BANDS) -> np.ndarray:
+    # Species label per genome: genomes that share a bucket in any LSH band are linked, and species
+    # are the connected components. Labels are propagated through the buckets until stable, every
+    # round is linear in N.
+    n, permutations = signatures.shape
+    rows = permutations // bands
+    buckets = [
+        np.unique(fold_columns(signatures[:, b * rows:(b + 1) * rows], np.uint64(b)), return_inverse=True)[1]
+        for b in range(bands)
+    ]
+
+    labels = np.arange(n)
+    changed = True
+    while changed:
+        changed = False
+        for bucket in buckets:
+            smallest = np.full(n, n, dtype=np.int64)
+            np.minimum.at(smallest, bucket, labels)
+            linked = smallest[bucket]
+            linked = linked[linked]  # pointer jumping, halves the rounds on long chains
+            if (linked < labels).any():
+                labels = np.minimum(labels, linked)
+                changed = True
+    return labels
+
+
+def get_diversity_metrics(genomes: np.ndarray, lengths: np.ndarray) -> dict:
+    # O(N) per generation: hashing, 32 bit counts and a fixed number of MinHash/LSH passes
+    n = len(genomes)
+    if n == 0:
+        return {"unique_genomes": 0, "unique_genome_share": 0.0, "allele_entropy": 0.0,
+                "allele_entropy_bits": [0.0] * GENE_BITS, "species": 0, "largest_species_share": 0.0}
+
+    sorted_genes = get_sorted_genes(genomes, lengths)
+    unique_genomes = len(np.unique(fold_columns(sorted_genes, lengths.astype(np.uint64))))
+    entropies = get_bit_entropies(sorted_genes)
+    species_sizes = np.bincount(get_species(get_minhash_signatures(genomes, lengths)))
+    species_sizes = species_sizes[species_sizes > 0]
+
+    return {
+        "unique_genomes": unique_genomes,
+        "unique_genome_share": unique_genomes / n,
+        "allele_entropy": float(entropies.mean()),
+        "allele_entropy_bits": [round(float(e), 4) for e in entropies],
+        "species": len(species_sizes),
+        "largest_species_share": float(species_sizes.max() / n),
+    }
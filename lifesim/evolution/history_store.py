@@ -0,0 +1,350 @@
+from __future__ import annotations
+
+import json
+import os
+from collections.abc import Iterator
+from typing import BinaryIO
+
+import numpy as np
+
+HISTORY_DIRECTORY: str = "history"
+HISTORY_VERSION: int = 1
+
+# one int64 record per generation in index.bin
+INDEX_FIELDS: tuple[str, ...] = (
+    "generation", "population", "row_offset", "kind", "data_offset", "literal_offset", "literal_count"
+)
+KIND_FULL: int = 0
+KIND_DELTA: int = 1
+
+# append-only data files and their element types
+FILES: dict[str, type] = {
+    "index": np.int64,
+    "genomes": np.uint32,
+    "codes": np.uint8,  # replaced by uint16 for genomes wider than 127 genes
+    "literals": np.uint32,
+    "lengths": np.uint16,
+    "parents": np.int32,
+}
+
+# rows per chunk while matching child genes against parent genes, bounds the (rows, W, 2W) scratch
+MATCH_CHUNK_CELLS: int = 1 << 22
+
+
+def get_codes_dtype(width: int) -> type:
+    return np.uint8 if 2 * width < np.iinfo(np.uint8).max else np.uint16
+
+
+def get_parent_genes(previous: np.ndarray, parents: np.ndarray) -> np.ndarray:
+    # (N, 2W) genes of both parents of every row, zeros for fresh minds
+    safe = np.maximum(parents, 0)
+    candidates = np.concatenate((previous[safe[:, 0]], previous[safe[:, 1]]), axis=1)
+    candidates[parents[:, 0] < 0] = 0
+    return candidates
+
+
+def encode_delta(genomes: np.ndarray, lengths: np.ndarray, parents: np.ndarray, previous: np.ndarray,
+                 codes_dtype: type) -> tuple[np.ndarray, np.ndarray]:
+    # Every gene of a child was sampled from one of its parents, so it is stored as the position of
+    # an equal gene among the 2W genes of its parents. Mutated genes and fresh minds have no match
+    # and are escaped to a literal. Cells past a genome's length decode to 0 whatever their code.
+    n, width = genomes.shape
+    escape = np.iinfo(codes_dtype).max
+    codes: np.ndarray = np.zeros((n, width), dtype=codes_dtype)
+    valid = np.arange(width) < lengths[:, None]
+    chunk = max(1, MATCH_CHUNK_CELLS // (2 * width * width))
+
+    for start in range(0, n, chunk):
+        rows = slice(start, start + chunk)
+        candidates = get_parent_genes(previous, parents[rows])
+        matches = genomes[rows, :, None] == candidates[:, None, :]
+        found = matches.any(axis=2) & (parents[rows, :1] >= 0)
+        codes[rows] = np.where(found, matches.argmax(axis=2), escape)
+
+    codes[~valid] = 0
+    literals = genomes[(codes == escape) & valid]
+    return codes, literals
+
+
+def decode_delta(codes: np.ndarray, literals: np.ndarray, lengths: np.ndarray, parents: np.ndarray,
+                 previous: np.ndarray) -> np.ndarray:
+    escape = np.iinfo(codes.dtype).max
+    width = codes.shape[1]
+    candidates = get_parent_genes(previous, parents)
+    escaped = codes == escape
+    genomes = np.take_along_axis(candidates, np.where(escaped, 0, codes).astype(np.int64), axis=1)
+    genomes[escaped] = literals
+    genomes[np.arange(width) >= lengths[:, None]] = 0
+    return genomes
+
+
+class HistoryStore:
+    # Append-only evolution history of one simulation in <directory>. Per generation it keeps the
+    # (N, W) uint32 genome matrix with the genome lengths, and for every row the indices of its two
+    # parents in the previous generation (-1 for fresh minds).
+    #
+    # With `delta` the genome matrix is stored as parent-relative codes (see encode_delta), one
+    # byte per gene instead of four, with a full keyframe every `keyframe_interval` generations so
+    # a random read decodes at most that many generations. Readers memory-map the files; full
+    # generations, lengths and parents come back as read-only views of the maps, delta generations
+    # are decoded into a new array. A store left by a crash is truncated to its last complete
+    # generation when reopened.
+    def __init__(self, directory: str, width: int = 0, delta: bool = True, keyframe_interval: int = 64) -> None:
+        self.directory: str = directory
+        meta_path = os.path.join(directory, "meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            width, delta, keyframe_interval = meta["width"], meta["delta"], meta["keyframe_interval"]
+        elif width < 1:
+            raise ValueError(f"No history store in '{directory}' and no genome width to create one")
+        if keyframe_interval < 1:
+            raise ValueError("Keyframe interval must be at least 1")
+
+        self.width: int = width
+        self.delta: bool = delta
+        self.keyframe_interval: int = keyframe_interval
+        self.dtypes: dict[str, type] = {**FILES, "codes": get_codes_dtype(width)}
+        self.meta_path: str = meta_path
+
+        self.files: dict[str, BinaryIO] = {}
+        self.ends: dict[str, int] = {}  # elements written to every file, while appending
+        self.maps: dict[str, np.ndarray] = {}
+        self.decoded: tuple[int, np.ndarray] | None = None  # last decoded (record, genomes), for scans
+        self.previous: np.ndarray | None = None  # genomes of the last appended generation
+
+    # ======= WRITING =======
+
+    def get_path(self, name: str) -> str:
+        return os.path.join(self.directory, f"{name}.bin")
+
+    def open_for_append(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        if not os.path.exists(self.meta_path):
+            temp_path = f"{self.meta_path}.{os.getpid()}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump({"version": HISTORY_VERSION, "width": self.width, "delta": self.delta,
+                           "keyframe_interval": self.keyframe_interval,
+                           "dtypes": {k: np.dtype(v).name for k, v in self.dtypes.items()}}, f, indent=4)
+            os.replace(temp_path, self.meta_path)
+
+        # the index is written last, data past its final record belongs to an interrupted append
+        self.ends = self.get_data_ends(len(self))
+        for name in FILES:
+            path = self.get_path(name)
+            size = self.ends[name] * np.dtype(self.dtypes[name]).itemsize
+            if os.path.exists(path) and os.path.getsize(path) > size:
+                os.truncate(path, size)
+            self.files[name] = open(path, "ab")
+        if len(self):
+            self.previous = np.array(self.get_genomes_at(len(self) - 1))
+
+    def get_data_ends(self, count: int) -> dict[str, int]:
+        # elements of every file used by the first `count` records
+        ends = dict.fromkeys(FILES, 0)
+        ends["index"] = count * len(INDEX_FIELDS)
+        if count == 0:
+            return ends
+        index = self.index[:count]
+        _, population, row_offset, _, _, literal_offset, literal_count = index[-1]
+        ends["lengths"] = int(row_offset + population)
+        ends["parents"] = 2 * ends["lengths"]
+        ends["literals"] = int(literal_offset + literal_count)
+        for name, kind in (("genomes", KIND_FULL), ("codes", KIND_DELTA)):
+            records = index[index[:, 3] == kind]
+            if len(records):
+                ends[name] = int(records[-1, 4] + records[-1, 1] * self.width)
+        return ends
+
+    def append(self, generation: int, genomes: np.ndarray, lengths: np.ndarray, parents: np.ndarray) -> None:
+        # genomes (N, W) uint32, lengths (N,), parents (N, 2) row indices into the previous append
+        if not self.files:
+            self.open_for_append()
+        n = len(genomes)
+        if genomes.shape != (n, self.width) or lengths.shape != (n,) or parents.shape != (n, 2):
+            raise ValueError(f"Expected ({n}, {self.width}) genomes, ({n},) lengths and ({n}, 2) parents")
+
+        genomes = np.array(genomes, dtype=np.uint32)  # kept as the next delta base, callers may reuse theirs
+        lengths = np.ascontiguousarray(lengths, dtype=np.uint16)
+        parents = np.ascontiguousarray(parents, dtype=np.int32)
+        count = self.ends["index"] // len(INDEX_FIELDS)
+        ends = self.ends
+
+        kind = KIND_FULL
+        payload: np.ndarray = genomes
+        literals = np.zeros(0, dtype=np.uint32)
+        previous = self.previous
+        if (self.delta and count % self.keyframe_interval and previous is not None
+                and parents.max(initial=-1) < len(previous)):
+            codes, literals = encode_delta(genomes, lengths, parents, previous, self.dtypes["codes"])
+            if codes.nbytes + literals.nbytes < genomes.nbytes:
+                kind, payload = KIND_DELTA, codes
+            else:
+                literals = np.zeros(0, dtype=np.uint32)
+
+        record = np.array([
+            generation, n, ends["lengths"], kind, ends["codes" if kind == KIND_DELTA else "genomes"],
+            ends["literals"], len(literals),
+        ], dtype=np.int64)
+
+        for name, data in (("codes" if kind == KIND_DELTA else "genomes", payload), ("literals", literals),
+                           ("lengths", lengths), ("parents", parents), ("index", record)):
+            # flushed in order, the index record only becomes visible after the data it points to
+            self.files[name].write(data.tobytes())
+            self.files[name].flush()
+            ends[name] += data.size
+        self.previous = genomes
+
+    def close(self) -> None:
+        for f in self.files.values():
+            f.close()
+        self.files = {}
+        self.previous = None
+
+    # ======= READING =======
+
+    def get_map(self, name: str) -> np.ndarray:
+        # remapped whenever the file has grown, views handed out earlier stay valid
+        path = self.get_path(name)
+        dtype = np.dtype(self.dtypes[name])
+        size = os.path.getsize(path) // dtype.itemsize if os.path.exists(path) else 0
+        cached = self.maps.get(name)
+        if cached is None or len(cached) != size:
+            cached = np.memmap(path, dtype=dtype, mode="r", shape=(size,)) if size else np.zeros(0, dtype=dtype)
+            self.maps[name] = cached
+        return cached
+
+    @property
+    def index(self) -> np.ndarray:
+        records = self.get_map("index")
+        return records[:len(records) - len(records) % len(INDEX_FIELDS)].reshape(-1, len(INDEX_FIELDS))
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    @property
+    def generations(self) -> np.ndarray:
+        return self.index[:, 0]
+
+    def get_record(self, generation: int) -> int:
+        # position of `generation` in the store
+        generations = self.generations
+        i = int(np.searchsorted(generations, generation))
+        if i == len(generations) or generations[i] != generation:
+            raise KeyError(f"Generation {generation} is not in the history store")
+        return i
+
+    def get_lengths_at(self, record: int) -> np.ndarray:
+        _, population, row_offset = self.index[record, :3]
+        return self.get_map("lengths")[row_offset:row_offset + population]
+
+    def get_parents_at(self, record: int) -> np.ndarray:
+        _, population, row_offset = self.index[record, :3]
+        return self.get_map("parents")[2 * row_offset:2 * (row_offset + population)].reshape(-1, 2)
+
+    def get_genomes_at(self, record: int) -> np.ndarray:
+        _, population, _, kind, data_offset = self.index[record, :5]
+        if kind == KIND_FULL:
+            return self.get_map("genomes")[data_offset:data_offset + population * self.width].reshape(-1, self.width)
+
+        if self.decoded is not None and self.decoded[0] == record:
+            return self.decoded[1]
+
+        # decode forward from the closest keyframe, or from the last decoded generation if nearer
+        # every keyframe_interval-th record is full, so the search never looks further back than that
+        kinds = self.index[max(0, record - self.keyframe_interval):record, 3]
+        first = record - int(np.argmax(kinds[::-1] == KIND_FULL))
+        if self.decoded is not None and first <= self.decoded[0] < record:
+            first, genomes = self.decoded[0] + 1, self.decoded[1]
+        else:
+            genomes = self.get_genomes_at(first - 1)
+
+        for r in range(first, record + 1):
+            _, population, _, _, data_offset, literal_offset, literal_count = self.index[r]
+            codes = self.get_map("codes")[data_offset:data_offset + population * self.width].reshape(-1, self.width)
+            literals = self.get_map("literals")[literal_offset:literal_offset + literal_count]
+            genomes = decode_delta(codes, literals, self.get_lengths_at(r), self.get_parents_at(r), genomes)
+            genomes.flags.writeable = False
+            self.decoded = (r, genomes)
+        return genomes
+
+    def get_genomes(self, generation: int) -> np.ndarray:
+        return self.get_genomes_at(self.get_record(generation))
+
+    def get_lengths(self, generation: int) -> np.ndarray:
+        return self.get_lengths_at(self.get_record(generation))
+
+    def get_parents(self, generation: int) -> np.ndarray:
+        return self.get_parents_at(self.get_record(generation))
+
+    def iter_genomes(self, start: int | None = None, stop: int | None = None) -> Iterator[tuple[int, np.ndarray, np.ndarray]]:
+        # (generation, genomes, lengths) in order; sequential, so every delta generation decodes once
+        generations = self.generations
+        first = 0 if start is None else int(np.searchsorted(generations, start))
+        last = len(generations) if stop is None else int(np.searchsorted(generations, stop))
+        for record in range(first, last):
+            yield int(generations[record]), self.get_genomes_at(record), self.get_lengths_at(record)
+
+    # ======= QUERIES =======
+
+    def get_lineage(self, generation: int, index: int) -> np.ndarray:
+        # (generation, row) of the entity and its first parent, grandparent and so on, back to a
+        # fresh mind or the first recorded generation
+        lineage = [(generation, index)]
+        record = self.get_record(generation)
+        while record > 0:
+            parent = int(self.get_parents_at(record)[index, 0])
+            if parent < 0:
+                break
+            record -= 1
+            index = parent
+            lineage.append((int(self.generations[record]), index))
+        return np.array(lineage, dtype=np.int64)
+
+    def iter_ancestors(self, generation: int, indices: np.ndarray | list[int],
+                       depth: int | None = None) -> Iterator[tuple[int, np.ndarray]]:
+        # (generation, rows) of every ancestor through both parents, one generation further back
+        # per item; the set is bounded by the population, so tracing is O(depth * N) at worst
+        record = self.get_record(generation)
+        rows = np.unique(np.asarray(indices, dtype=np.int64))
+        steps = 0
+        while record > 0 and len(rows) and (depth is None or steps < depth):
+            parents = self.get_parents_at(record)[rows].ravel()
+            rows = np.unique(parents[parents >= 0]).astype(np.int64)
+            record -= 1
+            steps += 1
+            yield int(self.generations[record]), rows
+
+    def get_allele_counts(self, generation: int) -> tuple[np.ndarray, np.ndarray]:
+        # (alleles, number of genomes carrying each) of one generation, most common first
+        genomes, lengths = self.get_genomes(generation), self.get_lengths(generation)
+        alleles, counts = self.count_carriers(genomes, lengths)
+        order = np.argsort(-counts, kind="stable")
+        return alleles[order], counts[order]
+
+    @staticmethod
+    def count_carriers(genomes: np.ndarray, lengths: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        # an allele repeated within one genome counts once for it
+        valid = np.arange(genomes.shape[1]) < lengths[:, None]
+        rows = np.broadcast_to(np.arange(len(genomes))[:, None], genomes.shape)[valid]
+        pairs = np.unique((rows.astype(np.uint64) << np.uint64(32)) | genomes[valid].astype(np.uint64))
+        return np.unique((pairs & np.uint64(0xFFFF_FFFF)).astype(np.uint32), return_counts=True)
+
+    def get_allele_frequencies(self, alleles: np.ndarray | list[int], start: int | None = None,
+                               stop: int | None = None) -> tuple[np.ndarray, np.ndarray]:
+        # (generations, (T, A) share of genomes carrying each allele) over [start, stop)
+        alleles = np.asarray(alleles, dtype=np.uint32)
+        generations: list[int] = []
+        rows: list[np.ndarray] = []
+        for generation, genomes, lengths in self.iter_genomes(start, stop):
+            carried, counts = self.count_carriers(genomes, lengths)
+            found = np.searchsorted(carried, alleles)
+            found = np.minimum(found, max(len(carried) - 1, 0))
+            hits = (carried[found] == alleles) if len(carried) else np.zeros(len(alleles), dtype=bool)
+            frequencies = np.where(hits, counts[found] if len(counts) else 0, 0) / max(len(genomes), 1)
+            generations.append(generation)
+            rows.append(frequencies)
+        return np.array(generations, dtype=np.int64), np.array(rows).reshape(len(rows), len(alleles))
+
+    def get_storage_bytes(self) -> int:
+        return sum(os.path.getsize(self.get_path(name)) for name in FILES if os.path.exists(self.get_path(name)))
@@ -0,0 +1,60 @@
+import numpy as np
+
+from lifesim.utils.direction import Direction
+
+# index -1 in a direction field means "already safe" and picks the trailing zero
+DIRECTIONS: list[Direction] = list(Direction)
+DIRECTION_DX: np.ndarray = np.array([d.value[0] for d in DIRECTIONS] + [0], dtype=np.float64)
+DIRECTION_DY: np.ndarray = np.array([d.value[1] for d in DIRECTIONS] + [0], dtype=np.float64)
+
+UNREACHABLE: int = np.iinfo(np.uint16).max
+
+
+def _propagate_row(row: np.ndarray, previous: np.ndarray | None, reverse: bool) -> np.ndarray:
+    if previous is not None:
+        neighbors = previous.copy()
+        neighbors[1:] = np.minimum(neighbors[1:], previous[:-1])
+        neighbors[:-1] = np.minimum(neighbors[:-1], previous[1:])
+        row = np.minimum(row, neighbors + 1)
+
+    # d[x] = min_k(d[x - k] + k) along the row, as one running minimum
+    steps = np.arange(len(row), dtype=np.int64)
+    if reverse:
+        return (np.minimum.accumulate((row + steps)[::-1]) - steps[::-1])[::-1]
+    return np.minimum.accumulate(row - steps) + steps
+
+
+def compute_distance_field(mask: np.ndarray) -> np.ndarray:
+    # Chessboard distance (8-connected moves) to the nearest True cell. Two-pass chamfer with unit
+    # weights, vectorized along rows, so the cost is O(h) NumPy row operations.
+    h, w = mask.shape
+    if not mask.any():
+        return np.full((h, w), UNREACHABLE, dtype=np.uint16)
+
+    distance = np.where(mask, 0, h + w).astype(np.int64)
+
+    for y in range(h):
+        distance[y] = _propagate_row(distance[y], distance[y - 1] if y > 0 else None, reverse=False)
+    for y in range(h - 1, -1, -1):
+        distance[y] = _propagate_row(distance[y], distance[y + 1] if y < h - 1 else None, reverse=True)
+
+    return distance.astype(np.uint16)
+
+
+def compute_direction_field(distance: np.ndarray) -> np.ndarray:
+    # index into DIRECTIONS of the neighbour closest to the safe zone, -1 on safe or unreachable cells
+    h, w = distance.shape
+    padded = np.full((h + 2, w + 2), UNREACHABLE, dtype=np.uint16)
+    padded[1:-1, 1:-1] = distance
+
+    best_distance = np.full((h, w), UNREACHABLE, dtype=np.uint16)
+    best = np.full((h, w), -1, dtype=np.int8)
+    for i, direction in enumerate(DIRECTIONS):
+        dx, dy = direction.value
+        neighbor = padded[1 + dy:1 + dy + h, 1 + dx:1 + dx + w]
+        closer = neighbor < best_distance
+        best_distance[closer] = neighbor[closer]
+        best[closer] = i
+
+    best[(distance == 0) | (distance == UNREACHABLE)] = -1
+    return best
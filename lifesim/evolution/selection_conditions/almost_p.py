@@ -1,7 +1,18 @@
+import numpy as np
+
+
 def condition(x, y, w, h):  
     upper_left_square = (x < w // 3) and (y < h // 3)
     left_edge = x < w // 12
     
     # the "almost p" shape is intentionally asymmetrical — useful for debugging grid rendering 
     # if x and y are swapped or the grid is flipped/transposed, the difference will be visible
-    return upper_left_square or left_edge
\ No newline at end of file
+    return upper_left_square or left_edge
+
+
+def condition_mask(w, h) -> np.ndarray:
+    x = np.arange(w)[None, :]
+    y = np.arange(h)[:, None]
+    upper_left_square = (x < w // 3) & (y < h // 3)
+    left_edge = x < w // 12
+    return upper_left_square | left_edge
@@ -1,2 +1,11 @@
+import numpy as np
+
+
 def condition(x, y, w, h) -> bool:
-    return(x > w - w // 4) and (y > h - h // 4)
\ No newline at end of file
+    return(x > w - w // 4) and (y > h - h // 4)
+
+
+def condition_mask(w, h) -> np.ndarray:
+    x = np.arange(w)[None, :]
+    y = np.arange(h)[:, None]
+    return (x > w - w // 4) & (y > h - h // 4)
@@ -1,2 +1,11 @@
+import numpy as np
+
+
 def condition(x, y, w, h):
-    return (w // 3 <= x < 2 * w // 3) and (h // 3 <= y < 2 * h // 3)
\ No newline at end of file
+    return (w // 3 <= x < 2 * w // 3) and (h // 3 <= y < 2 * h // 3)
+
+
+def condition_mask(w, h) -> np.ndarray:
+    x = np.arange(w)[None, :]
+    y = np.arange(h)[:, None]
+    return (w // 3 <= x) & (x < 2 * w // 3) & (h // 3 <= y) & (y < 2 * h // 3)
@@ -1,3 +1,13 @@
+import numpy as np
+
+
 def condition(x, y, w, h) -> bool:
     return ((x < w // 5 and y < h // 5) or (x > w - w // 5 and y < h // 5) or 
-            (x < w // 5 and y > h - h // 5) or (x > w - w // 5 and y > h - h // 5))
\ No newline at end of file
+            (x < w // 5 and y > h - h // 5) or (x > w - w // 5 and y > h - h // 5))
+
+
+def condition_mask(w, h) -> np.ndarray:
+    x = np.arange(w)[None, :]
+    y = np.arange(h)[:, None]
+    return (((x < w // 5) & (y < h // 5)) | ((x > w - w // 5) & (y < h // 5)) |
+            ((x < w // 5) & (y > h - h // 5)) | ((x > w - w // 5) & (y > h - h // 5)))
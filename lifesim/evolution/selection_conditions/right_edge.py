@@ -1,2 +1,10 @@
+import numpy as np
+
+
 def condition(x, y, w, h) -> bool:
-    return x > w - w // 12
\ No newline at end of file
+    return x > w - w // 12
+
+
+def condition_mask(w, h) -> np.ndarray:
+    x = np.arange(w)[None, :]
+    return np.broadcast_to(x > w - w // 12, (h, w)).copy()
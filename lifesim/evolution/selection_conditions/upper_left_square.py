@@ -1,2 +1,11 @@
+import numpy as np
+
+
 def condition(x, y, w, h):
-    return (x < w // 3) and (y < h // 3)
\ No newline at end of file
+    return (x < w // 3) and (y < h // 3)
+
+
+def condition_mask(w, h) -> np.ndarray:
+    x = np.arange(w)[None, :]
+    y = np.arange(h)[:, None]
+    return (x < w // 3) & (y < h // 3)
@@ -0,0 +1,67 @@
+import hashlib
+import os
+import threading
+from types import ModuleType
+
+import numpy as np
+
+
+def get_condition_source_hash(module: ModuleType) -> str:
+    assert module.__file__ is not None  # for mypy
+    with open(module.__file__, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()[:16]
+
+
+def build_condition_mask(module: ModuleType, w: int, h: int) -> np.ndarray:
+    # array-native conditions export condition_mask(w, h), legacy ones only condition(x, y, w, h)
+    condition_mask = getattr(module, "condition_mask", None)
+    if callable(condition_mask):
+        mask = np.asarray(condition_mask(w, h), dtype=bool)
+        if mask.shape != (h, w):
+            raise RuntimeError(
+                f"condition_mask of '{module.__name__}' returned shape {mask.shape}, expected {(h, w)}"
+            )
+        return mask
+
+    cond = module.condition
+    return np.fromfunction(
+        np.vectorize(lambda y, x: bool(cond(int(x), int(y), w, h))),
+        (h, w),
+        dtype=int
+    )
+
+
+class MaskCache:
+    def __init__(self, directory: str | None) -> None:
+        # an empty path disables the cache too, TOML configs have no null
+        self.directory: str | None = directory or None
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def get_path(self, name: str, module: ModuleType, w: int, h: int) -> str:
+        assert self.directory is not None  # for mypy
+        return os.path.join(self.directory, f"{name}-{get_condition_source_hash(module)}-{w}x{h}.npy")
+
+    def load(self, name: str, module: ModuleType, w: int, h: int) -> np.ndarray:
+        if self.directory is None:
+            self.misses += 1
+            return build_condition_mask(module, w, h)
+
+        path = self.get_path(name, module, w, h)
+        if os.path.exists(path):
+            try:
+                mask = np.load(path)
+                self.hits += 1
+                return mask
+            except (OSError, ValueError):
+                pass  # unreadable entry, rebuilt below
+
+        self.misses += 1
+        mask = build_condition_mask(module, w, h)
+
+        os.makedirs(self.directory, exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as f:
+            np.save(f, mask)
+        os.replace(temp_path, path)
+        return mask
@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+from lifesim.evolution.selection_conditions.enum import SelectionCondition
+
+
+class SelectionSchedule:
+    # Two modes, both given as plain dicts in the simulation config:
+    #   {"mode": "switch", "phases": [{"generation": 1, "condition": "bottom_right_square"},
+    #                                 {"generation": 500, "condition": "corners"}]}
+    #   {"mode": "cycle", "conditions": ["corners", "center_zone"], "every": 100}
+    # Every distinct condition becomes one slice of the simulation's mask stack; slice_for_generation
+    # returns the index of the active slice.
+    def __init__(self, mode: str, phases: list[tuple[int, SelectionCondition]], every: int = 1) -> None:
+        if mode not in ("switch", "cycle"):
+            raise ValueError(f"Unknown selection schedule mode '{mode}'")
+        if not phases:
+            raise ValueError("Selection schedule needs at least one condition")
+        if mode == "cycle" and every < 1:
+            raise ValueError("Selection schedule 'every' must be at least 1")
+
+        self.mode: str = mode
+        self.phases: list[tuple[int, SelectionCondition]] = sorted(phases, key=lambda p: p[0]) if mode == "switch" else phases
+        self.every: int = every
+
+        self.conditions: list[SelectionCondition] = []
+        self.phase_slices: list[int] = []
+        for _, condition in self.phases:
+            if condition not in self.conditions:
+                self.conditions.append(condition)
+            self.phase_slices.append(self.conditions.index(condition))
+
+    @staticmethod
+    def from_dict(data: dict) -> SelectionSchedule:
+        mode = data.get("mode", "switch")
+        if mode == "cycle":
+            phases = [(0, SelectionCondition(c)) for c in data["conditions"]]
+            return SelectionSchedule(mode, phases, int(data.get("every", 1)))
+        phases = [(int(p["generation"]), SelectionCondition(p["condition"])) for p in data["phases"]]
+        return SelectionSchedule(mode, phases)
+
+    def to_dict(self) -> dict:
+        if self.mode == "cycle":
+            return {"mode": self.mode, "conditions": [c.value for _, c in self.phases], "every": self.every}
+        return {"mode": self.mode, "phases": [{"generation": g, "condition": c.value} for g, c in self.phases]}
+
+    def slice_for_generation(self, generation: int) -> int:
+        if self.mode == "cycle":
+            return self.phase_slices[((generation - 1) // self.every) % len(self.phases)]
+
+        active = 0
+        for i, (start, _) in enumerate(self.phases):
+            if generation >= start:
+                active = i
+        return self.phase_slices[active]
@@ -0,0 +1,238 @@
+from __future__ import annotations
+
+import collections
+import enum
+import gc
+import json
+import os
+import resource
+import sys
+import tempfile
+import threading
+import tracemalloc
+import types
+
+MEMORY_REPORT_FILE: str = "memory_report.jsonl"
+MEMORY_SUMMARY_FILE: str = "memory_summary.json"
+
+# lifesim classes counted on every sample, by class name
+LIVE_OBJECT_TYPES: tuple[str, ...] = ("Entity", "Brain", "Genome", "Neuron", "Cell")
+
+# allocations made by the monitor itself or the import system are not attributed to the simulation
+IGNORED_SITES: tuple[tracemalloc.Filter, ...] = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+def get_resident_memory() -> tuple[int, int]:
+    # (current, peak) bytes; current falls back to the peak where /proc is not available
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak *= 1 if sys.platform == "darwin" else 1024
+    try:
+        with open("/proc/self/statm", encoding="ascii") as f:
+            current = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        current = peak
+    return current, peak
+
+
+def count_live_objects() -> dict[str, int]:
+    # walks every gc-tracked object, fine every N generations but not every step; brains are
+    # reference cycles (entity <-> brain <-> neurons), so uncollected dead ones are cleared first
+    gc.collect()
+    counts: collections.Counter[str] = collections.Counter()
+    for obj in gc.get_objects():
+        cls = type(obj)
+        if cls.__name__ in LIVE_OBJECT_TYPES and cls.__module__.startswith("lifesim."):
+            counts[cls.__name__] += 1
+    return {name: counts[name] for name in LIVE_OBJECT_TYPES}
+
+
+# referents the per-entity walk never follows, they are shared by the whole simulation
+SHARED_TYPES: tuple[type, ...] = (
+    type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType, enum.Enum
+)
+
+
+def get_owned_sizes(roots: list, stop: set[int]) -> collections.Counter[str]:
+    # bytes by type name of every object reachable from the roots, each object counted once, not
+    # following shared types or the objects in `stop` (ids)
+    sizes: collections.Counter[str] = collections.Counter()
+    seen: set[int] = set(stop)
+    pending = list(roots)
+    while pending:
+        obj = pending.pop()
+        if id(obj) in seen or isinstance(obj, SHARED_TYPES):
+            continue
+        seen.add(id(obj))
+        sizes[type(obj).__name__] += sys.getsizeof(obj)
+        pending.extend(gc.get_referents(obj))
+    return sizes
+
+
+def get_entity_memory_report(settings: dict, sample_size: int = 1000) -> dict:
+    # Bytes per entity of the object model under a config: `sample_size` entities with brains built
+    # for their first generation, measured by walking what they own (shared neuron definitions,
+    # functions and enums are not counted) and by the traced allocations of building them. The
+    # projection scales both to max_entity_count plus the grid cells.
+    from lifesim.core.simulation import Simulation
+
+    with tempfile.TemporaryDirectory() as directory:
+        config = {**settings, "max_entity_count": sample_size, "simulation_directory": directory,
+                  "mask_cache_directory": None, "history_store": False, "memory_monitor_interval": 0}
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        try:
+            gc.collect()
+            before, _ = tracemalloc.get_traced_memory()
+            simulation = Simulation(config)
+            after_grid, _ = tracemalloc.get_traced_memory()
+            simulation.populate()
+            for entity in simulation.entities:
+                entity.brain.init()
+            gc.collect()
+            after_entities, _ = tracemalloc.get_traced_memory()
+        finally:
+            if started_tracing:
+                tracemalloc.stop()
+
+    entities = simulation.entities
+    n = max(1, len(entities))
+    stop = {id(simulation), id(simulation.grid), id(simulation.settings), id(simulation.phase_timer)}
+    sizes = get_owned_sizes(list(entities), stop)
+    cells = simulation.settings.grid_width * simulation.settings.grid_height
+    bytes_per_entity = sum(sizes.values()) / n
+    traced_bytes_per_entity = (after_entities - after_grid) / n
+    grid_bytes = after_grid - before
+    entity_count = settings.get("max_entity_count", simulation.settings.max_entity_count)
+
+    return {
+        "sample_size": len(entities),
+        "bytes_per_entity": round(bytes_per_entity, 1),
+        "traced_bytes_per_entity": round(traced_bytes_per_entity, 1),
+        "bytes_per_entity_by_type": {
+            name: round(size / n, 1) for name, size in sorted(sizes.items(), key=lambda item: -item[1])
+        },
+        "grid_cells": cells,
+        "grid_bytes": grid_bytes,
+        "projected_entities": entity_count,
+        "projected_bytes": round(entity_count * max(bytes_per_entity, traced_bytes_per_entity) + grid_bytes),
+    }
+
+
+def count_threads(prefix: str) -> int:
+    return sum(1 for thread in threading.enumerate() if thread.name.startswith(prefix))
+
+
+class MemoryMonitor:
+    # Opt-in leak hunting. Every `interval` generations records RSS, traced Python heap, live counts
+    # of the lifesim object model and pending video encoder threads, and the `top_sites` source
+    # lines whose allocations grew the most since the previous sample. Samples are appended to
+    # memory_report.jsonl, stop() writes memory_summary.json with the growth per generation.
+    # tracemalloc slows allocation-heavy code down noticeably, keep this off for timing runs.
+    def __init__(self, directory: str, interval: int, top_sites: int = 10, encoder_thread_prefix: str = "") -> None:
+        if interval < 1:
+            raise ValueError("Memory monitor interval must be at least 1")
+        self.directory: str = directory
+        self.interval: int = interval
+        self.top_sites: int = top_sites
+        self.encoder_thread_prefix: str = encoder_thread_prefix
+
+        self.started_tracing: bool = False
+        self.snapshot: tracemalloc.Snapshot | None = None
+        self.first: dict | None = None
+        self.last: dict | None = None
+        self.peak_encoder_threads: int = 0
+
+    @property
+    def report_path(self) -> str:
+        return os.path.join(self.directory, MEMORY_REPORT_FILE)
+
+    def start(self) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracing = True
+        self.snapshot = tracemalloc.take_snapshot().filter_traces(IGNORED_SITES)
+
+    def update(self, generation: int) -> dict | None:
+        if generation % self.interval:
+            return None
+        return self.sample(generation)
+
+    def sample(self, generation: int) -> dict:
+        if self.snapshot is None or not tracemalloc.is_tracing():
+            # another monitor of this process may have stopped tracing
+            self.start()
+        assert self.snapshot is not None  # for mypy
+
+        snapshot = tracemalloc.take_snapshot().filter_traces(IGNORED_SITES)
+        growth = [
+            {"site": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+             "size_diff": stat.size_diff, "count_diff": stat.count_diff, "size": stat.size}
+            for stat in snapshot.compare_to(self.snapshot, "lineno")[:self.top_sites]
+            if stat.size_diff > 0
+        ]
+        self.snapshot = snapshot
+
+        rss, peak_rss = get_resident_memory()
+        traced, traced_peak = tracemalloc.get_traced_memory()
+        encoder_threads = count_threads(self.encoder_thread_prefix) if self.encoder_thread_prefix else 0
+        self.peak_encoder_threads = max(self.peak_encoder_threads, encoder_threads)
+
+        record = {
+            "generation": generation,
+            "rss_bytes": rss,
+            "peak_rss_bytes": peak_rss,
+            "traced_bytes": traced,
+            "traced_peak_bytes": traced_peak,
+            "live_objects": count_live_objects(),
+            "encoder_threads": encoder_threads,
+            "threads": threading.active_count(),
+            "top_growth": growth,
+        }
+        if self.first is None:
+            self.first = record
+        self.last = record
+
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.report_path, "a", encoding="utf-8") as f:
+            json.dump(record, f)
+            f.write("\n")
+
+        print(f"[LOG] Memory at generation {generation}: RSS {rss / 2**20:.1f} MiB, traced {traced / 2**20:.1f} MiB, "
+              f"{encoder_threads} encoder threads", flush=True)
+        return record
+
+    def summary(self) -> dict:
+        first, last = self.first, self.last
+        if first is None or last is None:
+            return {}
+        generations = last["generation"] - first["generation"]
+        return {
+            "first_generation": first["generation"],
+            "last_generation": last["generation"],
+            "rss_bytes": last["rss_bytes"],
+            "peak_rss_bytes": last["peak_rss_bytes"],
+            "rss_growth_bytes_per_generation": (last["rss_bytes"] - first["rss_bytes"]) / generations if generations else 0.0,
+            "traced_growth_bytes_per_generation":
+                (last["traced_bytes"] - first["traced_bytes"]) / generations if generations else 0.0,
+            "live_objects": last["live_objects"],
+            "peak_encoder_threads": self.peak_encoder_threads,
+        }
+
+    def stop(self) -> None:
+        summary = self.summary()
+        if summary:
+            path = os.path.join(self.directory, MEMORY_SUMMARY_FILE)
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(summary, f, indent=4)
+            os.replace(temp_path, path)
+        if self.started_tracing:
+            tracemalloc.stop()
+            self.started_tracing = False
+        self.snapshot = None
@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+PHASES: tuple[str, ...] = (
+    "brain_init", "sensing", "brain_eval", "actions", "rendering", "selection", "reproduction", "placement", "io"
+)
+
+# histogram bucket i counts generations whose phase took [2^(i-1), 2^i) microseconds, bucket 0 is
+# below 1 µs and the last bucket is open ended (2^26 µs is about 67 s)
+HISTOGRAM_BUCKETS: int = 28
+
+
+def get_histogram_bucket(ns: int) -> int:
+    return min((ns // 1000).bit_length(), HISTOGRAM_BUCKETS - 1)
+
+
+class PhaseTimer:
+    # Wall time per simulation phase. Hot code adds raw perf_counter_ns deltas for the running
+    # generation; end_generation() folds them into lifetime counters and a per-phase histogram of generation
+    # totals, so the cost while stepping is one clock read and one dict update per measurement.
+    def __init__(self, enabled: bool = True, neuron_timing: bool = False) -> None:
+        self.enabled: bool = enabled
+        # the sensing/brain_eval/actions split of entity steps, charged per neuron by Brain.process_timed
+        self.neuron_timing: bool = enabled and neuron_timing
+        self.generations: int = 0
+        self.generation_ns: dict[str, int] = dict.fromkeys(PHASES, 0)
+        self.generation_counts: dict[str, int] = dict.fromkeys(PHASES, 0)
+        self.total_ns: dict[str, int] = dict.fromkeys(PHASES, 0)
+        self.total_counts: dict[str, int] = dict.fromkeys(PHASES, 0)
+        self.histograms: dict[str, list[int]] = {phase: [0] * HISTOGRAM_BUCKETS for phase in PHASES}
+        self.last_generation: dict[str, float] = dict.fromkeys(PHASES, 0.0)
+        self.current_phase: str | None = None
+
+    def add(self, phase: str, ns: int, count: int = 1) -> None:
+        self.generation_ns[phase] += ns
+        self.generation_counts[phase] += count
+
+    def add_step(self, sensing: int, brain_eval: int, actions: int) -> None:
+        # one entity step of Brain.process, counted once per phase
+        generation_ns = self.generation_ns
+        generation_counts = self.generation_counts
+        generation_ns["sensing"] += sensing
+        generation_ns["brain_eval"] += brain_eval
+        generation_ns["actions"] += actions
+        generation_counts["sensing"] += 1
+        generation_counts["brain_eval"] += 1
+        generation_counts["actions"] += 1
+
+    @contextmanager
+    def measure(self, phase: str) -> Iterator[None]:
+        # current_phase is published even with timing off, the sampling profiler tags samples with it
+        outer_phase, self.current_phase = self.current_phase, phase
+        start = time.perf_counter_ns() if self.enabled else 0
+        try:
+            yield
+        finally:
+            if self.enabled:
+                self.generation_ns[phase] += time.perf_counter_ns() - start
+                self.generation_counts[phase] += 1
+            self.current_phase = outer_phase
+
+    def merge(self, generation_ns: dict[str, int], generation_counts: dict[str, int]) -> None:
+        # adds a generation measured elsewhere (a tile worker) into the current one
+        for phase, ns in generation_ns.items():
+            self.add(phase, ns, generation_counts.get(phase, 0))
+
+    def take_generation(self) -> tuple[dict[str, int], dict[str, int]]:
+        generation = self.generation_ns, self.generation_counts
+        self.generation_ns = dict.fromkeys(PHASES, 0)
+        self.generation_counts = dict.fromkeys(PHASES, 0)
+        return generation
+
+    def end_generation(self) -> dict[str, float]:
+        if not self.enabled:
+            return self.last_generation
+
+        generation_ns, generation_counts = self.take_generation()
+        for phase in PHASES:
+            ns = generation_ns[phase]
+            self.total_ns[phase] += ns
+            self.total_counts[phase] += generation_counts[phase]
+            if generation_counts[phase]:
+                self.histograms[phase][get_histogram_bucket(ns)] += 1
+
+        self.generations += 1
+        self.last_generation = {phase: generation_ns[phase] / 1e9 for phase in PHASES}
+        return self.last_generation
+
+    def summary(self) -> dict[str, dict]:
+        generations = max(self.generations, 1)
+        total = sum(self.total_ns.values()) or 1
+        return {
+            phase: {
+                "total_seconds": self.total_ns[phase] / 1e9,
+                "mean_seconds_per_generation": self.total_ns[phase] / 1e9 / generations,
+                "last_generation_seconds": self.last_generation[phase],
+                "share": self.total_ns[phase] / total,
+                "count": self.total_counts[phase],
+                "histogram_us": self.histograms[phase],
+            }
+            for phase in PHASES
+        }
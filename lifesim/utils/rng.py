@@ -19,5 +19,9 @@ class RNG:
         self.seed = 0 if seed is None else seed
         self.random = random.Random(self.seed)
         self.np = np.random.default_rng(self.seed)
+
+    def reseed(self, seed: int) -> None:
+        with self._lock:
+            self._init(seed)
         
 rng = RNG(0)
\ No newline at end of file
@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import collections
+import os
+import sys
+import threading
+from types import CodeType, FrameType
+from typing import Protocol
+
+from lifesim.utils.phase_timer import PhaseTimer
+
+PROFILE_FILE: str = "profile.folded"
+MAX_STACK_DEPTH: int = 128
+
+
+class ProfiledSimulation(Protocol):
+    # Simulation and BatchedSimulation both fit
+    current_generation: int
+    phase_timer: PhaseTimer
+
+    @property
+    def settings(self): ...
+
+
+def get_step_phases() -> dict[CodeType, str]:
+    # Brain.process does not publish its phase (that would cost a store per neuron), so samples
+    # taken while stepping are attributed by the innermost known frame instead
+    from lifesim.brain import neurons
+    from lifesim.brain.compiled_brain import CompiledBrain, tabulated_tanh
+    from lifesim.brain.neuron import Neuron
+
+    phases: dict[CodeType, str] = {
+        Neuron.execute_as_input_neuron.__code__: "sensing",
+        Neuron.execute_as_internal_neuron.__code__: "brain_eval",
+        Neuron.execute_as_output_neuron.__code__: "actions",
+        CompiledBrain.weighted_sum.__code__: "brain_eval",
+        tabulated_tanh.__code__: "brain_eval",
+    }
+    definitions = (
+        neurons.input_neuron_definitions + neurons.social_input_neuron_definitions
+        + neurons.safe_zone_input_neuron_definitions + neurons.output_neuron_definitions
+    )
+    for n in definitions:
+        if n.input_func is not None:
+            phases[n.input_func.__code__] = "sensing"
+        if n.output_func is not None:
+            phases[n.output_func.__code__] = "actions"
+    return phases
+
+
+def get_frame_name(code: CodeType) -> str:
+    module = os.path.splitext(os.path.basename(code.co_filename))[0]
+    return f"{module}:{code.co_qualname}"
+
+
+class ProfileTarget:
+    def __init__(self, simulation: ProfiledSimulation, thread: threading.Thread) -> None:
+        self.simulation: ProfiledSimulation = simulation
+        self.thread: threading.Thread = thread
+        self.samples: collections.Counter[str] = collections.Counter()
+        self.written: bool = False
+
+
+class SamplingProfiler:
+    # Statistical profiler for simulation threads. A daemon thread wakes every `interval` seconds
+    # and records the stack of every registered thread whose simulation is inside the generation
+    # window [start_generation, start_generation + generations). Nothing is hooked into the profiled
+    # code, so per-neuron call costs are not inflated the way cProfile inflates them.
+    #
+    # Output is one collapsed-stack file per simulation in its simulation_directory, one
+    # "name;phase;outermost;...;innermost count" line per distinct stack, ready for flamegraph.pl
+    # or speedscope. Tile worker processes are not sampled.
+    def __init__(self, interval: float = 0.005, start_generation: int = 1, generations: int = 5) -> None:
+        if interval <= 0:
+            raise ValueError("Sampling interval must be positive")
+        self.interval: float = interval
+        self.start_generation: int = start_generation
+        self.end_generation: int = start_generation + generations
+
+        self.targets: list[ProfileTarget] = []
+        self.step_phases: dict[CodeType, str] = get_step_phases()
+        self.stopped: threading.Event = threading.Event()
+        self.thread: threading.Thread | None = None
+        self.lock: threading.Lock = threading.Lock()
+
+    def register(self, simulation: ProfiledSimulation, thread: threading.Thread | None = None) -> None:
+        # `thread` runs the simulation loop, by default the calling thread
+        with self.lock:
+            self.targets.append(ProfileTarget(simulation, thread or threading.current_thread()))
+
+    def start(self) -> None:
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self.sample_loop, name="sampling-profiler", daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        with self.lock:
+            targets = list(self.targets)
+        for target in targets:
+            self.write(target)
+
+    def sample_loop(self) -> None:
+        while not self.stopped.wait(self.interval):
+            frames = sys._current_frames()
+            with self.lock:
+                targets = list(self.targets)
+
+            for target in targets:
+                if target.written:
+                    continue
+                generation = target.simulation.current_generation
+                if generation >= self.end_generation:
+                    self.write(target)
+                    continue
+                frame = frames.get(target.thread.ident) if target.thread.ident is not None else None
+                if frame is None or generation < self.start_generation:
+                    continue
+                target.samples[self.collapse(target.simulation, frame)] += 1
+
+    def collapse(self, simulation: ProfiledSimulation, frame: FrameType) -> str:
+        names: list[str] = []
+        step_phase: str | None = None
+        current: FrameType | None = frame
+        while current is not None and len(names) < MAX_STACK_DEPTH:
+            code = current.f_code
+            if step_phase is None:
+                step_phase = self.step_phases.get(code)
+            names.append(get_frame_name(code))
+            current = current.f_back
+        names.reverse()
+
+        phase = simulation.phase_timer.current_phase or step_phase or "other"
+        return ";".join([simulation.settings.name, phase, *names])
+
+    def write(self, target: ProfileTarget) -> None:
+        if target.written:
+            return
+        target.written = True
+        if not target.samples:
+            return
+
+        directory = target.simulation.settings.simulation_directory
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, PROFILE_FILE)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            for stack, count in sorted(target.samples.items()):
+                f.write(f"{stack} {count}\n")
+        os.replace(temp_path, path)
+        print(f"[LOG] Profile of {target.simulation.settings.name}: {sum(target.samples.values())} samples "
+              f"written to {path}", flush=True)
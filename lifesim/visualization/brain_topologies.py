@@ -0,0 +1,307 @@
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing as mp
+import os
+import random
+import threading
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from lifesim.brain.brain import build_neurons
+from lifesim.brain.brain_compiler import Topologies, encode_topologies
+from lifesim.brain.genome import Genome
+from lifesim.brain.neuron import Neuron
+from lifesim.brain.neurons import get_neuron_templates
+from lifesim.core.simulation_settings import SimulationSettings
+from lifesim.evolution.diversity import fold_columns
+from lifesim.evolution.history_store import HISTORY_DIRECTORY, HistoryStore
+
+if TYPE_CHECKING:
+    from lifesim.core.simulation import Simulation
+
+LAYOUT_CACHE_DIRECTORY: str = "./simulations/layout_cache"
+DEFAULT_TOP_K: int = 32
+# Gene.conn_weight range, edge widths are scaled against it
+WEIGHT_LIMIT: float = 4.0
+# padding of the per-brain edge rows, above every (source << 16 | target) code
+EDGE_PADDING: np.uint64 = np.uint64(np.iinfo(np.uint64).max)
+
+
+class BrainTopology:
+    # One distinct wiring found in a population. Edges are in canonical order, sorted by source and
+    # then target neuron (template indices), so every brain with this wiring lists them the same
+    # way; the weights are averaged over those brains.
+    def __init__(self, topology_hash: int, count: int, share: float, sources: np.ndarray, targets: np.ndarray,
+                 weights: np.ndarray) -> None:
+        self.hash: int = topology_hash
+        self.count: int = count
+        self.share: float = share
+        self.sources: np.ndarray = sources
+        self.targets: np.ndarray = targets
+        self.weights: np.ndarray = weights
+
+    @property
+    def key(self) -> str:
+        return f"{self.hash:016x}"
+
+    def to_dict(self, names: list[str]) -> dict:
+        return {
+            "hash": self.key,
+            "count": self.count,
+            "share": self.share,
+            "edges": [[names[s], names[t], round(w, 4)]
+                      for s, t, w in zip(self.sources.tolist(), self.targets.tolist(), self.weights.tolist())],
+        }
+
+
+def get_brain_settings(simulation_directory: str) -> SimulationSettings:
+    # only the entities_and_brain section shapes the neuron templates a genome is wired into
+    with open(os.path.join(simulation_directory, "settings.json"), encoding="utf-8") as f:
+        data = json.load(f)
+    return SimulationSettings(0, data["entities_and_brain"], save=False)
+
+
+def get_simulation_topologies(simulation: Simulation) -> Topologies:
+    # the brains the living entities run; entities whose brain is not built yet (the offspring
+    # waiting for the next generation) are built here
+    template_index = {n.name: i for i, n in enumerate(get_neuron_templates(simulation.settings))}
+    brains: list[list[Neuron]] = [
+        e.brain.neurons or build_neurons(e.brain.genome, simulation.settings)
+        for e in simulation.entities if not e.dead
+    ]
+    return encode_topologies(brains, template_index)
+
+
+def get_genome_topologies(genomes: np.ndarray, lengths: np.ndarray,
+                          settings: SimulationSettings) -> tuple[Topologies, np.ndarray]:
+    # Topologies of the distinct genomes only, with the number of entities carrying each; a
+    # converged population is mostly copies, so far fewer brains are built than there are rows.
+    # Rows are compared exactly, gene order decides which of two duplicate connections is kept.
+    rows = np.where(np.arange(genomes.shape[1]) < lengths[:, None], genomes, 0)
+    _, first, counts = np.unique(
+        np.column_stack([rows, lengths]).astype(np.int64), axis=0, return_index=True, return_counts=True
+    )
+    template_index = {n.name: i for i, n in enumerate(get_neuron_templates(settings))}
+    brains = [build_neurons(Genome(genes=genomes[i, :lengths[i]].tolist()), settings) for i in first.tolist()]
+    return encode_topologies(brains, template_index), counts
+
+
+def get_canonical_edges(topologies: Topologies) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # (B, E) edge codes (source << 16 | target, by template index) of every brain in ascending
+    # order with EDGE_PADDING last, the matching weights, and the edge count of every brain
+    neuron_counts, neurons, input_counts, inputs, weights = topologies
+    neuron_starts = np.cumsum(neuron_counts, dtype=np.int64) - neuron_counts
+    brain_of_neuron = np.repeat(np.arange(len(neuron_counts)), neuron_counts)
+    targets = np.repeat(np.arange(len(neurons)), input_counts)
+    brain_of_edge = brain_of_neuron[targets]
+    sources = neuron_starts[brain_of_edge] + inputs
+
+    codes = (neurons[sources].astype(np.uint64) << np.uint64(16)) | neurons[targets].astype(np.uint64)
+    order = np.lexsort((codes, brain_of_edge))
+    edge_counts = np.bincount(brain_of_edge, minlength=len(neuron_counts))
+    edge_starts = np.cumsum(edge_counts) - edge_counts
+    slots = np.arange(len(codes)) - edge_starts[brain_of_edge[order]]
+
+    width = int(edge_counts.max()) if len(edge_counts) else 0
+    edge_codes = np.full((len(neuron_counts), width), EDGE_PADDING, dtype=np.uint64)
+    edge_weights = np.zeros((len(neuron_counts), width))
+    edge_codes[brain_of_edge[order], slots] = codes[order]
+    edge_weights[brain_of_edge[order], slots] = weights[order]
+    return edge_codes, edge_weights, edge_counts
+
+
+def get_topology_hashes(topologies: Topologies) -> np.ndarray:
+    # one uint64 per brain, equal for brains wired the same way whatever their neuron order or weights
+    edge_codes, _, edge_counts = get_canonical_edges(topologies)
+    return fold_columns(edge_codes, edge_counts.astype(np.uint64))
+
+
+def get_top_topologies(topologies: Topologies, k: int = DEFAULT_TOP_K,
+                       counts: np.ndarray | None = None) -> list[BrainTopology]:
+    # the k most common wirings, most common first; `counts` weighs every brain (default 1 each)
+    edge_codes, edge_weights, edge_counts = get_canonical_edges(topologies)
+    hashes = fold_columns(edge_codes, edge_counts.astype(np.uint64))
+    if counts is None:
+        counts = np.ones(len(hashes), dtype=np.int64)
+    total = int(counts.sum())
+
+    unique_hashes, inverse = np.unique(hashes, return_inverse=True)
+    topology_counts = np.bincount(inverse, weights=counts).astype(np.int64)
+    ranked = np.lexsort((unique_hashes, -topology_counts))[:k]
+
+    top: list[BrainTopology] = []
+    for t in ranked.tolist():
+        members = np.flatnonzero(inverse == t)
+        n = int(edge_counts[members[0]])
+        codes = edge_codes[members[0], :n]
+        weights = np.average(edge_weights[members, :n], axis=0, weights=counts[members]) if n else np.zeros(0)
+        top.append(BrainTopology(
+            int(unique_hashes[t]), int(topology_counts[t]), int(topology_counts[t]) / total,
+            (codes >> np.uint64(16)).astype(np.int16), (codes & np.uint64(0xFFFF)).astype(np.int16), weights
+        ))
+    return top
+
+
+def export_topologies(path: str, generation: int, topologies: list[BrainTopology], names: list[str],
+                      population: int) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    data = {
+        "generation": generation,
+        "population": population,
+        "topologies": [t.to_dict(names) for t in topologies],
+    }
+    temp_path = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=4)
+    os.replace(temp_path, path)
+
+
+class LayoutCache:
+    # Vertex coordinates per topology hash and layout algorithm, in the canonical vertex order
+    # (ascending template index). A wiring seen at any earlier checkpoint is never laid out again,
+    # and the same wiring is drawn the same way in every render.
+    def __init__(self, directory: str | None) -> None:
+        self.directory: str | None = directory or None
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def get_path(self, key: str, layout: str) -> str:
+        assert self.directory is not None  # for mypy
+        return os.path.join(self.directory, f"{key}-{layout}.npy")
+
+    def load(self, key: str, layout: str, compute: Callable[[], np.ndarray]) -> np.ndarray:
+        if self.directory is None:
+            self.misses += 1
+            return compute()
+
+        path = self.get_path(key, layout)
+        if os.path.exists(path):
+            try:
+                coords = np.load(path)
+                self.hits += 1
+                return coords
+            except (OSError, ValueError):
+                pass  # unreadable entry, recomputed below
+
+        self.misses += 1
+        coords = compute()
+
+        os.makedirs(self.directory, exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as f:
+            np.save(f, coords)
+        os.replace(temp_path, path)
+        return coords
+
+
+def get_plot_options(vertex_count: int) -> tuple[tuple[int, int], str, float]:
+    # (bbox, layout, vertex size factor), the same table as brain_visualizer.py
+    if vertex_count < 12:
+        return (400, 400), 'fruchterman_reingold', 1.0
+    if vertex_count < 18:
+        return (500, 500), 'fruchterman_reingold', 1.0
+    if vertex_count < 26:
+        return (800, 800), 'fruchterman_reingold', 1.0
+    if vertex_count < 50:
+        return (1000, 1000), 'fruchterman_reingold', 1.0
+    if vertex_count < 130:
+        return (1200, 1000), 'fruchterman_reingold', 1.0
+    if vertex_count < 150:
+        return (4000, 4000), 'fruchterman_reingold', 1.5
+    if vertex_count < 200:
+        return (4000, 4000), 'kamada_kawai', 2.0
+    return (8000, 8000), 'fruchterman_reingold', 1.0
+
+
+def render_topology(topology: BrainTopology, names: list[str], path: str, cache_directory: str | None) -> tuple[str, bool]:
+    # runs in a pool worker; returns the written path and whether the layout came from the cache
+    import igraph
+
+    vertices, edges = np.unique(np.concatenate([topology.sources, topology.targets]), return_inverse=True)
+    edges = edges.reshape(2, -1).T
+    graph = igraph.Graph(n=len(vertices), edges=edges.tolist(), directed=True)
+    bbox, layout, size = get_plot_options(len(vertices))
+
+    for v, neuron in zip(graph.vs, vertices.tolist()):
+        name = names[neuron]
+        v['size'] = 40 * size
+        v['label'] = name
+        v['color'] = 'lightblue' if name[0] == 'I' else 'lightpink' if name[0] == 'O' else 'lightgrey'
+
+    for e, weight in zip(graph.es, topology.weights.tolist()):
+        e['color'] = 'lightcoral' if weight < 0 else 'grey' if weight == 0 else 'green'
+        e['width'] = 1 + 1.25 * abs(weight) / WEIGHT_LIMIT
+
+    def compute_layout() -> np.ndarray:
+        # seeded by the wiring, so even an uncached layout is drawn the same way every time
+        random.seed(topology.hash)
+        return np.array(graph.layout(layout).coords)
+
+    cache = LayoutCache(cache_directory)
+    coords = cache.load(topology.key, layout, compute_layout)
+    igraph.plot(graph, path, edge_curved=True, bbox=bbox, margin=64, layout=igraph.Layout(coords.tolist()))
+    return path, cache.hits > 0
+
+
+def render_topologies(topologies: list[BrainTopology], names: list[str], directory: str,
+                      cache_directory: str | None = LAYOUT_CACHE_DIRECTORY, workers: int | None = None) -> list[str]:
+    # one <rank>-<hash>.svg per topology, rendered in a process pool
+    os.makedirs(directory, exist_ok=True)
+    paths = [os.path.join(directory, f"{rank:03d}-{t.key}.svg") for rank, t in enumerate(topologies, start=1)]
+    if not topologies:
+        return paths
+
+    workers = min(workers or os.cpu_count() or 1, len(topologies))
+    with ProcessPoolExecutor(workers, mp_context=mp.get_context("spawn")) as executor:
+        results = list(executor.map(
+            render_topology, topologies, [names] * len(topologies), paths, [cache_directory] * len(topologies)
+        ))
+    cached = sum(hit for _, hit in results)
+    print(f"[LOG] Rendered {len(results)} brain topologies to {directory} "
+          f"({cached} cached layouts, {len(results) - cached} computed)", flush=True)
+    return paths
+
+
+def export_history_generation(simulation_directory: str, generation: int | None = None, k: int = DEFAULT_TOP_K,
+                              render: bool = True, cache_directory: str | None = LAYOUT_CACHE_DIRECTORY,
+                              workers: int | None = None) -> str:
+    # Top-k topologies of one generation of a simulation's history store (default: the last one),
+    # written to <simulation_directory>/topologies/<generation>/; returns that directory
+    settings = get_brain_settings(simulation_directory)
+    history = HistoryStore(os.path.join(simulation_directory, HISTORY_DIRECTORY))
+    if not len(history):
+        raise ValueError(f"History store of '{simulation_directory}' is empty")
+    if generation is None:
+        generation = int(history.generations[-1])
+
+    genomes, lengths = history.get_genomes(generation), history.get_lengths(generation)
+    brains, counts = get_genome_topologies(genomes, lengths, settings)
+    top = get_top_topologies(brains, k, counts)
+    names = [n.name for n in get_neuron_templates(settings)]
+
+    directory = os.path.join(simulation_directory, "topologies", str(generation))
+    export_topologies(os.path.join(directory, "topologies.json"), generation, top, names, len(genomes))
+    print(f"[LOG] Generation {generation}: {len(counts)} distinct genomes, top {len(top)} topologies "
+          f"cover {sum(t.count for t in top)}/{len(genomes)} entities", flush=True)
+    if render:
+        render_topologies(top, names, directory, cache_directory, workers)
+    return directory
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export and render the most common brain topologies of a generation "
+                                                 "recorded by the history store (history_store = true)")
+    parser.add_argument("simulation_directory")
+    parser.add_argument("--generation", type=int, default=None, help="default: the last recorded generation")
+    parser.add_argument("--top-k", type=int, default=DEFAULT_TOP_K)
+    parser.add_argument("--workers", type=int, default=None, help="render processes, default: one per CPU")
+    parser.add_argument("--layout-cache", default=LAYOUT_CACHE_DIRECTORY, help="empty to disable the cache")
+    parser.add_argument("--no-render", action="store_true", help="only write topologies.json, igraph is not needed")
+    args = parser.parse_args()
+    export_history_generation(args.simulation_directory, args.generation, args.top_k, not args.no_render,
+                              args.layout_cache, args.workers)
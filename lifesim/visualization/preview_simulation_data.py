@@ -37,6 +37,8 @@ def smooth(data: list[float], window_size: int = 20) -> list[float]:
 
 def process_data(path: str):
     simulation_settings, simulation_data = load_data(path)
+    # the closing record of a run only carries its stop_reason
+    simulation_data = [d for d in simulation_data if 'survival_rate' in d]
 
     generations = [d.get('generation', 0) for d in simulation_data]
     survival_rates = [d.get('survival_rate', 0.0) for d in simulation_data]